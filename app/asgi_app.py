@@ -0,0 +1,276 @@
+import asyncio
+import json
+import os
+import time
+from contextlib import suppress
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs
+from dotenv import load_dotenv
+from pydantic import ValidationError
+from config.ollama_settings import get_ollama_settings
+from services.async_chat_service import AsyncChatService
+from services.async_ollama_client import close_async_ollama_clients
+from services.chat_log_writer import get_chat_log_writer, record_chat
+from services.chat_request import (
+    cache_bypass_requested, parse_chat_request, request_budget, request_deadline, request_priority,
+    request_username
+)
+from services.faq_store import get_faq_store
+from services.health_service import HealthService
+from services.scrape_cache import age_header, cache_freshness, get_scrape_cache
+from services.scraping_service import PADRON_SUMMARY, TARRAGONA_PADRON_URL, ScrapingService, close_async_http_client
+
+# Servidor ASGI para los endpoints que esperan a servicios lentos (Ollama y la sede de Tarragona).
+# Cada petición es una corrutina: mientras espera la respuesta de arriba no ocupa un hilo, así que un
+# proceso puede mantener cientos de peticiones lentas en curso. Reutiliza los mismos servicios que
+# la app Flask (main.py), que sigue sirviendo el resto de endpoints y Swagger.
+#
+#   uvicorn asgi_app:application --app-dir app --host 0.0.0.0 --port 8001
+
+env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env')
+load_dotenv(env_path)
+
+ollama_settings = get_ollama_settings()
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Requested-With, X-Request-Timeout, X-Cache-Bypass, '
+                                    'Cache-Control',
+    'Access-Control-Expose-Headers': 'X-Cache, X-Precomputed, Age, Retry-After'
+}
+
+HandlerResult = Tuple[int, Dict[str, Any], Dict[str, str]]
+
+
+class AsgiRequest:
+    """Petición HTTP de ASGI con el cuerpo ya leído"""
+
+    def __init__(self, scope: Dict[str, Any], body: bytes, receive: Callable[[], Awaitable[Dict[str, Any]]]):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        self.args = {key: values[-1] for key, values in parse_qs(scope.get('query_string', b'').decode()).items()}
+        self.body = body
+        self._receive = receive
+
+    def header(self, name: str, default: str = '') -> str:
+        return self.headers.get(name.lower(), default)
+
+    def json(self) -> Optional[Any]:
+        """Cuerpo JSON, o None si no es JSON válido"""
+        try:
+            return json.loads(self.body) if self.body else None
+        except ValueError:
+            return None
+
+    async def wait_disconnect(self):
+        """Termina cuando el cliente cierra la conexión"""
+        while (await self._receive())['type'] != 'http.disconnect':
+            pass
+
+
+_routes: Dict[Tuple[str, str], Callable[[AsgiRequest], Awaitable[HandlerResult]]] = {}
+
+
+def route(method: str, path: str):
+    def register(handler):
+        _routes[(method, path)] = handler
+        return handler
+    return register
+
+
+async def application(scope: Dict[str, Any], receive, send):
+    """Aplicación ASGI (``uvicorn asgi_app:application``)"""
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    body = b''
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+
+    request = AsgiRequest(scope, body, receive)
+
+    if request.method == 'OPTIONS':
+        await _send_json(send, 204, None)
+        return
+
+    handler = _routes.get((request.method, request.path))
+    if handler is None:
+        allowed = any(path == request.path for _, path in _routes)
+        await _send_json(send, 405 if allowed else 404, {'error': 'Method not allowed' if allowed else 'Not found'})
+        return
+
+    # Si el cliente se desconecta antes de la respuesta se cancela el handler; la cancelación
+    # cierra la conexión con Ollama (salvo que otra petición espere la misma generación)
+    handler_task = asyncio.ensure_future(_run_handler(handler, request))
+    disconnect_task = asyncio.ensure_future(request.wait_disconnect())
+    done, _ = await asyncio.wait({handler_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+    disconnect_task.cancel()
+    if handler_task not in done:
+        handler_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await handler_task
+        return
+
+    status, payload, headers = handler_task.result()
+    await _send_json(send, status, payload, headers)
+
+
+async def _run_handler(handler, request: AsgiRequest) -> HandlerResult:
+    try:
+        return await handler(request)
+    except Exception as e:
+        return 500, {'success': False, 'error': f'Error interno del servidor: {str(e)}'}, {}
+
+
+async def _send_json(send, status: int, payload: Optional[Dict[str, Any]], headers: Optional[Dict[str, str]] = None):
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8') if payload is not None else b''
+    response_headers = {**CORS_HEADERS, **(headers or {})}
+    if payload is not None:
+        response_headers['Content-Type'] = 'application/json'
+    response_headers['Content-Length'] = str(len(body))
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response_headers.items()]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Cargar las respuestas precalculadas de las FAQ antes de la primera petición
+            get_faq_store()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_async_ollama_clients()
+            await close_async_http_client()
+            writer = get_chat_log_writer()
+            if writer is not None:
+                await asyncio.to_thread(writer.close)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+@route('GET', '/health')
+async def health(request: AsgiRequest) -> HandlerResult:
+    return 200, HealthService.health_check(), {}
+
+
+@route('POST', '/chat')
+async def chat(request: AsgiRequest) -> HandlerResult:
+    """Equivalente asíncrono de POST /chat (mismo cuerpo, cabeceras y códigos de estado)"""
+    started_at = time.perf_counter()
+    try:
+        deadline = request_deadline(request.header)
+    except ValueError as e:
+        return 400, {'error': str(e)}, {}
+
+    data = request.json()
+    if not isinstance(data, dict) or 'query' not in data:
+        return 400, {'error': 'Se requiere el campo "query" en el body del request'}, {}
+
+    query = str(data['query']).strip()
+    if not query:
+        return 400, {'error': 'La query no puede estar vacía'}, {}
+
+    username = request_username(request.header)
+    try:
+        chat_request = parse_chat_request(data)
+        budget = request_budget(chat_request, username)
+    except ValidationError as e:
+        return 400, {'error': f'Request inválido: {e.errors(include_url=False, include_context=False)}'}, {}
+
+    use_cache = not cache_bypass_requested(request.header)
+
+    chat_service = AsyncChatService(ollama_settings=ollama_settings)
+    response = await chat_service.asend_message(query=query, use_cache=use_cache, priority=request_priority(username),
+                                                rag=chat_request.rag, deadline=deadline, budget=budget)
+    record_chat(get_chat_log_writer(), 'chat', username, query, response,
+                latency_ms=(time.perf_counter() - started_at) * 1000)
+
+    if response.get('retry_after') is not None:
+        return 429, {'success': False, 'error': response.get('error'), 'retry_after': response['retry_after']}, \
+            {'Retry-After': str(response['retry_after'])}
+
+    if response.get('deadline_exceeded'):
+        return 504, {'success': False, 'error': response.get('error'), 'deadline_exceeded': True}, {}
+
+    if not response.get('success', False):
+        return 500, {'success': False, 'error': response.get('error', 'Error desconocido')}, {}
+
+    headers = {'X-Cache': 'HIT' if response.get('cached') else ('MISS' if use_cache else 'BYPASS')}
+    if response.get('precomputed'):
+        headers['X-Precomputed'] = 'true'
+    return 200, response, headers
+
+
+@route('GET', '/chat/model-info')
+async def model_info(request: AsgiRequest) -> HandlerResult:
+    response = await AsyncChatService(ollama_settings=ollama_settings).aget_model_info()
+    return (200 if response.get('success', False) else 500), response, {}
+
+
+@route('POST', '/scrape/tarragona-padron')
+async def scrape_tarragona_padron(request: AsgiRequest) -> HandlerResult:
+    data = request.json()
+    if not data:
+        return 400, {"error": "Request must be JSON"}, {}
+
+    url = data.get('url') if isinstance(data, dict) else None
+    if not url:
+        return 400, {"error": "URL is required"}, {}
+
+    # Validate that it's a Tarragona URL for security
+    if 'tarragona.cat' not in url:
+        return 400, {"error": "Only Tarragona official URLs are allowed"}, {}
+
+    result = await ScrapingService().scrape_tarragona_padron_info_async(url)
+    return (200 if result['success'] else 500), result, {}
+
+
+async def _scrape_cached(url: str) -> Dict[str, Any]:
+    """Scraping servido desde la caché de scraping; solo la primera descarga se espera (de forma asíncrona)"""
+    cache = get_scrape_cache()
+    if cache is not None:
+        cached = cache.cached(url)
+        if cached is not None:
+            return cached
+
+    result = await ScrapingService().scrape_tarragona_padron_info_async(url)
+    return cache.store(url, result) if cache is not None else result
+
+
+@route('GET', '/scrape/tarragona-padron/quick')
+async def scrape_tarragona_padron_quick(request: AsgiRequest) -> HandlerResult:
+    result = await _scrape_cached(TARRAGONA_PADRON_URL)
+    if not result['success']:
+        return 500, result, {}
+    return 200, result, age_header(result)
+
+
+@route('GET', '/padron-info')
+async def padron_info(request: AsgiRequest) -> HandlerResult:
+    result = await _scrape_cached(TARRAGONA_PADRON_URL)
+    if not result['success']:
+        return 500, {'success': False, 'error': result.get('error', 'Unknown error')}, {}
+    return 200, {'success': True, **PADRON_SUMMARY, **cache_freshness(result)}, age_header(result)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    print("🚀 Starting ASGI app (chat and scraping endpoints)...")
+    print("💬 Chat endpoint at: http://localhost:8001/chat")
+    uvicorn.run(application, host='0.0.0.0', port=int(os.environ.get('ASGI_PORT', '8001')))
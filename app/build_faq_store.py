@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Regenera el almacén de respuestas precalculadas de las FAQ del padrón
+
+Responde cada pregunta de FAQ_QUESTIONS_PATH con ChatService (sin caché) y
+guarda las respuestas, con sus embeddings si se piden, en FAQ_STORE_PATH.
+La API carga el almacén al arrancar.
+
+Uso:
+    python app/build_faq_store.py
+    python app/build_faq_store.py --rag --embeddings --concurrency 2
+"""
+
+import argparse
+import sys
+from dotenv import load_dotenv
+import os
+
+env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env')
+load_dotenv(env_path)
+
+from config.faq_settings import get_faq_settings
+from config.ollama_settings import get_ollama_settings
+from services.admission_controller import PRIORITY_LOW
+from services.chat_service import ChatService
+from services.faq_store import build_faq_store, load_questions
+from services.semantic_cache import OllamaEmbedder
+
+
+def main(argv=None) -> int:
+    settings = get_faq_settings()
+
+    parser = argparse.ArgumentParser(description='Regenera el almacén de respuestas precalculadas de las FAQ')
+    parser.add_argument('--questions', default=settings.faq_questions_path, help='Fichero con una pregunta por línea')
+    parser.add_argument('--output', default=settings.faq_store_path, help='Fichero .npz de salida')
+    parser.add_argument('--rag', action='store_true', help='Apoyar las respuestas en el índice de páginas del padrón')
+    parser.add_argument('--embeddings', action='store_true',
+                        help=f'Guardar embeddings de las preguntas ({settings.faq_embedding_model}) para buscar por similitud')
+    parser.add_argument('--concurrency', type=int, default=1, help='Preguntas respondidas a la vez')
+    args = parser.parse_args(argv)
+
+    questions = load_questions(args.questions)
+    print(f"📋 {len(questions)} preguntas en {args.questions}")
+
+    chat_service = ChatService(ollama_settings=get_ollama_settings())
+
+    # Las respuestas se sirven durante semanas: siempre con el modelo de calidad, aunque
+    # CHAT_FAST_MODEL haga que el enrutador mande las preguntas cortas al rápido
+    def answer(question):
+        return chat_service.send_message(question, use_cache=False, priority=PRIORITY_LOW, rag=args.rag,
+                                         model=get_ollama_settings().model_name)
+
+    def progress(done, total, question, ok):
+        print(f"{'✅' if ok else '❌'} [{done}/{total}] {question}")
+
+    store = build_faq_store(
+        questions,
+        answer,
+        embedder=OllamaEmbedder(settings.faq_embedding_model) if args.embeddings else None,
+        embedding_model=settings.faq_embedding_model,
+        concurrency=args.concurrency,
+        progress=progress
+    )
+
+    if not len(store):
+        print("❌ No se pudo generar ninguna respuesta; el almacén no se ha modificado")
+        return 1
+
+    store.save(args.output)
+    print(f"💾 {len(store)} respuestas guardadas en {args.output}")
+    return 0 if len(store) == len(questions) else 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,20 @@
+from functools import lru_cache
+from pydantic import Field
+from pydantic_settings import BaseSettings
+
+
+class AuthSettings(BaseSettings):
+    model_config = {"env_file": ".env", "env_file_encoding": "utf-8", "extra": "ignore"}
+
+    # Clave con la que se firman (HMAC-SHA256) los tokens de /login. Si está vacía se genera una
+    # aleatoria al arrancar: los tokens dejan de valer al reiniciar y no sirven entre procesos
+    # (por ejemplo entre el servidor Flask y el ASGI)
+    auth_token_secret: str = Field(default='', alias='AUTH_TOKEN_SECRET')
+    # Segundos de validez de un token desde que se emite (0 = no caduca)
+    auth_token_max_age: int = Field(default=86400, alias='AUTH_TOKEN_MAX_AGE')
+
+
+@lru_cache(maxsize=1)
+def get_auth_settings() -> AuthSettings:
+    """Devuelve la configuración de autenticación compartida por todo el proceso."""
+    return AuthSettings()
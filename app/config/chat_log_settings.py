@@ -0,0 +1,39 @@
+from functools import lru_cache
+from typing import List
+from pydantic import Field
+from pydantic_settings import BaseSettings
+
+
+class ChatLogSettings(BaseSettings):
+    model_config = {"env_file": ".env", "env_file_encoding": "utf-8", "extra": "ignore"}
+
+    # Registro de chats y consumo de tokens en MySQL (tabla chat_logs, ver migrations/002_create_chat_logs.sql)
+    chat_log_enabled: bool = Field(default=False, alias='CHAT_LOG_ENABLED')
+    # Guardar el texto de la consulta y de la respuesta (si es False solo se guardan los contadores)
+    chat_log_store_text: bool = Field(default=True, alias='CHAT_LOG_STORE_TEXT')
+
+    # Escritura diferida: los registros se insertan por lotes al llegar a CHAT_LOG_BATCH_SIZE
+    # o cada CHAT_LOG_FLUSH_INTERVAL segundos
+    chat_log_batch_size: int = Field(default=100, alias='CHAT_LOG_BATCH_SIZE')
+    chat_log_flush_interval: float = Field(default=5.0, alias='CHAT_LOG_FLUSH_INTERVAL')
+    # Registros pendientes como máximo; si la base de datos no responde se descartan los más antiguos
+    chat_log_max_buffer: int = Field(default=10000, alias='CHAT_LOG_MAX_BUFFER')
+    # Reintentos de cada lote (con espera exponencial desde CHAT_LOG_RETRY_BACKOFF segundos)
+    chat_log_max_retries: int = Field(default=5, alias='CHAT_LOG_MAX_RETRIES')
+    chat_log_retry_backoff: float = Field(default=0.5, alias='CHAT_LOG_RETRY_BACKOFF')
+    # Segundos máximos de los vaciados síncronos (al apagar y antes de /chat/usage), sin reintentos
+    chat_log_flush_timeout: float = Field(default=10.0, alias='CHAT_LOG_FLUSH_TIMEOUT')
+    # Usuarios (separados por comas) que pueden consultar en /chat/usage el consumo de todos;
+    # el resto solo ve el suyo
+    chat_usage_admins: str = Field(default='', alias='CHAT_USAGE_ADMINS')
+
+    @property
+    def chat_usage_admin_list(self) -> List[str]:
+        """Usuarios con acceso al consumo de todos los usuarios (CHAT_USAGE_ADMINS)."""
+        return [user.strip() for user in self.chat_usage_admins.split(',') if user.strip()]
+
+
+@lru_cache(maxsize=1)
+def get_chat_log_settings() -> ChatLogSettings:
+    """Devuelve la configuración del registro de chats compartida por todo el proceso."""
+    return ChatLogSettings()
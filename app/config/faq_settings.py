@@ -0,0 +1,24 @@
+import os
+from functools import lru_cache
+from pydantic import Field
+from pydantic_settings import BaseSettings
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
+
+
+class FaqSettings(BaseSettings):
+    model_config = {"env_file": ".env", "env_file_encoding": "utf-8", "extra": "ignore"}
+
+    # Respuestas precalculadas a las preguntas frecuentes del padrón
+    faq_enabled: bool = Field(default=True, alias='FAQ_ENABLED')
+    faq_store_path: str = Field(default=os.path.join(_DATA_DIR, 'faq_store.npz'), alias='FAQ_STORE_PATH')
+    faq_questions_path: str = Field(default=os.path.join(_DATA_DIR, 'faq_questions.txt'), alias='FAQ_QUESTIONS_PATH')
+    # Similitud coseno mínima para servir una respuesta por embedding (solo si el almacén tiene embeddings)
+    faq_similarity_threshold: float = Field(default=0.9, alias='FAQ_SIMILARITY_THRESHOLD')
+    faq_embedding_model: str = Field(default='nomic-embed-text', alias='FAQ_EMBEDDING_MODEL')
+
+
+@lru_cache(maxsize=1)
+def get_faq_settings() -> FaqSettings:
+    """Devuelve la configuración de las FAQ compartida por todo el proceso."""
+    return FaqSettings()
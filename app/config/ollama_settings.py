@@ -1,7 +1,8 @@
 import os
+from functools import lru_cache
 from pydantic import Field
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional, List, Union
 
 
 class OllamaSettings(BaseSettings):
@@ -9,3 +10,90 @@ class OllamaSettings(BaseSettings):
     
     model_name: str = Field(default='gemma:7b', alias='MODEL_NAME')
     ollama_host: str = Field(default='http://localhost:11434', alias='OLLAMA_HOST')
+
+    # Tiempo que Ollama mantiene el modelo cargado tras cada petición ("30m", "1h"; "-1" = siempre)
+    ollama_keep_alive: str = Field(default='30m', alias='OLLAMA_KEEP_ALIVE')
+    ollama_warmup_on_startup: bool = Field(default=False, alias='OLLAMA_WARMUP_ON_STARTUP')
+    # Segundos entre pings de mantenimiento a servidores inactivos (0 lo desactiva)
+    ollama_keep_warm_interval: float = Field(default=0.0, alias='OLLAMA_KEEP_WARM_INTERVAL')
+
+    # Varios servidores Ollama separados por comas (si se define, sustituye a OLLAMA_HOST)
+    ollama_hosts: str = Field(default='', alias='OLLAMA_HOSTS')
+    ollama_eject_after_failures: int = Field(default=3, alias='OLLAMA_EJECT_AFTER_FAILURES')
+    ollama_probe_interval: float = Field(default=10.0, alias='OLLAMA_PROBE_INTERVAL')
+
+    # Pool de conexiones keep-alive hacia Ollama
+    ollama_pool_size: int = Field(default=10, alias='OLLAMA_POOL_SIZE')
+    ollama_connect_timeout: float = Field(default=5.0, alias='OLLAMA_CONNECT_TIMEOUT')
+    ollama_read_timeout: float = Field(default=120.0, alias='OLLAMA_READ_TIMEOUT')
+    # Conexiones máximas por host del cliente asíncrono (servidor ASGI, asgi_app.py)
+    ollama_async_pool_size: int = Field(default=100, alias='OLLAMA_ASYNC_POOL_SIZE')
+
+    # Enrutado entre un modelo rápido y el de calidad (MODEL_NAME); vacío lo desactiva
+    chat_fast_model: str = Field(default='', alias='CHAT_FAST_MODEL')
+    chat_routing_max_fast_words: int = Field(default=30, alias='CHAT_ROUTING_MAX_FAST_WORDS')
+    # Con esta profundidad de cola o más todo va al modelo rápido (0 lo desactiva)
+    chat_routing_overload_queue_depth: int = Field(default=4, alias='CHAT_ROUTING_OVERLOAD_QUEUE_DEPTH')
+
+    # Caché de respuestas por coincidencia exacta
+    chat_cache_enabled: bool = Field(default=True, alias='CHAT_CACHE_ENABLED')
+    chat_cache_max_entries: int = Field(default=512, alias='CHAT_CACHE_MAX_ENTRIES')
+    chat_cache_ttl_seconds: float = Field(default=3600.0, alias='CHAT_CACHE_TTL_SECONDS')
+
+    # Caché semántica (similitud de embeddings)
+    semantic_cache_enabled: bool = Field(default=False, alias='SEMANTIC_CACHE_ENABLED')
+    semantic_cache_embedding_model: str = Field(default='nomic-embed-text', alias='SEMANTIC_CACHE_EMBEDDING_MODEL')
+    semantic_cache_threshold: float = Field(default=0.92, alias='SEMANTIC_CACHE_THRESHOLD')
+    semantic_cache_capacity: int = Field(default=1024, alias='SEMANTIC_CACHE_CAPACITY')
+
+    # Control de admisión: generaciones simultáneas y cola de espera
+    chat_max_in_flight: int = Field(default=4, alias='CHAT_MAX_IN_FLIGHT')
+    chat_max_queue: int = Field(default=32, alias='CHAT_MAX_QUEUE')
+    chat_queue_timeout: float = Field(default=30.0, alias='CHAT_QUEUE_TIMEOUT')
+
+    # Plazo por petición de chat (cabecera X-Request-Timeout; 0 = sin plazo por defecto)
+    chat_default_deadline: float = Field(default=120.0, alias='CHAT_DEFAULT_DEADLINE')
+    chat_max_deadline: float = Field(default=600.0, alias='CHAT_MAX_DEADLINE')
+
+    # Presupuestos de generación por clase de petición (JSON en CHAT_BUDGETS)
+    chat_budgets: Dict[str, Dict[str, float]] = Field(default={
+        'anonymous': {'max_prompt_tokens': 1024, 'num_predict': 384, 'num_ctx': 2048, 'temperature': 0.7},
+        'authenticated': {'max_prompt_tokens': 4096, 'num_predict': 1024, 'num_ctx': 8192, 'temperature': 0.7},
+        'batch': {'max_prompt_tokens': 1024, 'num_predict': 256, 'num_ctx': 2048, 'temperature': 0.3}
+    }, alias='CHAT_BUDGETS')
+
+    # Chat por lotes
+    chat_batch_max_concurrency: int = Field(default=4, alias='CHAT_BATCH_MAX_CONCURRENCY')
+    chat_batch_max_items: int = Field(default=200, alias='CHAT_BATCH_MAX_ITEMS')
+
+    # Trabajos de chat asíncronos
+    chat_jobs_workers: int = Field(default=2, alias='CHAT_JOBS_WORKERS')
+    chat_jobs_max: int = Field(default=500, alias='CHAT_JOBS_MAX')
+    chat_jobs_ttl_seconds: float = Field(default=3600.0, alias='CHAT_JOBS_TTL_SECONDS')
+
+    # Conversaciones guardadas en el servidor
+    chat_sessions_max: int = Field(default=1000, alias='CHAT_SESSIONS_MAX')
+    chat_sessions_ttl_seconds: float = Field(default=1800.0, alias='CHAT_SESSIONS_TTL_SECONDS')
+    chat_session_max_turns: int = Field(default=50, alias='CHAT_SESSION_MAX_TURNS')
+    chat_session_max_context_tokens: int = Field(default=8192, alias='CHAT_SESSION_MAX_CONTEXT_TOKENS')
+
+    # Recarga en segundo plano de la información de modelos
+    model_info_refresh_interval: float = Field(default=30.0, alias='MODEL_INFO_REFRESH_INTERVAL')
+
+    @property
+    def keep_alive(self) -> Union[str, int]:
+        """Valor de keep_alive para Ollama: los números sin unidad se envían como segundos."""
+        value = self.ollama_keep_alive.strip()
+        return int(value) if value.lstrip('-').isdigit() else value
+
+    @property
+    def ollama_host_list(self) -> List[str]:
+        """Lista de hosts de Ollama configurados (OLLAMA_HOSTS o, si está vacío, OLLAMA_HOST)."""
+        hosts = [host.strip().rstrip('/') for host in self.ollama_hosts.split(',') if host.strip()]
+        return hosts or [self.ollama_host.rstrip('/')]
+
+
+@lru_cache(maxsize=1)
+def get_ollama_settings() -> OllamaSettings:
+    """Devuelve la configuración de Ollama compartida por todo el proceso (el .env se lee una sola vez)."""
+    return OllamaSettings()
@@ -0,0 +1,23 @@
+import os
+from functools import lru_cache
+from pydantic import Field
+from pydantic_settings import BaseSettings
+
+
+class RagSettings(BaseSettings):
+    model_config = {"env_file": ".env", "env_file_encoding": "utf-8", "extra": "ignore"}
+
+    # Índice BM25 de las páginas del padrón scrapeadas
+    padron_index_path: str = Field(
+        default=os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'padron_index.json'),
+        alias='PADRON_INDEX_PATH'
+    )
+    padron_index_on_scrape: bool = Field(default=True, alias='PADRON_INDEX_ON_SCRAPE')
+    rag_top_k: int = Field(default=4, alias='RAG_TOP_K')
+    rag_passage_words: int = Field(default=80, alias='RAG_PASSAGE_WORDS')
+
+
+@lru_cache(maxsize=1)
+def get_rag_settings() -> RagSettings:
+    """Devuelve la configuración de RAG compartida por todo el proceso."""
+    return RagSettings()
@@ -0,0 +1,53 @@
+import os
+from functools import lru_cache
+from typing import List
+from pydantic import Field
+from pydantic_settings import BaseSettings
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
+
+
+class ScrapingSettings(BaseSettings):
+    model_config = {"env_file": ".env", "env_file_encoding": "utf-8", "extra": "ignore"}
+
+    # Caché de resultados de scraping (stale-while-revalidate) de /padron-info y /scrape/tarragona-padron/quick
+    scrape_cache_enabled: bool = Field(default=True, alias='SCRAPE_CACHE_ENABLED')
+    # Segundos que un resultado se considera fresco; después se sirve igualmente mientras se recarga
+    scrape_cache_ttl_seconds: float = Field(default=600.0, alias='SCRAPE_CACHE_TTL_SECONDS')
+
+    # Parser HTML: auto (lxml si está instalado, si no html.parser), lxml o html.parser
+    scrape_parser: str = Field(default='auto', alias='SCRAPE_PARSER')
+    # Tamaño máximo del cuerpo descargado; las páginas más grandes se abortan sin leerlas enteras
+    scrape_max_body_bytes: int = Field(default=5 * 1024 * 1024, alias='SCRAPE_MAX_BODY_BYTES')
+
+    # Caché en disco de las descargas (cuerpo, ETag, Last-Modified y extracción) para peticiones condicionales
+    scrape_fetch_cache_enabled: bool = Field(default=True, alias='SCRAPE_FETCH_CACHE_ENABLED')
+    scrape_fetch_cache_dir: str = Field(default=os.path.join(_DATA_DIR, 'fetch_cache'), alias='SCRAPE_FETCH_CACHE_DIR')
+    # Tamaño máximo en disco; al superarlo se eliminan las entradas usadas hace más tiempo
+    scrape_fetch_cache_max_bytes: int = Field(default=50 * 1024 * 1024, alias='SCRAPE_FETCH_CACHE_MAX_BYTES')
+    # Rastreo del catálogo de trámites de la sede (crawl_catalog.py y /scrape/catalog/crawl)
+    crawl_catalog_url: str = Field(
+        default='https://seu.tarragona.cat/sta/CarpetaPublic/doEvent?APP_CODE=STA&PAGE_CODE=CATALOGO&lang=ES',
+        alias='CRAWL_CATALOG_URL'
+    )
+    # Fichero JSONL donde se va escribiendo cada trámite descargado (permite reanudar el rastreo)
+    crawl_store_path: str = Field(default=os.path.join(_DATA_DIR, 'catalog_crawl.jsonl'), alias='CRAWL_STORE_PATH')
+    crawl_concurrency: int = Field(default=4, alias='CRAWL_CONCURRENCY')
+    crawl_per_host_concurrency: int = Field(default=2, alias='CRAWL_PER_HOST_CONCURRENCY')
+    # Separación mínima entre el inicio de dos peticiones al mismo servidor
+    crawl_delay_seconds: float = Field(default=0.5, alias='CRAWL_DELAY_SECONDS')
+    crawl_max_pages: int = Field(default=2000, alias='CRAWL_MAX_PAGES')
+    # Usuarios (separados por comas) que pueden lanzar y detener el rastreo desde la API; si está
+    # vacío el rastreo solo se lanza con crawl_catalog.py
+    crawl_admins: str = Field(default='', alias='CRAWL_ADMINS')
+
+    @property
+    def crawl_admin_list(self) -> List[str]:
+        """Usuarios que pueden lanzar y detener el rastreo del catálogo (CRAWL_ADMINS)."""
+        return [user.strip() for user in self.crawl_admins.split(',') if user.strip()]
+
+
+@lru_cache(maxsize=1)
+def get_scraping_settings() -> ScrapingSettings:
+    """Devuelve la configuración del scraping compartida por todo el proceso."""
+    return ScrapingSettings()
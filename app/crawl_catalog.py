@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Rastrea el catálogo de trámites de la sede electrónica de Tarragona
+
+Descubre las fichas de trámite del catálogo (CRAWL_CATALOG_URL), las
+descarga en paralelo respetando el límite por servidor y la pausa de
+cortesía, y va escribiendo cada una en CRAWL_STORE_PATH (JSONL). Si el
+rastreo se interrumpe, volver a lanzarlo continúa donde se quedó.
+
+Uso:
+    python app/crawl_catalog.py
+    python app/crawl_catalog.py --concurrency 8 --per-host 2 --delay 0.5
+    python app/crawl_catalog.py --restart
+"""
+
+import argparse
+import sys
+from dotenv import load_dotenv
+import os
+
+env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env')
+load_dotenv(env_path)
+
+from config.scraping_settings import get_scraping_settings
+from services.catalog_crawler import CRAWL_CANCELLED, CRAWL_FAILED, CatalogCrawler, CrawlStore
+
+
+def main(argv=None) -> int:
+    settings = get_scraping_settings()
+
+    parser = argparse.ArgumentParser(description='Rastrea el catálogo de trámites de la sede de Tarragona')
+    parser.add_argument('--url', default=settings.crawl_catalog_url, help='Listado del catálogo del que partir')
+    parser.add_argument('--store', default=settings.crawl_store_path, help='Fichero JSONL de resultados')
+    parser.add_argument('--concurrency', type=int, default=settings.crawl_concurrency, help='Descargas a la vez')
+    parser.add_argument('--per-host', type=int, default=settings.crawl_per_host_concurrency,
+                        help='Descargas a la vez por servidor')
+    parser.add_argument('--delay', type=float, default=settings.crawl_delay_seconds,
+                        help='Segundos mínimos entre el inicio de dos peticiones al mismo servidor')
+    parser.add_argument('--max-pages', type=int, default=settings.crawl_max_pages, help='Páginas máximas por ejecución')
+    parser.add_argument('--restart', action='store_true', help='Vaciar el almacén y descargar todo de nuevo')
+    args = parser.parse_args(argv)
+
+    crawler = CatalogCrawler(
+        args.url,
+        CrawlStore(args.store),
+        concurrency=args.concurrency,
+        per_host_concurrency=args.per_host,
+        delay_seconds=args.delay,
+        max_pages=args.max_pages
+    )
+
+    def progress(url, result, stats):
+        done = stats['fetched'] + stats['failed'] + stats['skipped']
+        print(f"{'✅' if result.get('success') else '❌'} [{done}/{stats['discovered']}] {url}")
+
+    print(f"🕷️ Rastreando {crawler.catalog_url}")
+    try:
+        # Ctrl+C durante el rastreo lo para el propio crawler (queda como cancelado y devuelve el avance)
+        stats = crawler.crawl(restart=args.restart, progress=progress)
+    except KeyboardInterrupt:
+        print("⏹️ Rastreo interrumpido; vuelve a lanzarlo para continuar")
+        return 130
+
+    print(f"💾 {stats['fetched']} fichas nuevas, {stats['skipped']} ya guardadas y {stats['failed']} con error "
+          f"en {args.store}")
+    if stats['status'] == CRAWL_CANCELLED:
+        print("⏹️ Rastreo interrumpido; vuelve a lanzarlo para continuar")
+        return 130
+    if stats['status'] == CRAWL_FAILED:
+        print(f"❌ Rastreo {stats['status']}: {stats['last_error']}")
+        return 1
+    return 0 if not stats['failed'] else 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,12 +2,15 @@ from flask import Flask
 from flask_cors import CORS
 from flasgger import Swagger
 from config.db_settings import DbSettings
+from config.ollama_settings import get_ollama_settings
 from routes.health_bp import health_bp
 from routes.auth_bp import auth_bp
 from routes.scraping_bp import scraping_bp
 from routes.simple_scraping_bp import simple_scraping_bp
 from routes.chat_bp import chat_bp
 from config.swagger_config import swagger_config, template
+from services.model_warmer import start_model_warmer
+from services.faq_store import get_faq_store
 from dotenv import load_dotenv
 import os
 
@@ -17,31 +20,51 @@ load_dotenv(env_path)
 
 db_settings = DbSettings()
 
-app = Flask(__name__)
-
-# Configurar CORS para permitir llamadas desde cualquier origen
-CORS(app, 
-     origins="*",  # Permite todas las URLs de origen
-     methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],  # Métodos HTTP permitidos
-     allow_headers=["Content-Type", "Authorization", "X-Requested-With"],  # Headers permitidos
-     supports_credentials=True  # Permite envío de cookies/credenciales
-)
-
-# Initialize Swagger
-swagger = Swagger(
-    app,
-    template=template,
-    config=swagger_config
-)
-
-# Register blueprints
-app.register_blueprint(health_bp)
-app.register_blueprint(auth_bp)
-app.register_blueprint(scraping_bp)
-app.register_blueprint(simple_scraping_bp)
-app.register_blueprint(chat_bp)
+
+def create_app():
+    """Create and configure the Flask application"""
+    app = Flask(__name__)
+
+    # Configurar CORS para permitir llamadas desde cualquier origen
+    CORS(app, 
+         origins="*",  # Permite todas las URLs de origen
+         methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],  # Métodos HTTP permitidos
+         # Headers permitidos (X-Request-Timeout, X-Cache-Bypass y Cache-Control los usan los endpoints de chat)
+         allow_headers=["Content-Type", "Authorization", "X-Requested-With", "X-Request-Timeout", "X-Cache-Bypass",
+                        "Cache-Control"],
+         # Headers de respuesta legibles desde el navegador (caché, FAQ precalculadas y saturación)
+         expose_headers=["X-Cache", "X-Precomputed", "Age", "Retry-After"],
+         supports_credentials=True  # Permite envío de cookies/credenciales
+    )
+
+    # Initialize Swagger
+    Swagger(
+        app,
+        template=template,
+        config=swagger_config
+    )
+
+    # Register blueprints
+    app.register_blueprint(health_bp)
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(scraping_bp)
+    app.register_blueprint(simple_scraping_bp)
+    app.register_blueprint(chat_bp)
+
+    # Cargar las respuestas precalculadas de las FAQ (FAQ_STORE_PATH) antes de la primera petición
+    get_faq_store()
+
+    return app
+
+
+app = create_app()
 
 if __name__ == '__main__':
+    # Precargar el modelo en Ollama y mantenerlo caliente (OLLAMA_WARMUP_ON_STARTUP / OLLAMA_KEEP_WARM_INTERVAL).
+    # Con debug=True el reloader ejecuta este bloque en dos procesos; solo el hijo sirve peticiones
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_model_warmer(get_ollama_settings())
+
     print("🚀 Starting Flask app with Swagger UI...")
     print("📖 Swagger UI available at: http://localhost:8000/docs")
     print("🏥 Health check at: http://localhost:8000/health")
@@ -51,9 +74,3 @@ if __name__ == '__main__':
     print("💬 Chat endpoint at: http://localhost:8000/chat")
     print("🌍 CORS habilitado para todos los orígenes")
     app.run(debug=True, host='0.0.0.0', port=8000)
-    print("🏥 Health check at: http://localhost:8000/health")
-    print("🔐 Login endpoint at: http://localhost:8000/login")
-    print("🌐 Web scraping endpoint at: http://localhost:8000/scrape/tarragona-padron/quick")
-    print("📄 Padron info endpoint at: http://localhost:8000/padron-info")
-    print("💬 Chat endpoint at: http://localhost:8000/chat")
-    app.run(debug=True, host='0.0.0.0', port=8000)
@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Boolean, Column, DateTime, Integer, String, Text
+
+from models.user_model import Base
+
+
+class ChatLogModel(Base):
+    __tablename__ = 'chat_logs'
+
+    id = Column(BigInteger().with_variant(Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    username = Column(String(80), nullable=True, index=True)
+    endpoint = Column(String(32), nullable=False)
+    model = Column(String(120), nullable=True)
+    query = Column(Text, nullable=True)
+    response = Column(Text, nullable=True)
+    success = Column(Boolean, nullable=False)
+    cached = Column(Boolean, nullable=False, default=False)
+    cache_type = Column(String(16), nullable=True)
+    error = Column(String(500), nullable=True)
+    # Contadores de Ollama (solo en las respuestas generadas; las servidas desde caché no consumen tokens)
+    prompt_eval_count = Column(Integer, nullable=True)
+    eval_count = Column(Integer, nullable=True)
+    # Duraciones de Ollama en nanosegundos
+    total_duration = Column(BigInteger, nullable=True)
+    prompt_eval_duration = Column(BigInteger, nullable=True)
+    eval_duration = Column(BigInteger, nullable=True)
+    latency_ms = Column(Integer, nullable=True)
+
+    def __repr__(self):
+        return f'<ChatLog {self.id} {self.username} {self.model}>'
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field, EmailStr
-from typing import Optional
+from pydantic import BaseModel, Field, EmailStr, field_validator
+from typing import Optional, List
 from datetime import datetime, date
 
 class DTO:
@@ -11,6 +11,20 @@ class DTO:
 class ChatRequest(BaseModel):
     """DTO para las requests del endpoint de chat"""
     query: str = Field(..., min_length=1, description="La consulta del usuario para el modelo")
+    rag: bool = Field(False, description="Si es True la respuesta se apoya en las páginas del padrón indexadas")
+    # Límites de generación: solo pueden reducir los del presupuesto de la clase de petición
+    max_prompt_tokens: Optional[int] = Field(None, ge=16, le=131072, description="Tokens máximos del prompt; el exceso se recorta por el centro")
+    num_predict: Optional[int] = Field(None, ge=1, le=8192, description="Tokens máximos a generar")
+    num_ctx: Optional[int] = Field(None, ge=256, le=131072, description="Tamaño de la ventana de contexto")
+    temperature: Optional[float] = Field(None, ge=0.0, le=2.0, description="Temperatura de muestreo")
+
+    @field_validator('query')
+    @classmethod
+    def query_not_blank(cls, value: str) -> str:
+        value = value.strip()
+        if not value:
+            raise ValueError('La query no puede estar vacía')
+        return value
     
     class Config:
         json_schema_extra = {
@@ -19,13 +33,37 @@ class ChatRequest(BaseModel):
             }
         }
 
+class ChatBatchRequest(BaseModel):
+    """DTO para las requests del endpoint de chat por lotes"""
+    queries: List[ChatRequest] = Field(..., min_length=1, description="Lista de consultas a procesar")
+    concurrency: Optional[int] = Field(None, ge=1, description="Generaciones simultáneas (limitado por CHAT_BATCH_MAX_CONCURRENCY)")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "queries": [
+                    {"query": "¿Qué documentos necesito para empadronarme?"},
+                    {"query": "¿Dónde están las oficinas OMAC?"}
+                ],
+                "concurrency": 2
+            }
+        }
+
 class ChatResponse(BaseModel):
     """DTO para las respuestas del endpoint de chat"""
     success: bool = Field(..., description="Indica si la operación fue exitosa")
     response: Optional[str] = Field(None, description="La respuesta del modelo")
-    model: Optional[str] = Field(None, description="El nombre del modelo utilizado")
+    model: Optional[str] = Field(None, description="El nombre del modelo utilizado (elegido por el enrutador)")
     query: Optional[str] = Field(None, description="La consulta original del usuario")
     error: Optional[str] = Field(None, description="Mensaje de error si la operación falló")
+    cached: Optional[bool] = Field(None, description="Indica si la respuesta se sirvió desde la caché")
+    cache_type: Optional[str] = Field(None, description="Tipo de caché que respondió: exact, semantic o faq")
+    precomputed: Optional[bool] = Field(None, description="Indica si la respuesta es una FAQ precalculada")
+    coalesced: Optional[bool] = Field(None, description="Indica si la respuesta se compartió con una generación idéntica en curso")
+    budget: Optional[dict] = Field(None, description="Presupuesto de generación aplicado (límites, tokens del prompt y si se recortó)")
+    routing_reason: Optional[str] = Field(None, description="Motivo de la elección del modelo: disabled, overload, intent, length o short")
+    sources: Optional[List[dict]] = Field(None, description="Pasajes del padrón usados como contexto (modo RAG)")
+    usage: Optional[dict] = Field(None, description="Contadores de tokens y duraciones (ns) de Ollama de la generación")
     
     class Config:
         json_schema_extra = {
@@ -33,7 +71,8 @@ class ChatResponse(BaseModel):
                 "success": True,
                 "response": "La inteligencia artificial es...",
                 "model": "gemma:7b",
-                "query": "Explícame qué es la inteligencia artificial"
+                "query": "Explícame qué es la inteligencia artificial",
+                "cached": False
             }
         }
 
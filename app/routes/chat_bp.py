@@ -1,18 +1,52 @@
-from flask import Blueprint, request, jsonify
-from config.ollama_settings import OllamaSettings 
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from config.ollama_settings import get_ollama_settings
 from services.chat_service import ChatService
+from services.chat_jobs import JobStoreFull, get_chat_job_manager
+from services.chat_log_writer import USAGE_GROUPS, get_chat_log_writer, record_chat, stream_response
+from services.chat_request import (
+    cache_bypass_requested, parse_chat_request, request_budget, request_deadline, request_priority,
+    request_timeout, request_username
+)
+from config.chat_log_settings import get_chat_log_settings
+from services.conversation_store import get_conversation_store
+from services.deadline import Deadline
+from services.generation_budget import BUDGET_BATCH, GenerationBudget, get_generation_budget
+from models.dto import ChatBatchRequest
 from flasgger import swag_from
+from pydantic import ValidationError
+from datetime import date
+from typing import Optional
+import itertools
+import json
+import time
 
 chat_bp = Blueprint('chat', __name__)
 
-ollama_settings = OllamaSettings()
+ollama_settings = get_ollama_settings()
 
 @chat_bp.route('/chat', methods=['POST'])
 @swag_from({
     'tags': ['Chat'],
     'summary': 'Chat with Gemma:7B Model',
-    'description': 'Send a query to the local Gemma:7B model and get a response',
+    'description': 'Send a query to the local Gemma:7B model and get a response. Identical queries are '
+                   'answered from an in-memory cache (see `cached` and the `X-Cache` header). With `rag: true` '
+                   'the most relevant passages of the indexed padrón pages are added to the prompt and '
+                   'returned in `sources`.',
     'parameters': [
+        {
+            'name': 'X-Cache-Bypass',
+            'in': 'header',
+            'required': False,
+            'type': 'string',
+            'description': 'Set to "true" to skip the response cache and force a new generation'
+        },
+        {
+            'name': 'X-Request-Timeout',
+            'in': 'header',
+            'required': False,
+            'type': 'number',
+            'description': 'Deadline in seconds; the generation is aborted when it passes (default CHAT_DEFAULT_DEADLINE)'
+        },
         {
             'name': 'body',
             'in': 'body',
@@ -24,7 +58,16 @@ ollama_settings = OllamaSettings()
                         'type': 'string',
                         'description': 'The user query to send to the model',
                         'example': 'Explícame qué es la inteligencia artificial'
-                    }
+                    },
+                    'rag': {
+                        'type': 'boolean',
+                        'description': 'Ground the answer on the indexed padrón pages',
+                        'example': False
+                    },
+                    'max_prompt_tokens': {'type': 'integer', 'description': 'Prompt token limit; longer prompts are cut in the middle'},
+                    'num_predict': {'type': 'integer', 'description': 'Maximum tokens to generate'},
+                    'num_ctx': {'type': 'integer', 'description': 'Context window size'},
+                    'temperature': {'type': 'number', 'description': 'Sampling temperature (0-2)'}
                 },
                 'required': ['query']
             }
@@ -38,8 +81,60 @@ ollama_settings = OllamaSettings()
                 'properties': {
                     'success': {'type': 'boolean'},
                     'response': {'type': 'string'},
-                    'model': {'type': 'string'},
-                    'query': {'type': 'string'}
+                    'model': {'type': 'string', 'description': 'Model chosen by the router (fast or quality)'},
+                    'routing_reason': {'type': 'string', 'enum': ['disabled', 'overload', 'intent', 'length', 'short']},
+                    'budget': {
+                        'type': 'object',
+                        'description': 'Generation budget applied (class, limits, prompt tokens, truncated)'
+                    },
+                    'query': {'type': 'string'},
+                    'cached': {'type': 'boolean'},
+                    'cache_type': {'type': 'string', 'enum': ['exact', 'semantic', 'faq']},
+                    'precomputed': {'type': 'boolean', 'description': 'Answer served from the precomputed FAQ store'},
+                    'usage': {
+                        'type': 'object',
+                        'description': 'Ollama token counters and durations (ns) of the generation',
+                        'properties': {
+                            'prompt_eval_count': {'type': 'integer'},
+                            'eval_count': {'type': 'integer'},
+                            'total_duration': {'type': 'integer'},
+                            'prompt_eval_duration': {'type': 'integer'},
+                            'eval_duration': {'type': 'integer'}
+                        }
+                    },
+                    'sources': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'url': {'type': 'string'},
+                                'title': {'type': 'string'},
+                                'score': {'type': 'number'}
+                            }
+                        }
+                    }
+                }
+            }
+        },
+        '429': {
+            'description': 'Server overloaded - retry after the number of seconds in the Retry-After header',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'success': {'type': 'boolean'},
+                    'error': {'type': 'string'},
+                    'retry_after': {'type': 'integer'}
+                }
+            }
+        },
+        '504': {
+            'description': 'Deadline exceeded - the generation was aborted',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'success': {'type': 'boolean'},
+                    'error': {'type': 'string'},
+                    'deadline_exceeded': {'type': 'boolean'}
                 }
             }
         },
@@ -70,6 +165,12 @@ def chat():
     Recibe una query del usuario y retorna la respuesta del modelo
     """
     
+    started_at = time.perf_counter()
+    try:
+        deadline = _request_deadline()
+    except ValueError as e:
+        return _invalid_header_response(e)
+
     try:
         # Obtener los datos del request
         data = request.get_json()
@@ -88,11 +189,27 @@ def chat():
                 'error': 'La query no puede estar vacía'
             }), 400
 
+        try:
+            chat_request = parse_chat_request(data)
+            budget = _request_budget(chat_request)
+        except ValidationError as e:
+            return _invalid_request_response(e)
+
         chat_service = ChatService(ollama_settings=ollama_settings)
 
+        use_cache = not _cache_bypass_requested()
+
         # Llamar al servicio de chat
-        response = chat_service.send_message(query=query)
+        response = chat_service.send_message(query=query, use_cache=use_cache, priority=_request_priority(),
+                                             rag=chat_request.rag, deadline=deadline, budget=budget)
+        _log_chat('chat', query, response, started_at)
 
+        # Servidor saturado: rechazo rápido con 429
+        if response.get('retry_after') is not None:
+            return _overloaded_response(response.get('error'), response['retry_after'])
+
+        if response.get('deadline_exceeded'):
+            return _deadline_response(response.get('error'))
         
         # Si hubo un error en el servicio, retornar error 500
         if not response.get('success', False):
@@ -102,7 +219,11 @@ def chat():
             }), 500
         
         # Retornar la respuesta exitosa
-        return jsonify(response), 200
+        cache_status = 'HIT' if response.get('cached') else ('MISS' if use_cache else 'BYPASS')
+        headers = {'X-Cache': cache_status}
+        if response.get('precomputed'):
+            headers['X-Precomputed'] = 'true'
+        return jsonify(response), 200, headers
         
     except Exception as e:
         return jsonify({
@@ -110,11 +231,760 @@ def chat():
             'error': f'Error interno del servidor: {str(e)}'
         }), 500
 
+def _request_username() -> Optional[str]:
+    """Usuario del token firmado de /login, o None si la petición es anónima o el token no es válido"""
+    return request_username(request.headers.get)
+
+def _log_chat(endpoint: str, query: str, response: dict, started_at: float):
+    """Añade la petición al registro de chats (escritura diferida, no espera a la base de datos)"""
+    record_chat(get_chat_log_writer(), endpoint, _request_username(), query, response,
+                latency_ms=(time.perf_counter() - started_at) * 1000)
+
+def _request_priority() -> int:
+    """Prioridad en la cola de admisión (alta solo con un token válido)"""
+    return request_priority(_request_username())
+
+def _overloaded_response(message: str, retry_after: int):
+    """Respuesta 429 con Retry-After cuando el control de admisión rechaza la petición"""
+    return jsonify({
+        'success': False,
+        'error': message,
+        'retry_after': retry_after
+    }), 429, {'Retry-After': str(retry_after)}
+
+def _request_budget(data) -> GenerationBudget:
+    """
+    Presupuesto de generación de la petición según su clase y los límites del body
+
+    Raises:
+        ValidationError: Si los límites del body no son válidos
+    """
+    return request_budget(data, _request_username())
+
+def _invalid_request_response(error: ValidationError):
+    """Respuesta 400 con los errores de validación del DTO"""
+    return jsonify({
+        'error': f'Request inválido: {error.errors(include_url=False, include_context=False)}'
+    }), 400
+
+def _invalid_header_response(error: ValueError):
+    """Respuesta 400 cuando una cabecera de la petición no es válida"""
+    return jsonify({
+        'error': str(error)
+    }), 400
+
+def _request_timeout() -> Optional[float]:
+    """
+    Segundos de plazo: cabecera X-Request-Timeout o CHAT_DEFAULT_DEADLINE (None = sin plazo)
+
+    Raises:
+        ValueError: Si X-Request-Timeout no es un número finito mayor que 0
+    """
+    return request_timeout(request.headers.get)
+
+def _request_deadline() -> Optional[Deadline]:
+    """
+    Plazo de la petición, que empieza a contar ahora
+
+    Raises:
+        ValueError: Si X-Request-Timeout no es un número finito mayor que 0
+    """
+    return request_deadline(request.headers.get)
+
+def _deadline_response(message: str):
+    """Respuesta 504 cuando se agota el plazo de la petición y se aborta la generación"""
+    return jsonify({
+        'success': False,
+        'error': message,
+        'deadline_exceeded': True
+    }), 504
+
+def _cache_bypass_requested() -> bool:
+    """Indica si el cliente pidió saltarse la caché (X-Cache-Bypass o Cache-Control: no-cache)"""
+    return cache_bypass_requested(request.headers.get)
+
+def _sse_event(event: str, data: dict) -> str:
+    """Formatea un evento Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@chat_bp.route('/chat/stream', methods=['POST'])
+@swag_from({
+    'tags': ['Chat'],
+    'summary': 'Chat with Gemma:7B Model (streaming)',
+    'description': 'Send a query to the local Gemma:7B model and receive the answer as Server-Sent Events. '
+                   'Each `token` event carries a text fragment as soon as the model produces it; a final '
+                   '`done` event carries the model name and timing stats, or an `error` event if generation fails. '
+                   'Closing the connection aborts the generation unless another client is following it.',
+    'produces': ['text/event-stream'],
+    'parameters': [
+        {
+            'name': 'X-Request-Timeout',
+            'in': 'header',
+            'required': False,
+            'type': 'number',
+            'description': 'Deadline in seconds; the generation is aborted when it passes (default CHAT_DEFAULT_DEADLINE)'
+        },
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'query': {
+                        'type': 'string',
+                        'description': 'The user query to send to the model',
+                        'example': 'Explícame qué es la inteligencia artificial'
+                    }
+                },
+                'required': ['query']
+            }
+        }
+    ],
+    'responses': {
+        '200': {
+            'description': 'Stream of SSE events (token, done, error)'
+        },
+        '429': {
+            'description': 'Server overloaded - retry after the number of seconds in the Retry-After header',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'success': {'type': 'boolean'},
+                    'error': {'type': 'string'},
+                    'retry_after': {'type': 'integer'}
+                }
+            }
+        },
+        '504': {
+            'description': 'Deadline exceeded - the generation was aborted',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'success': {'type': 'boolean'},
+                    'error': {'type': 'string'},
+                    'deadline_exceeded': {'type': 'boolean'}
+                }
+            }
+        },
+        '400': {
+            'description': 'Bad request - missing or invalid query',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'error': {'type': 'string'}
+                }
+            }
+        }
+    }
+})
+def chat_stream():
+    """
+    Endpoint para chatear con el modelo Gemma:7B en modo streaming
+    Retransmite los fragmentos de Ollama al cliente como eventos SSE
+    """
+    started_at = time.perf_counter()
+    try:
+        deadline = _request_deadline()
+    except ValueError as e:
+        return _invalid_header_response(e)
+    data = request.get_json(silent=True)
+
+    # Validar que se haya enviado la query
+    if not data or 'query' not in data:
+        return jsonify({
+            'error': 'Se requiere el campo "query" en el body del request'
+        }), 400
+
+    query: str = data['query'].strip()
+
+    # Validar que la query no esté vacía
+    if not query:
+        return jsonify({
+            'error': 'La query no puede estar vacía'
+        }), 400
+
+    try:
+        budget = _request_budget(data)
+    except ValidationError as e:
+        return _invalid_request_response(e)
+
+    chat_service = ChatService(ollama_settings=ollama_settings)
+    events = chat_service.stream_message(query=query, priority=_request_priority(), deadline=deadline, budget=budget)
+
+    # El primer evento llega cuando la petición ya ha sido admitida; si el
+    # servidor está saturado se responde 429 antes de abrir el stream
+    first_event = next(events, None)
+    if first_event and first_event['type'] == 'error' and first_event.get('retry_after') is not None:
+        _log_chat('stream', query, stream_response('', first_event), started_at)
+        return _overloaded_response(first_event['error'], first_event['retry_after'])
+    if first_event and first_event['type'] == 'error' and first_event.get('deadline_exceeded'):
+        _log_chat('stream', query, stream_response('', first_event), started_at)
+        return _deadline_response(first_event['error'])
+
+    def generate():
+        chunks = []
+        final_event = None
+        try:
+            for event in itertools.chain([first_event] if first_event else [], events):
+                if event['type'] in ('done', 'error'):
+                    final_event = dict(event)
+                event_type = event.pop('type')
+                if event_type == 'token':
+                    chunks.append(event.get('response', ''))
+                elif event_type == 'done':
+                    event['query'] = query
+                yield _sse_event(event_type, event)
+        finally:
+            # Si el cliente se desconecta, se deja la generación compartida (y se aborta si nadie más la sigue)
+            events.close()
+            _log_chat('stream', query, stream_response(''.join(chunks), final_event), started_at)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+@chat_bp.route('/chat/batch', methods=['POST'])
+@swag_from({
+    'tags': ['Chat'],
+    'summary': 'Batch Chat with Gemma:7B Model',
+    'description': 'Send a list of queries in a single call. Queries are dispatched to Ollama with a bounded '
+                   'concurrency and results are returned in the original order, each with its own error if it '
+                   'failed. With `?stream=true` the results are sent as NDJSON lines as soon as each one finishes.',
+    'parameters': [
+        {
+            'name': 'stream',
+            'in': 'query',
+            'required': False,
+            'type': 'boolean',
+            'description': 'Return NDJSON lines (one per query, in completion order) instead of a single JSON'
+        },
+        {
+            'name': 'X-Request-Timeout',
+            'in': 'header',
+            'required': False,
+            'type': 'number',
+            'description': 'Deadline in seconds for each query, counted from when it starts '
+                           '(default CHAT_DEFAULT_DEADLINE)'
+        },
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'queries': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'query': {'type': 'string'}
+                            },
+                            'required': ['query']
+                        }
+                    },
+                    'concurrency': {
+                        'type': 'integer',
+                        'description': 'Maximum simultaneous generations (capped by CHAT_BATCH_MAX_CONCURRENCY)'
+                    }
+                },
+                'required': ['queries']
+            }
+        }
+    ],
+    'responses': {
+        '200': {
+            'description': 'Per-query results',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'success': {'type': 'boolean'},
+                    'total': {'type': 'integer'},
+                    'succeeded': {'type': 'integer'},
+                    'failed': {'type': 'integer'},
+                    'results': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'index': {'type': 'integer'},
+                                'success': {'type': 'boolean'},
+                                'response': {'type': 'string'},
+                                'model': {'type': 'string'},
+                                'query': {'type': 'string'},
+                                'error': {'type': 'string'}
+                            }
+                        }
+                    }
+                }
+            }
+        },
+        '400': {
+            'description': 'Bad request - invalid body or too many queries',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'error': {'type': 'string'}
+                }
+            }
+        }
+    }
+})
+def chat_batch():
+    """
+    Endpoint para enviar un lote de consultas al modelo Gemma:7B
+    """
+    try:
+        batch = ChatBatchRequest.model_validate(request.get_json(silent=True) or {})
+    except ValidationError as e:
+        return jsonify({
+            'error': f'Request inválido: {e.errors(include_url=False, include_context=False)}'
+        }), 400
+
+    if len(batch.queries) > ollama_settings.chat_batch_max_items:
+        return jsonify({
+            'error': f'El lote no puede superar {ollama_settings.chat_batch_max_items} consultas'
+        }), 400
+
+    queries = [item.query for item in batch.queries]
+    concurrency = min(batch.concurrency or ollama_settings.chat_batch_max_concurrency,
+                      ollama_settings.chat_batch_max_concurrency)
+
+    chat_service = ChatService(ollama_settings=ollama_settings)
+    started_at = time.perf_counter()
+    try:
+        # Cada consulta tiene su propio plazo: un lote grande no puede caber en el de una sola petición
+        item_timeout = _request_timeout()
+    except ValueError as e:
+        return _invalid_header_response(e)
+    budget = get_generation_budget(BUDGET_BATCH)
+
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        def generate():
+            for result in chat_service.iter_batch(queries, concurrency=concurrency, item_timeout=item_timeout,
+                                                  budget=budget):
+                _log_chat('batch', queries[result['index']], result, started_at)
+                yield json.dumps(result, ensure_ascii=False) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    results = chat_service.send_batch(queries, concurrency=concurrency, item_timeout=item_timeout,
+                                      budget=budget)
+    for query, result in zip(queries, results):
+        _log_chat('batch', query, result, started_at)
+    succeeded = sum(1 for result in results if result.get('success'))
+
+    return jsonify({
+        'success': True,
+        'total': len(results),
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'results': results
+    }), 200
+
+@chat_bp.route('/chat/jobs', methods=['POST'])
+@swag_from({
+    'tags': ['Chat'],
+    'summary': 'Submit Asynchronous Chat Job',
+    'description': 'Queue a query for background generation and return a job id immediately. '
+                   'Poll GET /chat/jobs/{job_id} for the status, partial output and final result.',
+    'parameters': [
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'query': {
+                        'type': 'string',
+                        'description': 'The user query to send to the model',
+                        'example': 'Resume los requisitos para empadronarse en Tarragona'
+                    }
+                },
+                'required': ['query']
+            }
+        }
+    ],
+    'responses': {
+        '202': {
+            'description': 'Job accepted',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'success': {'type': 'boolean'},
+                    'job_id': {'type': 'string'},
+                    'status': {'type': 'string'},
+                    'status_url': {'type': 'string'}
+                }
+            }
+        },
+        '400': {
+            'description': 'Bad request - missing or invalid query',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'error': {'type': 'string'}
+                }
+            }
+        },
+        '429': {
+            'description': 'Too many pending jobs',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'success': {'type': 'boolean'},
+                    'error': {'type': 'string'},
+                    'retry_after': {'type': 'integer'}
+                }
+            }
+        }
+    }
+})
+def submit_chat_job():
+    """
+    Endpoint para encolar una consulta y procesarla en segundo plano
+    """
+    data = request.get_json(silent=True)
+
+    # Validar que se haya enviado la query
+    if not data or 'query' not in data:
+        return jsonify({
+            'error': 'Se requiere el campo "query" en el body del request'
+        }), 400
+
+    query: str = data['query'].strip()
+
+    # Validar que la query no esté vacía
+    if not query:
+        return jsonify({
+            'error': 'La query no puede estar vacía'
+        }), 400
+
+    try:
+        budget = _request_budget(data)
+    except ValidationError as e:
+        return _invalid_request_response(e)
+
+    try:
+        job = get_chat_job_manager().submit(query, priority=_request_priority(), budget=budget,
+                                            username=_request_username())
+    except JobStoreFull as e:
+        return _overloaded_response(str(e), 5)
+
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f'/chat/jobs/{job.id}'
+    }), 202
+
+@chat_bp.route('/chat/jobs/<job_id>', methods=['GET'])
+@swag_from({
+    'tags': ['Chat'],
+    'summary': 'Get Asynchronous Chat Job',
+    'description': 'Get the status (queued, running, completed, failed), the partial output generated so far '
+                   'and, once completed, the final result of a chat job.',
+    'parameters': [
+        {
+            'name': 'job_id',
+            'in': 'path',
+            'required': True,
+            'type': 'string'
+        }
+    ],
+    'responses': {
+        '200': {
+            'description': 'Job state',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'success': {'type': 'boolean'},
+                    'job_id': {'type': 'string'},
+                    'status': {'type': 'string'},
+                    'query': {'type': 'string'},
+                    'partial_response': {'type': 'string'},
+                    'result': {'type': 'object'},
+                    'error': {'type': 'string'}
+                }
+            }
+        },
+        '404': {
+            'description': 'Unknown or expired job',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'success': {'type': 'boolean'},
+                    'error': {'type': 'string'}
+                }
+            }
+        }
+    }
+})
+def get_chat_job(job_id):
+    """
+    Endpoint para consultar el estado de un trabajo de chat
+    """
+    job = get_chat_job_manager().get(job_id)
+
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': f'Trabajo {job_id} no encontrado o expirado'
+        }), 404
+
+    return jsonify({'success': True, **job.to_dict()}), 200
+
+@chat_bp.route('/chat/sessions', methods=['POST'])
+@swag_from({
+    'tags': ['Chat'],
+    'summary': 'Create Conversation Session',
+    'description': 'Create a server-side conversation. Follow-up turns sent to /chat/sessions/{session_id}/messages '
+                   'only carry the new message; the model state (Ollama `context`) is kept on the server.',
+    'responses': {
+        '201': {
+            'description': 'Session created',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'success': {'type': 'boolean'},
+                    'session_id': {'type': 'string'}
+                }
+            }
+        }
+    }
+})
+def create_chat_session():
+    """
+    Endpoint para crear una conversación guardada en el servidor
+    """
+    session = get_conversation_store().create()
+    return jsonify({'success': True, 'session_id': session.id}), 201
+
+@chat_bp.route('/chat/sessions/<session_id>/messages', methods=['POST'])
+@swag_from({
+    'tags': ['Chat'],
+    'summary': 'Send Message in Conversation Session',
+    'description': 'Send the next user message of a conversation. Only the new message is sent to the model, '
+                   'together with the context returned by the previous turn.',
+    'parameters': [
+        {
+            'name': 'session_id',
+            'in': 'path',
+            'required': True,
+            'type': 'string'
+        },
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'query': {
+                        'type': 'string',
+                        'description': 'The new user message',
+                        'example': '¿Y si soy menor de edad?'
+                    }
+                },
+                'required': ['query']
+            }
+        }
+    ],
+    'responses': {
+        '200': {
+            'description': 'Successful response from the model',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'success': {'type': 'boolean'},
+                    'response': {'type': 'string'},
+                    'model': {'type': 'string'},
+                    'query': {'type': 'string'},
+                    'session_id': {'type': 'string'},
+                    'turn': {'type': 'integer'}
+                }
+            }
+        },
+        '400': {
+            'description': 'Bad request - missing or invalid query',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'error': {'type': 'string'}
+                }
+            }
+        },
+        '404': {
+            'description': 'Unknown or expired session',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'success': {'type': 'boolean'},
+                    'error': {'type': 'string'}
+                }
+            }
+        },
+        '429': {
+            'description': 'Server overloaded - retry after the number of seconds in the Retry-After header'
+        },
+        '500': {
+            'description': 'Internal server error',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'success': {'type': 'boolean'},
+                    'error': {'type': 'string'}
+                }
+            }
+        }
+    }
+})
+def send_chat_session_message(session_id):
+    """
+    Endpoint para enviar el siguiente mensaje de una conversación
+    """
+    started_at = time.perf_counter()
+    try:
+        deadline = _request_deadline()
+    except ValueError as e:
+        return _invalid_header_response(e)
+    session = get_conversation_store().get(session_id)
+    if session is None:
+        return jsonify({
+            'success': False,
+            'error': f'Conversación {session_id} no encontrada o expirada'
+        }), 404
+
+    data = request.get_json(silent=True)
+
+    # Validar que se haya enviado la query
+    if not data or 'query' not in data:
+        return jsonify({
+            'error': 'Se requiere el campo "query" en el body del request'
+        }), 400
+
+    query: str = data['query'].strip()
+
+    # Validar que la query no esté vacía
+    if not query:
+        return jsonify({
+            'error': 'La query no puede estar vacía'
+        }), 400
+
+    try:
+        budget = _request_budget(data)
+    except ValidationError as e:
+        return _invalid_request_response(e)
+
+    chat_service = ChatService(ollama_settings=ollama_settings)
+    response = chat_service.send_session_message(session, query, priority=_request_priority(), deadline=deadline,
+                                                 budget=budget)
+    _log_chat('session', query, response, started_at)
+
+    if response.get('retry_after') is not None:
+        return _overloaded_response(response.get('error'), response['retry_after'])
+
+    if response.get('deadline_exceeded'):
+        return _deadline_response(response.get('error'))
+
+    if not response.get('success', False):
+        return jsonify({
+            'success': False,
+            'error': response.get('error', 'Error desconocido')
+        }), 500
+
+    return jsonify(response), 200
+
+@chat_bp.route('/chat/sessions/<session_id>', methods=['GET'])
+@swag_from({
+    'tags': ['Chat'],
+    'summary': 'Get Conversation Session',
+    'description': 'Get the stored turns of a conversation',
+    'parameters': [
+        {
+            'name': 'session_id',
+            'in': 'path',
+            'required': True,
+            'type': 'string'
+        }
+    ],
+    'responses': {
+        '200': {
+            'description': 'Conversation history',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'success': {'type': 'boolean'},
+                    'session_id': {'type': 'string'},
+                    'turns': {'type': 'array', 'items': {'type': 'object'}},
+                    'context_tokens': {'type': 'integer'}
+                }
+            }
+        },
+        '404': {
+            'description': 'Unknown or expired session'
+        }
+    }
+})
+def get_chat_session(session_id):
+    """
+    Endpoint para consultar una conversación
+    """
+    session = get_conversation_store().get(session_id)
+    if session is None:
+        return jsonify({
+            'success': False,
+            'error': f'Conversación {session_id} no encontrada o expirada'
+        }), 404
+
+    return jsonify({'success': True, **session.to_dict()}), 200
+
+@chat_bp.route('/chat/sessions/<session_id>', methods=['DELETE'])
+@swag_from({
+    'tags': ['Chat'],
+    'summary': 'Delete Conversation Session',
+    'description': 'Forget a conversation and its model state',
+    'parameters': [
+        {
+            'name': 'session_id',
+            'in': 'path',
+            'required': True,
+            'type': 'string'
+        }
+    ],
+    'responses': {
+        '200': {
+            'description': 'Session deleted'
+        },
+        '404': {
+            'description': 'Unknown or expired session'
+        }
+    }
+})
+def delete_chat_session(session_id):
+    """
+    Endpoint para eliminar una conversación
+    """
+    if not get_conversation_store().delete(session_id):
+        return jsonify({
+            'success': False,
+            'error': f'Conversación {session_id} no encontrada o expirada'
+        }), 404
+
+    return jsonify({'success': True}), 200
+
 @chat_bp.route('/chat/model-info', methods=['GET'])
 @swag_from({
     'tags': ['Chat'],
     'summary': 'Get Model Information',
-    'description': 'Get information about the current Gemma:7B model',
+    'description': 'Get information about the current Gemma:7B model and the state of every configured Ollama backend',
     'responses': {
         '200': {
             'description': 'Model information retrieved successfully',
@@ -127,7 +997,21 @@ def chat():
                         'properties': {
                             'name': {'type': 'string'},
                             'size': {'type': 'string'},
-                            'modified_at': {'type': 'string'}
+                            'modified_at': {'type': 'string'},
+                            'host': {'type': 'string'},
+                            'backends': {
+                                'type': 'array',
+                                'items': {
+                                    'type': 'object',
+                                    'properties': {
+                                        'host': {'type': 'string'},
+                                        'healthy': {'type': 'boolean'},
+                                        'in_flight': {'type': 'integer'},
+                                        'consecutive_failures': {'type': 'integer'},
+                                        'model_available': {'type': 'boolean'}
+                                    }
+                                }
+                            }
                         }
                     }
                 }
@@ -150,7 +1034,8 @@ def get_model_info():
     Endpoint para obtener información sobre el modelo Gemma:7B
     """
     try:
-        response = ChatService.get_model_info()
+        chat_service = ChatService(ollama_settings=ollama_settings)
+        response = chat_service.get_model_info()
         
         if not response.get('success', False):
             return jsonify(response), 500
@@ -162,3 +1047,185 @@ def get_model_info():
             'success': False,
             'error': f'Error interno del servidor: {str(e)}'
         }), 500
+
+@chat_bp.route('/chat/stats', methods=['GET'])
+@swag_from({
+    'tags': ['Chat'],
+    'summary': 'Get Chat Performance Counters',
+    'description': 'Get the counters of the chat pipeline (response cache hits, misses, evictions...)',
+    'responses': {
+        '200': {
+            'description': 'Chat counters',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'success': {'type': 'boolean'},
+                    'cache': {'type': 'object'}
+                }
+            }
+        }
+    }
+})
+def get_chat_stats():
+    """
+    Endpoint para obtener los contadores del servicio de chat
+    """
+    stats = ChatService.get_stats()
+    stats['jobs'] = get_chat_job_manager().stats()
+    return jsonify(stats), 200
+
+@chat_bp.route('/chat/usage', methods=['GET'])
+@swag_from({
+    'tags': ['Chat'],
+    'summary': 'Get Aggregated Token Usage',
+    'description': 'Aggregate the persisted chat log (CHAT_LOG_ENABLED) by user, model or day: number of requests, '
+                   'cache hits, errors and the sum of the Ollama token counters and durations (ns). Responses served '
+                   'from a cache or shared with an identical in-flight generation count as requests but not as tokens. '
+                   'Requires a login token: users only see their own usage, users listed in CHAT_USAGE_ADMINS see '
+                   'everyone\'s. Tokens are signed with AUTH_TOKEN_SECRET, so a forged, tampered or expired token '
+                   '(including one naming an admin) is rejected with 401.',
+    'parameters': [
+        {
+            'name': 'group_by',
+            'in': 'query',
+            'required': False,
+            'type': 'string',
+            'enum': ['user', 'model', 'day'],
+            'description': 'Aggregation key (default user)'
+        },
+        {
+            'name': 'Authorization',
+            'in': 'header',
+            'required': True,
+            'type': 'string',
+            'description': 'Signed token returned by /login'
+        },
+        {
+            'name': 'username',
+            'in': 'query',
+            'required': False,
+            'type': 'string',
+            'description': 'Only this user (admins only; other users always get their own usage)'
+        },
+        {
+            'name': 'since',
+            'in': 'query',
+            'required': False,
+            'type': 'string',
+            'format': 'date',
+            'description': 'First day included (YYYY-MM-DD)'
+        },
+        {
+            'name': 'until',
+            'in': 'query',
+            'required': False,
+            'type': 'string',
+            'format': 'date',
+            'description': 'Last day included (YYYY-MM-DD)'
+        }
+    ],
+    'responses': {
+        '200': {
+            'description': 'Usage per group and totals',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'success': {'type': 'boolean'},
+                    'group_by': {'type': 'string'},
+                    'usage': {'type': 'array', 'items': {'type': 'object'}},
+                    'totals': {'type': 'object'}
+                }
+            }
+        },
+        '400': {
+            'description': 'Invalid group_by or date',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'error': {'type': 'string'}
+                }
+            }
+        },
+        '401': {
+            'description': 'Missing, forged or expired login token',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'success': {'type': 'boolean'},
+                    'error': {'type': 'string'}
+                }
+            }
+        },
+        '403': {
+            'description': 'Usage of another user requested by a non-admin',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'success': {'type': 'boolean'},
+                    'error': {'type': 'string'}
+                }
+            }
+        },
+        '503': {
+            'description': 'Chat log disabled',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'success': {'type': 'boolean'},
+                    'error': {'type': 'string'}
+                }
+            }
+        }
+    }
+})
+def get_chat_usage():
+    """
+    Endpoint para obtener el consumo de tokens agregado del registro de chats
+    """
+    writer = get_chat_log_writer()
+    if writer is None:
+        return jsonify({
+            'success': False,
+            'error': 'El registro de chats está desactivado (CHAT_LOG_ENABLED)'
+        }), 503
+
+    # Cada usuario ve solo su consumo; los de CHAT_USAGE_ADMINS pueden ver el de todos
+    current_user = _request_username()
+    if current_user is None:
+        return jsonify({
+            'success': False,
+            'error': 'Se requiere un token de /login válido en la cabecera Authorization'
+        }), 401
+
+    username = request.args.get('username') or None
+    if current_user not in get_chat_log_settings().chat_usage_admin_list:
+        if username is not None and username != current_user:
+            return jsonify({
+                'success': False,
+                'error': 'Solo puedes consultar tu propio consumo'
+            }), 403
+        username = current_user
+
+    group_by = request.args.get('group_by', 'user')
+    if group_by not in USAGE_GROUPS:
+        return jsonify({
+            'error': f'group_by debe ser uno de: {", ".join(USAGE_GROUPS)}'
+        }), 400
+
+    try:
+        since = date.fromisoformat(request.args['since']) if request.args.get('since') else None
+        until = date.fromisoformat(request.args['until']) if request.args.get('until') else None
+    except ValueError:
+        return jsonify({
+            'error': 'Las fechas since/until deben tener el formato YYYY-MM-DD'
+        }), 400
+
+    try:
+        usage = writer.usage(group_by, username=username, since=since, until=until)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Error consultando el registro de chats: {str(e)}'
+        }), 500
+
+    return jsonify({'success': True, **usage}), 200
@@ -1,6 +1,10 @@
 from flask import Blueprint, jsonify, request
 from flasgger import swag_from
-from services.scraping_service import ScrapingService
+from config.scraping_settings import get_scraping_settings
+from services.auth_service import AuthService
+from services.catalog_crawler import CrawlAlreadyRunning, get_catalog_crawler
+from services.scrape_cache import age_header, scrape_cached
+from services.scraping_service import TARRAGONA_PADRON_URL, ScrapingService
 
 scraping_bp = Blueprint('scraping', __name__)
 
@@ -117,7 +121,10 @@ def scrape_tarragona_padron():
 @swag_from({
     'tags': ['Web Scraping'],
     'summary': 'Quick Scrape Default Tarragona Padron Page',
-    'description': 'Extract document information from the default Tarragona padron de habitantes webpage',
+    'description': 'Extract document information from the default Tarragona padron de habitantes webpage. '
+                   'The result is cached (stale-while-revalidate): after SCRAPE_CACHE_TTL_SECONDS the cached copy is '
+                   'still served while one background refresh runs, and a failed refresh keeps serving the last good '
+                   'copy. The `Age` header and `cache_age_seconds` give the age of the copy.',
     'responses': {
         '200': {
             'description': 'Successful scraping',
@@ -146,7 +153,11 @@ def scrape_tarragona_padron():
                             'raw_text': {'type': 'string'}
                         }
                     },
-                    'status_code': {'type': 'integer'}
+                    'status_code': {'type': 'integer'},
+                    'cache_age_seconds': {'type': 'number', 'description': 'Seconds since the page was fetched'},
+                    'stale': {'type': 'boolean', 'description': 'Older than SCRAPE_CACHE_TTL_SECONDS (a refresh is running)'},
+                    'refreshing': {'type': 'boolean'},
+                    'last_refresh_error': {'type': 'string', 'description': 'Error of the last failed refresh (the previous copy is served)'}
                 }
             }
         },
@@ -166,15 +177,11 @@ def scrape_tarragona_padron():
 def scrape_tarragona_padron_quick():
     """Quick scrape of the default Tarragona padron webpage"""
     try:
-        # URL por defecto que proporcionaste
-        default_url = "https://seu.tarragona.cat/sta/CarpetaPublic/doEvent?APP_CODE=STA&PAGE_CODE=CATALOGO&DETALLE=6269000003494351199500&lang=ES"
-        
-        # Perform scraping
-        scraping_service = ScrapingService()
-        result = scraping_service.scrape_tarragona_padron_info(default_url)
+        # Perform scraping (servido desde la caché de scraping si está activada)
+        result = scrape_cached(TARRAGONA_PADRON_URL)
         
         if result['success']:
-            return jsonify(result), 200
+            return jsonify(result), 200, age_header(result)
         else:
             return jsonify(result), 500
 
@@ -183,3 +190,141 @@ def scrape_tarragona_padron_quick():
             "success": False,
             "error": f"Unexpected error: {str(e)}"
         }), 500
+
+
+CRAWL_PROGRESS_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'status': {'type': 'string', 'description': 'idle, running, completed, cancelled or failed'},
+        'catalog_url': {'type': 'string'},
+        'store_path': {'type': 'string', 'description': 'JSONL file where each tràmit page is written'},
+        'started_at': {'type': 'number'},
+        'finished_at': {'type': 'number'},
+        'listings': {'type': 'integer', 'description': 'Catalogue listing pages read'},
+        'listing_errors': {'type': 'integer'},
+        'discovered': {'type': 'integer', 'description': 'Distinct tràmit pages found'},
+        'fetched': {'type': 'integer'},
+        'failed': {'type': 'integer'},
+        'skipped': {'type': 'integer', 'description': 'Already stored by a previous run (resume)'},
+        'in_flight': {'type': 'integer'},
+        'queued': {'type': 'integer'},
+        'last_error': {'type': 'string'}
+    }
+}
+
+
+ERROR_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'success': {'type': 'boolean'},
+        'error': {'type': 'string'}
+    }
+}
+
+CRAWL_AUTH_PARAMETER = {
+    'name': 'Authorization',
+    'in': 'header',
+    'required': True,
+    'type': 'string',
+    'description': 'Signed token returned by /login for a user listed in CRAWL_ADMINS'
+}
+
+CRAWL_AUTH_RESPONSES = {
+    '401': {'description': 'Missing, forged or expired login token', 'schema': ERROR_SCHEMA},
+    '403': {'description': 'The user is not listed in CRAWL_ADMINS', 'schema': ERROR_SCHEMA}
+}
+
+
+def _crawl_admin_error():
+    """Respuesta 401/403 si la petición no viene de un usuario de CRAWL_ADMINS, o None si puede seguir"""
+    username = AuthService.username_from_token(request.headers.get('Authorization'))
+    if not username:
+        return jsonify({"success": False, "error": "Se requiere el token de /login en Authorization"}), 401
+    if username not in get_scraping_settings().crawl_admin_list:
+        return jsonify({"success": False, "error": "El usuario no puede gestionar el rastreo del catálogo"}), 403
+    return None
+
+
+@scraping_bp.route('/scrape/catalog/crawl', methods=['POST'])
+@swag_from({
+    'tags': ['Web Scraping'],
+    'summary': 'Start Tràmit Catalogue Crawl',
+    'description': 'Start a background crawl of the seu.tarragona.cat tràmit catalogue (CRAWL_CATALOG_URL). '
+                   'Tràmit pages are fetched concurrently with a per-host limit and a politeness delay, and each '
+                   'one is written to CRAWL_STORE_PATH as it arrives. Pages stored by a previous run are skipped '
+                   'unless `restart` is true. Poll GET /scrape/catalog/crawl for progress. '
+                   'Only users listed in CRAWL_ADMINS can start a crawl.',
+    'parameters': [
+        CRAWL_AUTH_PARAMETER,
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': False,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'restart': {
+                        'type': 'boolean',
+                        'description': 'Clear the store and fetch every page again',
+                        'example': False
+                    }
+                }
+            }
+        }
+    ],
+    'responses': {
+        '202': {'description': 'Crawl started', 'schema': CRAWL_PROGRESS_SCHEMA},
+        **CRAWL_AUTH_RESPONSES,
+        '409': {'description': 'A crawl is already running', 'schema': ERROR_SCHEMA}
+    }
+})
+def start_catalog_crawl():
+    """Lanza el rastreo del catálogo de trámites en segundo plano (solo usuarios de CRAWL_ADMINS)"""
+    error = _crawl_admin_error()
+    if error:
+        return error
+    data = request.get_json(silent=True) or {}
+    try:
+        progress = get_catalog_crawler().start(restart=bool(data.get('restart', False)))
+    except CrawlAlreadyRunning as e:
+        return jsonify({"success": False, "error": str(e)}), 409
+    return jsonify(progress), 202
+
+
+@scraping_bp.route('/scrape/catalog/crawl', methods=['GET'])
+@swag_from({
+    'tags': ['Web Scraping'],
+    'summary': 'Get Tràmit Catalogue Crawl Progress',
+    'description': 'Status and counters of the current (or last) catalogue crawl.',
+    'responses': {
+        '200': {'description': 'Crawl progress', 'schema': CRAWL_PROGRESS_SCHEMA}
+    }
+})
+def get_catalog_crawl():
+    """Avance del rastreo del catálogo"""
+    return jsonify(get_catalog_crawler().progress()), 200
+
+
+@scraping_bp.route('/scrape/catalog/crawl', methods=['DELETE'])
+@swag_from({
+    'tags': ['Web Scraping'],
+    'summary': 'Stop Tràmit Catalogue Crawl',
+    'description': 'Ask the running crawl to stop. Downloads in progress finish and are stored; '
+                   'starting the crawl again resumes from the stored pages. Only users listed in CRAWL_ADMINS '
+                   'can stop a crawl.',
+    'parameters': [CRAWL_AUTH_PARAMETER],
+    'responses': {
+        '200': {'description': 'Stop requested', 'schema': CRAWL_PROGRESS_SCHEMA},
+        **CRAWL_AUTH_RESPONSES,
+        '409': {'description': 'No crawl is running', 'schema': ERROR_SCHEMA}
+    }
+})
+def stop_catalog_crawl():
+    """Pide que pare el rastreo en curso (solo usuarios de CRAWL_ADMINS)"""
+    error = _crawl_admin_error()
+    if error:
+        return error
+    crawler = get_catalog_crawler()
+    if not crawler.cancel():
+        return jsonify({"success": False, "error": "No hay ningún rastreo en curso"}), 409
+    return jsonify(crawler.progress()), 200
@@ -1,6 +1,7 @@
 from flask import Blueprint, jsonify
 from flasgger import swag_from
-from services.scraping_service import ScrapingService
+from services.scrape_cache import age_header, cache_freshness, scrape_cached
+from services.scraping_service import PADRON_SUMMARY, TARRAGONA_PADRON_URL
 
 simple_scraping_bp = Blueprint('simple_scraping', __name__)
 
@@ -8,7 +9,9 @@ simple_scraping_bp = Blueprint('simple_scraping', __name__)
 @swag_from({
     'tags': ['Padron Info'],
     'summary': 'Get Tarragona Padron Information',
-    'description': 'Get simplified information about Tarragona padron de habitantes document',
+    'description': 'Get simplified information about Tarragona padron de habitantes document. The page check is '
+                   'served from the scraping cache (stale-while-revalidate, SCRAPE_CACHE_TTL_SECONDS); '
+                   '`cache_age_seconds` and the `Age` header give the age of the cached copy.',
     'responses': {
         '200': {
             'description': 'Successful information retrieval',
@@ -25,7 +28,11 @@ simple_scraping_bp = Blueprint('simple_scraping', __name__)
                     'key_info': {
                         'type': 'array',
                         'items': {'type': 'string'}
-                    }
+                    },
+                    'cache_age_seconds': {'type': 'number', 'description': 'Seconds since the page was fetched'},
+                    'stale': {'type': 'boolean', 'description': 'Older than SCRAPE_CACHE_TTL_SECONDS (a refresh is running)'},
+                    'refreshing': {'type': 'boolean'},
+                    'last_refresh_error': {'type': 'string', 'description': 'Error of the last failed refresh (the previous copy is served)'}
                 }
             }
         },
@@ -44,39 +51,13 @@ simple_scraping_bp = Blueprint('simple_scraping', __name__)
 def get_padron_info():
     """Get simplified information about Tarragona padron document"""
     try:
-        url = "https://seu.tarragona.cat/sta/CarpetaPublic/doEvent?APP_CODE=STA&PAGE_CODE=CATALOGO&DETALLE=6269000003494351199500&lang=ES"
-        
-        scraping_service = ScrapingService()
-        result = scraping_service.scrape_tarragona_padron_info(url)
+        result = scrape_cached(TARRAGONA_PADRON_URL)
         
         if result['success']:
-            doc_info = result['document_info']
-            
-            # Extraer información clave del texto
-            raw_text = doc_info['raw_text']
-            
             # Información estructurada basada en el contenido real
-            simplified_info = {
-                'success': True,
-                'title': 'Alta al padró d\'habitants - Tarragona',
-                'summary': 'Es la inscripció al padró municipal d\'habitants de la ciutat de Tarragona. El padró municipal és el registre administratiu on consten els veïns del municipi.',
-                'requirements': [
-                    'Documentació d\'identitat segons nacionalitat (DNI, NIE, passaport)',
-                    'Documentació que acrediti el domicili (escriptura, contracte de lloguer, autorització)',
-                    'Per menors d\'edat: llibre de família o certificat de naixement',
-                    'Autorització si és necessària per fer tràmits'
-                ],
-                'key_info': [
-                    'Qualsevol persona major de 16 anys que visqui al municipi pot presentar la sol·licitud',
-                    'Es pot presentar en qualsevol moment',
-                    'La inscripció es realitza a l\'instant a les oficines OMAC',
-                    'El tràmit és gratuït',
-                    'Estrangers no comunitaris han de renovar cada dos anys',
-                    'Presentació a Oficines Municipals d\'Atenció Ciutadana (OMAC)'
-                ]
-            }
+            simplified_info = {'success': True, **PADRON_SUMMARY, **cache_freshness(result)}
             
-            return jsonify(simplified_info), 200
+            return jsonify(simplified_info), 200, age_header(result)
         else:
             return jsonify({
                 'success': False,
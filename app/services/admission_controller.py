@@ -0,0 +1,262 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Any, AsyncIterator, Iterator, Optional
+from config.ollama_settings import get_ollama_settings
+
+# Clases de prioridad: un número menor se atiende antes
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_HIGH: 'high',
+    PRIORITY_NORMAL: 'normal',
+    PRIORITY_LOW: 'low'
+}
+
+
+class AdmissionRejected(Exception):
+    """La petición no se admite: la cola está llena o se agotó su plazo de espera"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    """
+    Petición esperando turno en la cola
+
+    Un hilo espera en ``event``; una corrutina (``acquire_async``) espera en
+    ``future``, que se resuelve en su bucle de eventos.
+    """
+
+    def __init__(self, priority: int, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.priority = priority
+        self.event = threading.Event()
+        self.loop = loop
+        self.future = loop.create_future() if loop is not None else None
+        self.admitted = False
+        self.cancelled = False
+
+    def wake(self):
+        self.event.set()
+        if self.future is not None:
+            try:
+                self.loop.call_soon_threadsafe(self._resolve)
+            except RuntimeError:
+                # El bucle ya se cerró: nadie espera la admisión
+                pass
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(True)
+
+
+class AdmissionController:
+    """
+    Limita las generaciones simultáneas enviadas a Ollama.
+
+    Como máximo ``max_in_flight`` peticiones se ejecutan a la vez; el resto
+    espera en una cola acotada (``max_queue``) ordenada por prioridad y, dentro
+    de la misma prioridad, por orden de llegada. Si la cola está llena o una
+    petición supera su plazo de espera se rechaza con ``AdmissionRejected``.
+    """
+
+    def __init__(self, max_in_flight: int = 2, max_queue: int = 32, default_timeout: float = 30.0):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.default_timeout = default_timeout
+        self._in_flight = 0
+        self._queue: list = []
+        self._queued = 0
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._recent_service_time = 0.0
+
+    def acquire(self, priority: int = PRIORITY_NORMAL, timeout: Optional[float] = None):
+        """
+        Espera turno para ejecutar una generación
+
+        Args:
+            priority (int): Clase de prioridad (PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW)
+            timeout (float, optional): Segundos máximos de espera en la cola
+
+        Raises:
+            AdmissionRejected: Si la cola está llena o se agota el plazo
+        """
+        timeout = self.default_timeout if timeout is None else timeout
+        started_at = time.monotonic()
+
+        waiter = self._enqueue(priority)
+        if waiter is None:
+            return
+
+        waiter.event.wait(max(timeout, 0))
+        self._finish_wait(waiter, started_at)
+
+    async def acquire_async(self, priority: int = PRIORITY_NORMAL, timeout: Optional[float] = None):
+        """
+        Igual que ``acquire`` pero espera turno sin bloquear el bucle de eventos
+
+        Comparte la cola y los huecos con las peticiones síncronas. Si la
+        corrutina se cancela (el cliente se desconecta) mientras espera, sale
+        de la cola; si ya había sido admitida, libera el hueco.
+
+        Raises:
+            AdmissionRejected: Si la cola está llena o se agota el plazo
+        """
+        timeout = self.default_timeout if timeout is None else timeout
+        started_at = time.monotonic()
+
+        waiter = self._enqueue(priority, asyncio.get_running_loop())
+        if waiter is None:
+            return
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), max(timeout, 0))
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter.admitted:
+                    self._in_flight -= 1
+                    self._dispatch()
+                else:
+                    waiter.cancelled = True
+                    self._queued -= 1
+            raise
+
+        self._finish_wait(waiter, started_at)
+
+    def _enqueue(self, priority: int, loop: Optional[asyncio.AbstractEventLoop] = None) -> Optional[_Waiter]:
+        """Admite la petición si hay hueco (devuelve None) o la pone en la cola"""
+        with self._lock:
+            if self._in_flight < self.max_in_flight and self._queued == 0:
+                self._in_flight += 1
+                self._record_admission(0.0)
+                return None
+
+            if self._queued >= self.max_queue:
+                self.rejected_queue_full += 1
+                raise AdmissionRejected("Servidor ocupado: la cola de peticiones está llena", self._retry_after())
+
+            waiter = _Waiter(priority, loop)
+            heapq.heappush(self._queue, (priority, next(self._sequence), waiter))
+            self._queued += 1
+            return waiter
+
+    def _finish_wait(self, waiter: _Waiter, started_at: float):
+        """Tras la espera: registra la admisión o rechaza por tiempo agotado"""
+        with self._lock:
+            if not waiter.admitted:
+                waiter.cancelled = True
+                self._queued -= 1
+                self.rejected_timeout += 1
+                raise AdmissionRejected("Tiempo de espera agotado en la cola de peticiones", self._retry_after())
+            self._record_admission(time.monotonic() - started_at)
+
+    def release(self, service_time: Optional[float] = None):
+        """Libera un hueco y da paso a la siguiente petición de la cola"""
+        with self._lock:
+            if service_time is not None:
+                # Media móvil del tiempo de servicio para estimar Retry-After
+                self._recent_service_time = 0.8 * self._recent_service_time + 0.2 * service_time
+            self._in_flight -= 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, priority: int = PRIORITY_NORMAL, timeout: Optional[float] = None) -> Iterator[None]:
+        """Ocupa un hueco durante el bloque"""
+        self.acquire(priority, timeout)
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started_at)
+
+    @asynccontextmanager
+    async def slot_async(self, priority: int = PRIORITY_NORMAL, timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """Ocupa un hueco durante el bloque ``async with``"""
+        await self.acquire_async(priority, timeout)
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started_at)
+
+    def _dispatch(self):
+        # Debe llamarse con el lock tomado
+        while self._in_flight < self.max_in_flight and self._queue:
+            _, _, waiter = heapq.heappop(self._queue)
+            if waiter.cancelled:
+                continue
+            waiter.admitted = True
+            self._queued -= 1
+            self._in_flight += 1
+            waiter.wake()
+
+    def _record_admission(self, waited: float):
+        self.admitted += 1
+        self._total_wait += waited
+        self._max_wait = max(self._max_wait, waited)
+
+    def _retry_after(self) -> int:
+        # Estimación: tiempo para vaciar la cola actual con los huecos disponibles
+        per_request = self._recent_service_time or 1.0
+        return max(1, int(round(per_request * (self._queued + 1) / max(self.max_in_flight, 1))))
+
+    def queue_depth(self) -> int:
+        """Peticiones esperando en la cola"""
+        with self._lock:
+            return self._queued
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de admisión"""
+        with self._lock:
+            queued_by_priority = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _, waiter in self._queue:
+                if not waiter.cancelled:
+                    queued_by_priority[PRIORITY_NAMES.get(priority, str(priority))] += 1
+
+            return {
+                "max_in_flight": self.max_in_flight,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "queue_depth": self._queued,
+                "queued_by_priority": queued_by_priority,
+                "admitted": self.admitted,
+                "rejected_queue_full": self.rejected_queue_full,
+                "rejected_timeout": self.rejected_timeout,
+                "avg_wait_ms": round(self._total_wait / self.admitted * 1000, 2) if self.admitted else 0.0,
+                "max_wait_ms": round(self._max_wait * 1000, 2)
+            }
+
+
+_admission_controller: Optional[AdmissionController] = None
+_admission_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """Devuelve el control de admisión del proceso (CHAT_MAX_IN_FLIGHT, CHAT_MAX_QUEUE, CHAT_QUEUE_TIMEOUT)"""
+    global _admission_controller
+
+    if _admission_controller is None:
+        with _admission_controller_lock:
+            if _admission_controller is None:
+                settings = get_ollama_settings()
+                _admission_controller = AdmissionController(
+                    max_in_flight=settings.chat_max_in_flight,
+                    max_queue=settings.chat_max_queue,
+                    default_timeout=settings.chat_queue_timeout
+                )
+    return _admission_controller
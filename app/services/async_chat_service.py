@@ -0,0 +1,143 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Any, AsyncIterator, Optional
+import logging
+import httpx
+from services.admission_controller import AdmissionRejected, PRIORITY_NORMAL, get_admission_controller
+from services.async_ollama_client import get_async_ollama_client
+from services.ollama_client import OllamaHTTPError
+from services.chat_service import ChatService
+from services.deadline import Deadline
+from services.generation_budget import GenerationBudget
+from services.ollama_balancer import get_ollama_balancer
+from services.response_cache import make_cache_key
+from services.single_flight import get_async_single_flight
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncChatService(ChatService):
+    """
+    Variante de ``ChatService`` para el servidor ASGI (``asgi_app.py``).
+
+    Comparte con la versión síncrona las cachés, el enrutado de modelos, los
+    presupuestos, el balanceador y la cola de admisión, pero la llamada a
+    Ollama es una corrutina sobre ``httpx.AsyncClient``: mientras Ollama
+    genera, la petición no ocupa ningún hilo. Los pasos que pueden hacer una
+    llamada HTTP síncrona (embeddings de la caché semántica o de las FAQ) se
+    ejecutan en el pool de hilos por defecto para no bloquear el bucle.
+    """
+
+    async def asend_message(self, query: str, options: Optional[Dict[str, Any]] = None, use_cache: bool = True,
+                            priority: int = PRIORITY_NORMAL, rag: bool = False,
+                            deadline: Optional[Deadline] = None,
+                            budget: Optional[GenerationBudget] = None) -> Dict[str, Any]:
+        """
+        Igual que ``send_message`` pero sin bloquear el bucle de eventos
+
+        Args:
+            query (str): La consulta del usuario
+            options (Dict[str, Any], optional): Opciones de generación de Ollama
+            use_cache (bool): Si es False no se consulta la caché (la respuesta nueva sí se guarda)
+            priority (int): Clase de prioridad en la cola de admisión
+            rag (bool): Si es True se añaden al prompt los pasajes del padrón más relevantes
+            deadline (Deadline, optional): Plazo de la petición
+            budget (GenerationBudget, optional): Límites de la generación
+
+        Returns:
+            Dict[str, Any]: La misma respuesta que ``send_message``
+        """
+        # La clave exacta de las FAQ no calcula embeddings: no hace falta salir del bucle
+        if use_cache:
+            faq_response = self._lookup_faq(query)
+            if faq_response is not None:
+                return faq_response
+
+        route, prompt, options, budget_report, sources = self._prepare_prompt(query, options, rag, budget)
+        response = await self._asend_prompt(query, prompt, options, use_cache, priority, rag, deadline, route.model)
+        if response.get('precomputed'):
+            return response
+        return self._finish_response(response, route, budget_report, sources)
+
+    async def _asend_prompt(self, query: str, prompt: str, options: Optional[Dict[str, Any]], use_cache: bool,
+                            priority: int, rag: bool, deadline: Optional[Deadline], model: str) -> Dict[str, Any]:
+        cache_key = make_cache_key(model, prompt, options)
+        if self._lookup_needs_embedding(use_cache):
+            cached_response, embedding = await asyncio.to_thread(self._lookup_caches, query, cache_key, rag, use_cache)
+        else:
+            cached_response, embedding = self._lookup_caches(query, cache_key, rag, use_cache)
+        if cached_response is not None:
+            return cached_response
+
+        # Las peticiones idénticas en curso comparten una única generación
+        response, coalesced = await get_async_single_flight().do(
+            cache_key, lambda: self._agenerate(prompt, options, priority, deadline, model))
+        return self._store_response(query, response, coalesced, cache_key, rag, embedding)
+
+    async def _agenerate(self, query: str, options: Optional[Dict[str, Any]] = None, priority: int = PRIORITY_NORMAL,
+                         deadline: Optional[Deadline] = None, model: Optional[str] = None) -> Dict[str, Any]:
+        """Genera la respuesta llamando a Ollama (sin caché); versión asíncrona de ``_generate``"""
+        model = model or self.ollama_settings.model_name
+        try:
+            payload = self._build_payload(query, stream=False, options=options, model=model)
+            data = await self._apost_generate(payload, priority, deadline)
+            return self._generation_result(query, model, data)
+        except Exception as e:
+            return self._generation_error(e)
+
+    async def _apost_generate(self, payload: Dict[str, Any], priority: int = PRIORITY_NORMAL,
+                              deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """
+        Envía una petición no streaming a ``/api/generate`` con el cliente asíncrono
+
+        Igual que ``_post_generate``: espera turno en la cola de admisión, el
+        balanceador elige el servidor y el plazo acota la espera y el timeout.
+        Si la corrutina se cancela se cierra la conexión y Ollama aborta la
+        generación.
+
+        Raises:
+            AdmissionRejected: Si el servidor está saturado
+            DeadlineExceeded: Si se agota el plazo
+        """
+        async with self._admission_slot_async(priority, deadline):
+            with get_ollama_balancer().lease() as backend:
+                client = get_async_ollama_client(backend.host, settings=self.ollama_settings)
+                try:
+                    response = await client.post('/api/generate', payload,
+                                                 timeout=max(deadline.remaining(), 0.001) if deadline else None)
+                except httpx.TimeoutException:
+                    self._check_deadline(deadline)
+                    raise
+
+                if response.status_code != 200:
+                    raise OllamaHTTPError(response.status_code, response.text)
+
+                return response.json()
+
+    @staticmethod
+    @asynccontextmanager
+    async def _admission_slot_async(priority: int, deadline: Optional[Deadline]) -> AsyncIterator[None]:
+        """Hueco en la cola de admisión esperado sin bloquear el bucle"""
+        admission = get_admission_controller()
+        try:
+            await admission.acquire_async(priority, ChatService._admission_timeout(admission, deadline))
+        except AdmissionRejected:
+            ChatService._check_admission_deadline(deadline)
+            raise
+
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            admission.release(time.monotonic() - started_at)
+
+    async def aget_model_info(self) -> Dict[str, Any]:
+        """
+        Igual que ``get_model_info``
+
+        Los datos salen de la caché recargada en segundo plano; la lectura se
+        hace en un hilo porque la primera carga (o una caché sin datos) consulta
+        los servidores de forma síncrona.
+        """
+        return await asyncio.to_thread(self.get_model_info)
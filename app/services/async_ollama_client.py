@@ -0,0 +1,94 @@
+import asyncio
+from typing import Dict, Any, Optional
+import logging
+import httpx
+from config.ollama_settings import OllamaSettings, get_ollama_settings
+from services.ollama_client import OllamaHTTPError
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncOllamaClient:
+    """
+    Cliente HTTP asíncrono para la API de Ollama (servidor ASGI).
+
+    Equivalente a ``OllamaClient`` sobre ``httpx.AsyncClient``: una petición
+    lenta a Ollama ocupa una corrutina y una conexión del pool, no un hilo.
+    """
+
+    def __init__(self, host: str, pool_size: int = 100, connect_timeout: float = 5.0, read_timeout: float = 120.0):
+        self.host = host.rstrip('/')
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.client = httpx.AsyncClient(
+            base_url=self.host,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            headers={'Content-Type': 'application/json'}
+        )
+
+    async def post(self, path: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> httpx.Response:
+        """
+        Envía un POST JSON a la API de Ollama
+
+        Args:
+            path (str): Ruta de la API, por ejemplo ``/api/generate``
+            payload (Dict[str, Any]): Cuerpo de la petición
+            timeout (float, optional): Tope en segundos para conectar y para leer la respuesta
+
+        Returns:
+            httpx.Response: Respuesta HTTP de Ollama
+        """
+        request_timeout = httpx.USE_CLIENT_DEFAULT
+        if timeout is not None:
+            request_timeout = httpx.Timeout(min(self.read_timeout, timeout), connect=min(self.connect_timeout, timeout))
+        return await self.client.post(path, json=payload, timeout=request_timeout)
+
+    async def list_models(self) -> Dict[str, Any]:
+        """
+        Lista los modelos disponibles en el host
+
+        Returns:
+            Dict[str, Any]: Respuesta de ``/api/tags`` con la clave ``models``
+        """
+        response = await self.client.get('/api/tags')
+        if response.status_code != 200:
+            raise OllamaHTTPError(response.status_code, response.text)
+        return response.json()
+
+    async def close(self):
+        """Cierra todas las conexiones del pool"""
+        await self.client.aclose()
+
+
+_async_clients: Dict[str, AsyncOllamaClient] = {}
+
+
+def get_async_ollama_client(host: Optional[str] = None, settings: Optional[OllamaSettings] = None) -> AsyncOllamaClient:
+    """
+    Devuelve el cliente asíncrono compartido para un host de Ollama
+
+    Solo se usa desde el bucle de eventos del servidor ASGI, así que no
+    necesita lock.
+    """
+    settings = settings or get_ollama_settings()
+    host = (host or settings.ollama_host).rstrip('/')
+
+    client = _async_clients.get(host)
+    if client is None:
+        logger.info(f"Creando pool de conexiones asíncrono Ollama para {host}")
+        client = AsyncOllamaClient(
+            host=host,
+            pool_size=settings.ollama_async_pool_size,
+            connect_timeout=settings.ollama_connect_timeout,
+            read_timeout=settings.ollama_read_timeout
+        )
+        _async_clients[host] = client
+    return client
+
+
+async def close_async_ollama_clients():
+    """Cierra y descarta todos los clientes asíncronos (al apagar el servidor ASGI)"""
+    clients = list(_async_clients.values())
+    _async_clients.clear()
+    await asyncio.gather(*(client.close() for client in clients), return_exceptions=True)
@@ -1,9 +1,33 @@
+import hashlib
+import hmac
+import logging
+import secrets
 import traceback
 import time
+from functools import lru_cache
 from sqlalchemy import text
+from config.auth_settings import get_auth_settings
 from config.db_settings import DbSettings
 from database.connection_db import SessionManager
 
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1)
+def _token_secret() -> bytes:
+    """Clave de firma de los tokens (AUTH_TOKEN_SECRET, o una aleatoria por proceso si no está definida)."""
+    secret = get_auth_settings().auth_token_secret
+    if not secret:
+        logger.warning("AUTH_TOKEN_SECRET no está definido: los tokens se firman con una clave aleatoria "
+                       "y dejan de valer al reiniciar el proceso")
+        return secrets.token_bytes(32)
+    return secret.encode('utf-8')
+
+
+def _token_signature(username, timestamp):
+    message = f"{username}_{timestamp}".encode('utf-8')
+    return hmac.new(_token_secret(), message, hashlib.sha256).hexdigest()
+
 
 class AuthService():
 
@@ -35,16 +59,33 @@ class AuthService():
             return False
 
     def encode_auth_token(self, user):
-        """Generate a simple token for the user."""
+        """Generate a signed token for the user (token_<username>_<timestamp>_<signature>)."""
         try:
-            
-            
-            # Token simple con username y timestamp
+            # Token con username y timestamp firmados con HMAC para que no se pueda falsificar
             timestamp = int(time.time())
-            token = f"token_{user.username}_{timestamp}"
+            token = f"token_{user.username}_{timestamp}_{_token_signature(user.username, timestamp)}"
             
             return token
             
         except Exception as e:
             print(f"Error generating token: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    @staticmethod
+    def username_from_token(authorization):
+        """Extract the username from a token generated by encode_auth_token, or None if the signature
+        does not match or the token has expired (AUTH_TOKEN_MAX_AGE)."""
+        token = (authorization or '').strip()
+        if token.lower().startswith('bearer '):
+            token = token[7:].strip()
+        if not token.startswith('token_') or token.count('_') < 3:
+            return None
+        username, timestamp, signature = token[len('token_'):].rsplit('_', 2)
+        if not username or not timestamp.isdigit():
+            return None
+        if not hmac.compare_digest(signature, _token_signature(username, timestamp)):
+            return None
+        max_age = get_auth_settings().auth_token_max_age
+        if max_age > 0 and time.time() - int(timestamp) > max_age:
+            return None
+        return username
@@ -0,0 +1,450 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+import logging
+from config.rag_settings import get_rag_settings
+from config.scraping_settings import get_scraping_settings
+from services.document_extractor import parse_page
+from services.padron_index import get_padron_index
+from services.scraping_service import ScrapingService
+
+logger = logging.getLogger(__name__)
+
+CRAWL_IDLE = 'idle'
+CRAWL_RUNNING = 'running'
+CRAWL_COMPLETED = 'completed'
+CRAWL_CANCELLED = 'cancelled'
+CRAWL_FAILED = 'failed'
+
+# Tipos de página del rastreo: listados del catálogo (de los que salen enlaces) y fichas de trámite
+PAGE_LISTING = 'listing'
+PAGE_TRAMIT = 'tramit'
+
+CrawlProgressCallback = Callable[[str, Dict[str, Any], Dict[str, Any]], None]
+
+
+class CrawlAlreadyRunning(Exception):
+    """Ya hay un rastreo del catálogo en curso"""
+
+
+def normalize_url(url: str) -> str:
+    """URL canónica para no descargar dos veces la misma página (sin fragmento y con la query ordenada)"""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', query, ''))
+
+
+class CatalogLinks:
+    """
+    Clasifica los enlaces encontrados en los listados del catálogo.
+
+    Una ficha de trámite es una URL del mismo servidor con ``DETALLE=``. Un
+    listado es una URL con la misma ruta, ``APP_CODE`` y ``PAGE_CODE`` que el
+    catálogo y sin ``DETALLE`` (paginación, categorías...). Si el catálogo
+    indica ``lang`` se descartan los enlaces a otros idiomas.
+    """
+
+    def __init__(self, catalog_url: str):
+        parts = urlsplit(normalize_url(catalog_url))
+        params = dict(parse_qsl(parts.query, keep_blank_values=True))
+        self.netloc = parts.netloc
+        self.path = parts.path
+        self.app_code = params.get('APP_CODE')
+        self.page_code = params.get('PAGE_CODE')
+        self.lang = params.get('lang')
+
+    def classify(self, url: str) -> Optional[str]:
+        """``PAGE_TRAMIT``, ``PAGE_LISTING`` o None si el enlace no interesa"""
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or parts.netloc != self.netloc:
+            return None
+        params = dict(parse_qsl(parts.query, keep_blank_values=True))
+        if self.lang and params.get('lang', self.lang) != self.lang:
+            return None
+        if params.get('DETALLE'):
+            return PAGE_TRAMIT
+        if (parts.path == self.path and params.get('APP_CODE') == self.app_code
+                and params.get('PAGE_CODE') == self.page_code):
+            return PAGE_LISTING
+        return None
+
+    def extract(self, base_url: str, content: bytes, parser: str) -> List[Tuple[str, str]]:
+        """Enlaces (tipo, URL normalizada) de un listado, en orden de aparición"""
+        links = []
+        for anchor in parse_page(content, parser).find_all('a', href=True):
+            url = normalize_url(urljoin(base_url, anchor['href'].strip()))
+            kind = self.classify(url)
+            if kind is not None:
+                links.append((kind, url))
+        return links
+
+
+class HostThrottle:
+    """
+    Limita las peticiones simultáneas a cada servidor y separa su inicio.
+
+    Cada servidor admite ``max_per_host`` peticiones a la vez y entre el
+    inicio de dos peticiones al mismo servidor pasan al menos
+    ``delay_seconds`` (cortesía con la sede).
+    """
+
+    def __init__(self, max_per_host: int = 2, delay_seconds: float = 0.5):
+        self.max_per_host = max(1, max_per_host)
+        self.delay_seconds = max(0.0, delay_seconds)
+        self._hosts: Dict[str, Tuple[threading.Semaphore, List[float]]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, host: str) -> Iterator[None]:
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = (threading.Semaphore(self.max_per_host), [0.0])
+            semaphore, next_start = self._hosts[host]
+
+        with semaphore:
+            # Cada petición reserva su turno de inicio y espera fuera del lock
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, next_start[0])
+                next_start[0] = start + self.delay_seconds
+            if start > now:
+                time.sleep(start - now)
+            yield
+
+
+class CrawlStore:
+    """
+    Resultados del rastreo en un fichero JSONL, una línea por ficha descargada.
+
+    Cada resultado se añade en cuanto llega, así que un rastreo interrumpido
+    conserva lo ya descargado; al reanudarlo se saltan las fichas cuya última
+    línea es correcta. Si una URL aparece varias veces vale la última línea.
+    Una línea incompleta (el proceso murió mientras se escribía) se ignora.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def prepare(self):
+        """Termina una última línea incompleta para que la siguiente no se escriba a continuación"""
+        with self._lock:
+            if not os.path.exists(self.path) or not os.path.getsize(self.path):
+                return
+            with open(self.path, 'rb+') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    f.write(b'\n')
+
+    def append(self, url: str, result: Dict[str, Any]):
+        line = json.dumps({**result, 'url': url, 'crawled_at': time.time()}, ensure_ascii=False)
+        with self._lock:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+    def results(self) -> Dict[str, Dict[str, Any]]:
+        """Último resultado de cada URL"""
+        results = {}
+        if not os.path.exists(self.path):
+            return results
+        with self._lock, open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(result, dict) and 'url' in result:
+                    results[result['url']] = result
+        return results
+
+    def completed_urls(self) -> Set[str]:
+        """URLs ya descargadas correctamente"""
+        return {url for url, result in self.results().items() if result.get('success')}
+
+    def clear(self):
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+class CatalogCrawler:
+    """
+    Rastreador concurrente del catálogo de trámites de la sede electrónica.
+
+    Parte del listado ``catalog_url``, descubre en él (y en los listados
+    enlazados) las fichas de trámite y las descarga con ``ScrapingService``
+    en un pool de ``concurrency`` hilos, respetando ``HostThrottle`` por
+    servidor. Las URLs se normalizan para no repetir descargas y el número
+    de páginas de una ejecución se limita a ``max_pages``.
+
+    Cada ficha se escribe en ``CrawlStore`` según llega. Al volver a lanzar
+    el rastreo (por ejemplo tras un reinicio) se saltan las fichas ya
+    guardadas, salvo con ``restart=True``. Las fichas se indexan para el RAG
+    igual que en el scraping de una página; el índice se guarda una sola vez
+    al terminar.
+
+    ``crawl`` ejecuta el rastreo en el hilo actual (CLI) y ``start`` en un
+    hilo en segundo plano (API); ``progress`` informa del avance en ambos
+    casos.
+    """
+
+    def __init__(self, catalog_url: str, store: CrawlStore, concurrency: int = 4, per_host_concurrency: int = 2,
+                 delay_seconds: float = 0.5, max_pages: int = 2000,
+                 service_factory: Optional[Callable[[], ScrapingService]] = None):
+        self.catalog_url = normalize_url(catalog_url)
+        self.store = store
+        self.concurrency = max(1, concurrency)
+        self.max_pages = max(1, max_pages)
+        self.links = CatalogLinks(catalog_url)
+        self.throttle = HostThrottle(per_host_concurrency, delay_seconds)
+        self.service_factory = service_factory or (lambda: ScrapingService(save_index=False))
+        self._local = threading.local()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._reset(CRAWL_IDLE)
+
+    def _reset(self, status: str):
+        self.status = status
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.listings = 0
+        self.listing_errors = 0
+        self.discovered = 0
+        self.fetched = 0
+        self.failed = 0
+        self.skipped = 0
+        self.in_flight = 0
+        self.queued = 0
+        self.last_error: Optional[str] = None
+
+    def _begin(self):
+        with self._lock:
+            if self.status == CRAWL_RUNNING:
+                raise CrawlAlreadyRunning("Ya hay un rastreo del catálogo en curso")
+            self._reset(CRAWL_RUNNING)
+            self.started_at = time.time()
+            self._stop.clear()
+
+    def crawl(self, restart: bool = False, progress: Optional[CrawlProgressCallback] = None) -> Dict[str, Any]:
+        """
+        Rastrea el catálogo en el hilo actual
+
+        Args:
+            restart (bool): Si es True se vacía el almacén y se descarga todo de nuevo
+            progress (callable, optional): Se llama con (url, resultado, avance) tras cada ficha
+
+        Un ``KeyboardInterrupt`` durante el rastreo lo para sin esperar a las
+        descargas en marcha y el rastreo termina como ``cancelled``.
+
+        Returns:
+            Dict[str, Any]: Avance final (ver ``progress``)
+
+        Raises:
+            CrawlAlreadyRunning: Si ya hay un rastreo en curso
+        """
+        self._begin()
+        self._run(restart, progress)
+        return self.progress()
+
+    def start(self, restart: bool = False) -> Dict[str, Any]:
+        """
+        Lanza el rastreo en un hilo en segundo plano
+
+        Raises:
+            CrawlAlreadyRunning: Si ya hay un rastreo en curso
+        """
+        self._begin()
+        self._thread = threading.Thread(target=self._run, args=(restart, None), name='catalog-crawler', daemon=True)
+        self._thread.start()
+        return self.progress()
+
+    def cancel(self) -> bool:
+        """Pide que el rastreo en curso pare (las descargas en marcha terminan); False si no había ninguno"""
+        with self._lock:
+            if self.status != CRAWL_RUNNING:
+                return False
+        self._stop.set()
+        return True
+
+    def wait(self, timeout: Optional[float] = None):
+        """Espera a que termine el rastreo lanzado con ``start``"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self, restart: bool, progress: Optional[CrawlProgressCallback]):
+        status = CRAWL_COMPLETED
+        try:
+            if restart:
+                self.store.clear()
+            self.store.prepare()
+            completed = self.store.completed_urls()
+            self._crawl(completed, progress)
+            if self._stop.is_set():
+                status = CRAWL_CANCELLED
+            elif not self.listings:
+                status = CRAWL_FAILED
+        except KeyboardInterrupt:
+            self._stop.set()
+            status = CRAWL_CANCELLED
+            raise
+        except Exception as e:
+            logger.error(f"Error en el rastreo del catálogo: {str(e)}")
+            self.last_error = str(e)
+            status = CRAWL_FAILED
+        finally:
+            self._save_index()
+            with self._lock:
+                self.status = status
+                self.finished_at = time.time()
+                self.in_flight = 0
+                self.queued = 0
+
+    def _crawl(self, completed: Set[str], progress: Optional[CrawlProgressCallback]):
+        seen = {self.catalog_url}
+        frontier: Deque[Tuple[str, str]] = deque([(PAGE_LISTING, self.catalog_url)])
+        scheduled = 1
+
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='catalog-crawl')
+        interrupted = False
+        try:
+            pending = {}
+            while frontier or pending:
+                while frontier and len(pending) < self.concurrency and not self._stop.is_set():
+                    kind, url = frontier.popleft()
+                    pending[executor.submit(self._fetch, kind, url)] = (kind, url)
+                self.in_flight, self.queued = len(pending), len(frontier)
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind, url = pending.pop(future)
+                    result = future.result()
+
+                    if kind == PAGE_TRAMIT:
+                        self.store.append(url, result)
+                        if result.get('success'):
+                            self.fetched += 1
+                        else:
+                            self.failed += 1
+                            self.last_error = result.get('error')
+                        if progress is not None:
+                            progress(url, result, self.progress())
+                        continue
+
+                    if not result['success']:
+                        self.listing_errors += 1
+                        self.last_error = result['error']
+                        continue
+
+                    self.listings += 1
+                    for link_kind, link in result['links']:
+                        if link in seen:
+                            continue
+                        seen.add(link)
+                        if link_kind == PAGE_TRAMIT:
+                            self.discovered += 1
+                            if link in completed:
+                                self.skipped += 1
+                                continue
+                        if scheduled >= self.max_pages:
+                            continue
+                        scheduled += 1
+                        # Los listados van primero para descubrir pronto todas las fichas
+                        if link_kind == PAGE_LISTING:
+                            frontier.appendleft((link_kind, link))
+                        else:
+                            frontier.append((link_kind, link))
+        except KeyboardInterrupt:
+            # Ctrl+C en la CLI: no se lanzan más descargas, las encoladas se descartan y no se espera a las
+            # que están en marcha. Lo ya guardado se conserva y el rastreo queda como cancelado.
+            logger.warning("Rastreo del catálogo interrumpido")
+            self._stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+            interrupted = True
+        finally:
+            if not interrupted:
+                executor.shutdown()
+
+    def _service(self) -> ScrapingService:
+        """ScrapingService del hilo (cada uno con su propia sesión HTTP)"""
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            service = self._local.service = self.service_factory()
+        return service
+
+    def _fetch(self, kind: str, url: str) -> Dict[str, Any]:
+        service = self._service()
+        with self.throttle.slot(urlsplit(url).netloc):
+            if kind == PAGE_TRAMIT:
+                return service.scrape_tarragona_padron_info(url)
+            try:
+                content = service.fetch_page(url)
+            except Exception as e:
+                return {'success': False, 'error': f"Error descargando el listado {url}: {str(e)}"}
+
+        try:
+            return {'success': True, 'links': self.links.extract(url, content, service.parser)}
+        except Exception as e:
+            return {'success': False, 'error': f"Error leyendo el listado {url}: {str(e)}"}
+
+    def _save_index(self):
+        """Guarda el índice del RAG una vez con todas las fichas indexadas durante el rastreo"""
+        if not self.fetched or not get_rag_settings().padron_index_on_scrape:
+            return
+        try:
+            get_padron_index().save()
+        except Exception as e:
+            logger.error(f"No se pudo guardar el índice del padrón tras el rastreo: {str(e)}")
+
+    def progress(self) -> Dict[str, Any]:
+        """Estado y contadores del último rastreo"""
+        with self._lock:
+            return {
+                "status": self.status,
+                "catalog_url": self.catalog_url,
+                "store_path": self.store.path,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "listings": self.listings,
+                "listing_errors": self.listing_errors,
+                "discovered": self.discovered,
+                "fetched": self.fetched,
+                "failed": self.failed,
+                "skipped": self.skipped,
+                "in_flight": self.in_flight,
+                "queued": self.queued,
+                "last_error": self.last_error
+            }
+
+
+_catalog_crawler: Optional[CatalogCrawler] = None
+_catalog_crawler_lock = threading.Lock()
+
+
+def get_catalog_crawler() -> CatalogCrawler:
+    """Devuelve el rastreador del catálogo del proceso (configurado con las variables CRAWL_*)"""
+    global _catalog_crawler
+
+    if _catalog_crawler is None:
+        with _catalog_crawler_lock:
+            if _catalog_crawler is None:
+                settings = get_scraping_settings()
+                _catalog_crawler = CatalogCrawler(
+                    settings.crawl_catalog_url,
+                    CrawlStore(settings.crawl_store_path),
+                    concurrency=settings.crawl_concurrency,
+                    per_host_concurrency=settings.crawl_per_host_concurrency,
+                    delay_seconds=settings.crawl_delay_seconds,
+                    max_pages=settings.crawl_max_pages
+                )
+    return _catalog_crawler
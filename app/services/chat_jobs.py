@@ -0,0 +1,200 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional
+import logging
+from config.ollama_settings import get_ollama_settings
+from services.admission_controller import PRIORITY_NORMAL
+from services.chat_log_writer import get_chat_log_writer, record_chat, stream_response
+from services.chat_service import ChatService
+from services.generation_budget import GenerationBudget
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+
+
+class JobStoreFull(Exception):
+    """No caben más trabajos pendientes en el almacén"""
+
+
+class ChatJob:
+    """Generación de chat ejecutada en segundo plano"""
+
+    def __init__(self, query: str, priority: int = PRIORITY_NORMAL, budget: Optional[GenerationBudget] = None,
+                 username: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.query = query
+        self.priority = priority
+        self.budget = budget
+        # Usuario que encoló el trabajo, para el registro de chats
+        self.username = username
+        self.status = JOB_QUEUED
+        self.partial_response = ''
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JOB_COMPLETED, JOB_FAILED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "query": self.query,
+                "partial_response": self.partial_response,
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at
+            }
+
+
+class ChatJobManager:
+    """
+    Ejecuta generaciones de chat en un pool de hilos propio.
+
+    Los trabajos se guardan en un almacén acotado (``max_jobs``); los
+    terminados se descartan al superar ``ttl_seconds`` o cuando hace falta
+    sitio para uno nuevo, empezando por el más antiguo.
+    """
+
+    def __init__(self, chat_service: ChatService, max_workers: int = 2, max_jobs: int = 500, ttl_seconds: float = 3600):
+        self.chat_service = chat_service
+        self.max_jobs = max_jobs
+        self.ttl_seconds = ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='chat-job')
+        self._jobs: "OrderedDict[str, ChatJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, query: str, priority: int = PRIORITY_NORMAL, budget: Optional[GenerationBudget] = None,
+               username: Optional[str] = None) -> ChatJob:
+        """
+        Registra un trabajo y lo encola en el pool
+
+        Raises:
+            JobStoreFull: Si el almacén está lleno de trabajos sin terminar
+        """
+        job = ChatJob(query, priority, budget, username)
+        with self._lock:
+            self._purge_expired()
+            if len(self._jobs) >= self.max_jobs and not self._evict_oldest_finished():
+                raise JobStoreFull("Hay demasiados trabajos de chat pendientes")
+            self._jobs[job.id] = job
+
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[ChatJob]:
+        """Devuelve un trabajo por su id, o None si no existe o ya expiró"""
+        with self._lock:
+            self._purge_expired()
+            return self._jobs.get(job_id)
+
+    def _run(self, job: ChatJob):
+        with job.lock:
+            job.status = JOB_RUNNING
+            job.started_at = time.time()
+
+        final_event = None
+        try:
+            for event in self.chat_service.stream_message(job.query, priority=job.priority, budget=job.budget):
+                if event['type'] in ('done', 'error'):
+                    final_event = event
+                with job.lock:
+                    if event['type'] == 'token':
+                        job.partial_response += event['response']
+                    elif event['type'] == 'done':
+                        job.result = {
+                            "success": True,
+                            "response": job.partial_response,
+                            "model": event.get('model'),
+                            "query": job.query,
+                            "stats": event.get('stats', {}),
+                            "budget": event.get('budget')
+                        }
+                        job.status = JOB_COMPLETED
+                    elif event['type'] == 'error':
+                        job.error = event.get('error')
+                        job.status = JOB_FAILED
+
+            if not job.finished:
+                raise Exception("La generación terminó sin respuesta final")
+
+        except Exception as e:
+            logger.error(f"Error en el trabajo de chat {job.id}: {str(e)}")
+            with job.lock:
+                job.error = f"Error al procesar el trabajo: {str(e)}"
+                job.status = JOB_FAILED
+            final_event = {"type": "error", "error": job.error}
+
+        finally:
+            with job.lock:
+                job.finished_at = time.time()
+            self._log_job(job, final_event)
+
+    @staticmethod
+    def _log_job(job: ChatJob, final_event: Optional[Dict[str, Any]]):
+        """Añade el trabajo terminado al registro de chats (latencia desde que se encoló)"""
+        record_chat(get_chat_log_writer(), 'job', job.username, job.query,
+                    stream_response(job.partial_response, final_event),
+                    latency_ms=(job.finished_at - job.created_at) * 1000)
+
+    def _purge_expired(self):
+        # Debe llamarse con el lock tomado
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and job.finished_at and now - job.finished_at > self.ttl_seconds
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _evict_oldest_finished(self) -> bool:
+        # Debe llamarse con el lock tomado
+        for job_id, job in self._jobs.items():
+            if job.finished:
+                del self._jobs[job_id]
+                return True
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        """Número de trabajos por estado"""
+        with self._lock:
+            counts = {JOB_QUEUED: 0, JOB_RUNNING: 0, JOB_COMPLETED: 0, JOB_FAILED: 0}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return {"stored": len(self._jobs), "max_jobs": self.max_jobs, **counts}
+
+
+_job_manager: Optional[ChatJobManager] = None
+_job_manager_lock = threading.Lock()
+
+
+def get_chat_job_manager() -> ChatJobManager:
+    """Devuelve el gestor de trabajos de chat del proceso"""
+    global _job_manager
+
+    if _job_manager is None:
+        with _job_manager_lock:
+            if _job_manager is None:
+                settings = get_ollama_settings()
+                _job_manager = ChatJobManager(
+                    chat_service=ChatService(ollama_settings=settings),
+                    max_workers=settings.chat_jobs_workers,
+                    max_jobs=settings.chat_jobs_max,
+                    ttl_seconds=settings.chat_jobs_ttl_seconds
+                )
+    return _job_manager
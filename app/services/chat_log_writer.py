@@ -0,0 +1,391 @@
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from datetime import date, datetime
+from typing import Any, Deque, Dict, List, Optional
+
+from sqlalchemy import case, func, insert, select
+
+from config.chat_log_settings import get_chat_log_settings
+from config.db_settings import DbSettings
+from database.connection_db import SessionManager
+from models.chat_log_model import ChatLogModel
+
+logger = logging.getLogger(__name__)
+
+# Contadores de Ollama que se guardan con cada respuesta generada
+USAGE_FIELDS = ('prompt_eval_count', 'eval_count', 'total_duration', 'prompt_eval_duration', 'eval_duration')
+
+# Agrupaciones admitidas por el resumen de consumo
+USAGE_GROUPS = ('user', 'model', 'day')
+
+_MAX_ERROR_LENGTH = 500
+
+
+def chat_log_entry(endpoint: str, username: Optional[str], query: str, response: Dict[str, Any],
+                   latency_ms: Optional[float] = None, store_text: bool = True) -> Dict[str, Any]:
+    """
+    Construye la fila de ``chat_logs`` de una respuesta de ``ChatService``
+
+    Las respuestas servidas desde una caché o compartidas con otra petición
+    idéntica no consumen tokens: se registran con los contadores a NULL para
+    no contar dos veces la misma generación.
+
+    Args:
+        endpoint (str): Endpoint que atendió la petición (``chat``, ``batch``...)
+        username (str, optional): Usuario de la petición, None si es anónima
+        query (str): Consulta original
+        response (Dict[str, Any]): Resultado de ``ChatService``
+        latency_ms (float, optional): Tiempo de respuesta medido en el servidor
+        store_text (bool): Si es False no se guardan la consulta ni la respuesta
+
+    Returns:
+        Dict[str, Any]: Valores de la fila
+    """
+    generated = not response.get('cached') and not response.get('coalesced')
+    usage = (response.get('usage') or {}) if generated else {}
+    error = response.get('error')
+
+    entry = {
+        "created_at": datetime.utcnow(),
+        "username": username,
+        "endpoint": endpoint,
+        "model": response.get('model'),
+        "query": query if store_text else None,
+        "response": response.get('response') if store_text else None,
+        "success": bool(response.get('success')),
+        "cached": bool(response.get('cached')),
+        "cache_type": response.get('cache_type'),
+        "error": error[:_MAX_ERROR_LENGTH] if error else None,
+        "latency_ms": int(latency_ms) if latency_ms is not None else None
+    }
+    entry.update({field: usage.get(field) for field in USAGE_FIELDS})
+    return entry
+
+
+def stream_response(response_text: str, final_event: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Resultado equivalente al de ``ChatService.send_message`` de una generación en streaming
+
+    Args:
+        response_text (str): Texto recibido en los eventos ``token``
+        final_event (Dict[str, Any], optional): Evento ``done`` o ``error`` con su ``type``
+            (None si el stream se cortó antes de terminar)
+
+    Returns:
+        Dict[str, Any]: Resultado para ``chat_log_entry``
+    """
+    if final_event is None:
+        return {"success": False, "response": response_text or None,
+                "error": "El stream se cerró antes de terminar la respuesta"}
+    if final_event.get('type') != 'done':
+        return {"success": False, "response": None, "error": final_event.get('error')}
+
+    stats = final_event.get('stats') or {}
+    return {
+        "success": True,
+        "response": response_text,
+        "model": final_event.get('model'),
+        "coalesced": bool(final_event.get('coalesced')),
+        "usage": {field: stats[field] for field in USAGE_FIELDS if field in stats}
+    }
+
+
+class ChatLogWriter:
+    """
+    Registro de chats con escritura diferida (write-behind) en MySQL.
+
+    ``record`` solo añade la fila a un buffer en memoria, así que no añade
+    latencia de base de datos a la petición. Un hilo en segundo plano vacía el
+    buffer con inserciones multi-fila (``INSERT ... VALUES (...), (...)``) a
+    través de ``SessionManager`` cuando se acumulan ``batch_size`` filas o cada
+    ``flush_interval`` segundos.
+
+    Si la inserción falla se reintenta ``max_retries`` veces con espera
+    exponencial; si sigue fallando el lote se descarta y se cuenta. El buffer
+    está acotado a ``max_buffer`` filas: con la base de datos caída se
+    descartan las más antiguas en lugar de crecer sin límite. ``close`` (que se
+    registra con ``atexit``) escribe lo pendiente al apagar el proceso sin
+    reintentos y como mucho durante ``flush_timeout`` segundos, para que una
+    base de datos caída no bloquee el apagado.
+    """
+
+    def __init__(self, session_manager: SessionManager, batch_size: int = 100, flush_interval: float = 5.0,
+                 max_buffer: int = 10000, max_retries: int = 5, retry_backoff: float = 0.5,
+                 flush_timeout: float = 10.0):
+        self.session_manager = session_manager
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_buffer = max(self.batch_size, max_buffer)
+        self.max_retries = max(0, max_retries)
+        self.retry_backoff = retry_backoff
+        self.flush_timeout = flush_timeout
+        self._buffer: Deque[Dict[str, Any]] = deque()
+        self._condition = threading.Condition()
+        # Un solo vaciado a la vez (hilo de fondo, close o una consulta de consumo)
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.recorded = 0
+        self.written = 0
+        self.batches = 0
+        self.retries = 0
+        self.dropped = 0
+        self.failed_batches = 0
+        self.last_error: Optional[str] = None
+
+    def record(self, entry: Dict[str, Any]):
+        """Añade una fila al buffer; no bloquea por la base de datos"""
+        with self._condition:
+            if len(self._buffer) >= self.max_buffer:
+                self._buffer.popleft()
+                self.dropped += 1
+            self._buffer.append(entry)
+            self.recorded += 1
+            if len(self._buffer) >= self.batch_size:
+                self._condition.notify()
+
+    def pending(self) -> int:
+        """Filas en el buffer pendientes de escribir"""
+        with self._condition:
+            return len(self._buffer)
+
+    def flush(self, retry: bool = True, timeout: Optional[float] = None) -> int:
+        """
+        Escribe las filas pendientes en lotes de ``batch_size``
+
+        Args:
+            retry (bool): Reintentar cada lote hasta ``max_retries`` veces y descartarlo
+                si sigue fallando. Con False se hace un solo intento y, si falla, el
+                lote vuelve al buffer y el vaciado se detiene
+            timeout (float, optional): Segundos máximos para esperar a otro vaciado en
+                curso y escribir; lo que no dé tiempo a escribir sigue en el buffer
+
+        Returns:
+            int: Filas escritas
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        if not self._flush_lock.acquire(timeout=-1 if timeout is None else max(0.0, timeout)):
+            return 0
+
+        written = 0
+        try:
+            while deadline is None or time.monotonic() < deadline:
+                # Al cerrar, el hilo de fondo deja de reintentar y close escribe lo que quede
+                if retry and self._stop.is_set() and threading.current_thread() is self._thread:
+                    break
+                with self._condition:
+                    batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                if not batch:
+                    break
+                if self._write(batch, self.max_retries if retry else 0):
+                    written += len(batch)
+                elif not retry or self._stop.is_set():
+                    self._requeue(batch)
+                    break
+                else:
+                    self._drop(batch, f"tras {self.max_retries + 1} intentos")
+        finally:
+            self._flush_lock.release()
+        return written
+
+    def _write(self, batch: List[Dict[str, Any]], max_retries: int) -> bool:
+        """Inserta un lote con una sola sentencia multi-fila, con hasta ``max_retries`` reintentos"""
+        statement = insert(ChatLogModel.__table__).values(batch)
+        for attempt in range(max_retries + 1):
+            try:
+                with self.session_manager.get_session() as session:
+                    session.execute(statement)
+                self.written += len(batch)
+                self.batches += 1
+                return True
+            except Exception as e:
+                self.last_error = str(e)
+                if attempt < max_retries:
+                    self.retries += 1
+                    # close interrumpe la espera para no retrasar el apagado
+                    if self._stop.wait(self.retry_backoff * (2 ** attempt)):
+                        return False
+        return False
+
+    def _requeue(self, batch: List[Dict[str, Any]]):
+        """Devuelve al principio del buffer un lote que no se pudo escribir"""
+        with self._condition:
+            self._buffer.extendleft(reversed(batch))
+            while len(self._buffer) > self.max_buffer:
+                self._buffer.popleft()
+                self.dropped += 1
+
+    def _drop(self, batch: List[Dict[str, Any]], reason: str):
+        self.failed_batches += 1
+        self.dropped += len(batch)
+        logger.error(f"Se descartan {len(batch)} registros de chat {reason}: {self.last_error}")
+
+    def start(self):
+        """Arranca el hilo de escritura en segundo plano"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='chat-log-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._condition:
+                self._condition.wait_for(lambda: self._stop.is_set() or len(self._buffer) >= self.batch_size,
+                                         timeout=self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error escribiendo el registro de chats: {str(e)}")
+
+    def close(self, timeout: Optional[float] = None):
+        """
+        Detiene el hilo y escribe lo pendiente con un solo intento por lote
+
+        Args:
+            timeout (float, optional): Segundos máximos del cierre (por defecto
+                ``flush_timeout``). Lo que no se pueda escribir se descarta y se cuenta
+        """
+        timeout = self.flush_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        self._stop.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush(retry=False, timeout=max(0.0, deadline - time.monotonic()))
+
+        with self._condition:
+            pending = list(self._buffer)
+            self._buffer.clear()
+        if pending:
+            self._drop(pending, "al cerrar")
+
+    def usage(self, group_by: str = 'user', username: Optional[str] = None,
+              since: Optional[date] = None, until: Optional[date] = None) -> Dict[str, Any]:
+        """
+        Resumen del consumo de tokens agrupado por usuario, modelo o día
+
+        Antes de consultar se escriben las filas pendientes para que el
+        resumen incluya las peticiones más recientes, con un solo intento por
+        lote y como mucho ``flush_timeout`` segundos: si MySQL falla, las filas
+        siguen en el buffer y el resumen sale sin ellas.
+
+        Args:
+            group_by (str): ``user``, ``model`` o ``day``
+            username (str, optional): Limitar a un usuario
+            since (date, optional): Primer día incluido
+            until (date, optional): Último día incluido
+
+        Returns:
+            Dict[str, Any]: Una fila por grupo con peticiones, respuestas de caché,
+            errores y la suma de los contadores de Ollama, y los totales
+
+        Raises:
+            ValueError: Si ``group_by`` no es válido
+        """
+        if group_by not in USAGE_GROUPS:
+            raise ValueError(f"group_by debe ser uno de: {', '.join(USAGE_GROUPS)}")
+
+        self.flush(retry=False, timeout=self.flush_timeout)
+
+        table = ChatLogModel.__table__
+        group_column = {
+            'user': table.c.username,
+            'model': table.c.model,
+            'day': func.date(table.c.created_at)
+        }[group_by].label('key')
+
+        statement = select(
+            group_column,
+            func.count().label('requests'),
+            func.sum(case((table.c.cached, 1), else_=0)).label('cached'),
+            func.sum(case((table.c.success, 0), else_=1)).label('errors'),
+            *[func.sum(table.c[field]).label(field) for field in USAGE_FIELDS]
+        )
+        if username is not None:
+            statement = statement.where(table.c.username == username)
+        if since is not None:
+            statement = statement.where(table.c.created_at >= datetime.combine(since, datetime.min.time()))
+        if until is not None:
+            statement = statement.where(table.c.created_at < datetime.combine(until, datetime.max.time()))
+        statement = statement.group_by(group_column).order_by(group_column)
+
+        with self.session_manager.get_session() as session:
+            rows = session.execute(statement).mappings().all()
+
+        counters = ('requests', 'cached', 'errors') + USAGE_FIELDS
+        groups = [
+            {group_by: str(row['key']) if row['key'] is not None else None,
+             **{name: int(row[name] or 0) for name in counters}}
+            for row in rows
+        ]
+        totals = {name: sum(group[name] for group in groups) for name in counters}
+        return {"group_by": group_by, "usage": groups, "totals": totals}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": True,
+            "pending": self.pending(),
+            "recorded": self.recorded,
+            "written": self.written,
+            "batches": self.batches,
+            "retries": self.retries,
+            "failed_batches": self.failed_batches,
+            "dropped": self.dropped,
+            "last_error": self.last_error
+        }
+
+
+def record_chat(writer: Optional[ChatLogWriter], endpoint: str, username: Optional[str], query: str,
+                response: Dict[str, Any], latency_ms: Optional[float] = None):
+    """
+    Añade una petición al registro de chats (escritura diferida)
+
+    Un fallo al registrar nunca hace fallar la petición: solo se anota en el log.
+
+    Args:
+        writer (ChatLogWriter, optional): Registro del proceso; None si está desactivado
+        endpoint (str): Endpoint que atendió la petición (``chat``, ``stream``, ``batch``...)
+        username (str, optional): Usuario de la petición, None si es anónima
+        query (str): Consulta original
+        response (Dict[str, Any]): Resultado de ``ChatService`` (o de ``stream_response``)
+        latency_ms (float, optional): Tiempo de respuesta medido en el servidor
+    """
+    if writer is None:
+        return
+    try:
+        writer.record(chat_log_entry(endpoint, username, query, response, latency_ms=latency_ms,
+                                     store_text=get_chat_log_settings().chat_log_store_text))
+    except Exception as e:
+        logger.exception(f"Error registrando el chat: {str(e)}")
+
+
+_chat_log_writer: Optional[ChatLogWriter] = None
+_chat_log_writer_created = False
+_chat_log_writer_lock = threading.Lock()
+
+
+def get_chat_log_writer() -> Optional[ChatLogWriter]:
+    """Devuelve el registro de chats del proceso (arrancado), o None si está desactivado"""
+    global _chat_log_writer, _chat_log_writer_created
+
+    if not _chat_log_writer_created:
+        with _chat_log_writer_lock:
+            if not _chat_log_writer_created:
+                settings = get_chat_log_settings()
+                if settings.chat_log_enabled:
+                    _chat_log_writer = ChatLogWriter(
+                        SessionManager(DbSettings()),
+                        batch_size=settings.chat_log_batch_size,
+                        flush_interval=settings.chat_log_flush_interval,
+                        max_buffer=settings.chat_log_max_buffer,
+                        max_retries=settings.chat_log_max_retries,
+                        retry_backoff=settings.chat_log_retry_backoff,
+                        flush_timeout=settings.chat_log_flush_timeout
+                    )
+                    _chat_log_writer.start()
+                _chat_log_writer_created = True
+    return _chat_log_writer
@@ -0,0 +1,84 @@
+from typing import Any, Callable, Dict, Optional, Union
+
+from config.ollama_settings import get_ollama_settings
+from models.dto import ChatRequest
+from services.admission_controller import PRIORITY_HIGH, PRIORITY_NORMAL
+from services.auth_service import AuthService
+from services.deadline import Deadline, parse_timeout
+from services.generation_budget import BUDGET_ANONYMOUS, BUDGET_AUTHENTICATED, GenerationBudget, get_generation_budget
+
+# Reglas por petición comunes a los endpoints de chat de Flask (routes/chat_bp.py) y ASGI (asgi_app.py).
+# Cada servidor pasa su forma de leer cabeceras: ``request.headers.get`` o ``AsgiRequest.header``.
+HeaderGetter = Callable[[str], Optional[str]]
+
+
+def request_username(header: HeaderGetter) -> Optional[str]:
+    """Usuario del token de /login en ``Authorization``, o None si la petición es anónima o el token no es válido"""
+    return AuthService.username_from_token(header('Authorization'))
+
+
+def request_priority(username: Optional[str]) -> int:
+    """Prioridad en la cola de admisión: los usuarios autenticados van por delante de los anónimos"""
+    return PRIORITY_HIGH if username else PRIORITY_NORMAL
+
+
+def parse_chat_request(data: Dict[str, Any]) -> ChatRequest:
+    """
+    Valida el body de /chat con el DTO ``ChatRequest`` (``rag`` admite ``"false"``, ``0``...)
+
+    Raises:
+        ValidationError: Si el body no es válido
+    """
+    return ChatRequest.model_validate(data)
+
+
+def request_budget(data: Union[Dict[str, Any], ChatRequest], username: Optional[str]) -> GenerationBudget:
+    """
+    Presupuesto de generación de la petición: el de su clase (anónima o
+    autenticada con un token válido) reducido con los límites enviados en el body
+
+    Args:
+        data: Body de la petición, o el ``ChatRequest`` ya validado
+        username (str, optional): Usuario autenticado
+
+    Raises:
+        ValidationError: Si los límites del body no son válidos
+    """
+    chat_request = data if isinstance(data, ChatRequest) else parse_chat_request(data)
+    name = BUDGET_AUTHENTICATED if username else BUDGET_ANONYMOUS
+    return get_generation_budget(name).narrow(
+        max_prompt_tokens=chat_request.max_prompt_tokens,
+        num_predict=chat_request.num_predict,
+        num_ctx=chat_request.num_ctx,
+        temperature=chat_request.temperature
+    )
+
+
+def request_timeout(header: HeaderGetter) -> Optional[float]:
+    """
+    Segundos de plazo: cabecera X-Request-Timeout o CHAT_DEFAULT_DEADLINE (None = sin plazo)
+
+    Raises:
+        ValueError: Si X-Request-Timeout no es un número finito mayor que 0
+    """
+    settings = get_ollama_settings()
+    return parse_timeout(header('X-Request-Timeout') or None, settings.chat_default_deadline,
+                         settings.chat_max_deadline)
+
+
+def request_deadline(header: HeaderGetter) -> Optional[Deadline]:
+    """
+    Plazo de la petición, que empieza a contar ahora
+
+    Raises:
+        ValueError: Si X-Request-Timeout no es un número finito mayor que 0
+    """
+    seconds = request_timeout(header)
+    return Deadline(seconds) if seconds is not None else None
+
+
+def cache_bypass_requested(header: HeaderGetter) -> bool:
+    """Indica si el cliente pidió saltarse la caché (X-Cache-Bypass o Cache-Control: no-cache)"""
+    if (header('X-Cache-Bypass') or '').lower() in ('1', 'true', 'yes'):
+        return True
+    return 'no-cache' in (header('Cache-Control') or '').lower()
@@ -1,9 +1,26 @@
-import ollama
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 import logging
+import time
 from config.ollama_settings import OllamaSettings
-import requests
+from config.rag_settings import get_rag_settings
+from services.ollama_client import OllamaClient, OllamaHTTPError, get_ollama_client
+from services.ollama_balancer import get_ollama_balancer
+from services.admission_controller import AdmissionRejected, PRIORITY_NORMAL, PRIORITY_LOW, get_admission_controller
+from services.deadline import CancellationMetrics, Deadline, DeadlineExceeded, get_cancellation_metrics
+from services.chat_log_writer import USAGE_FIELDS, get_chat_log_writer
+from services.conversation_store import ConversationSession, get_conversation_store
+from services.faq_store import get_faq_store
+from services.generation_budget import GenerationBudget
+from services.model_router import RoutingDecision, get_model_router
+from services.model_info_cache import ModelInfoCache, get_model_info_cache
+from services.padron_index import build_rag_prompt, fit_rag_prompt, get_padron_index
+from services.response_cache import get_response_cache, make_cache_key
+from services.semantic_cache import get_semantic_cache
+from services.single_flight import get_single_flight, get_stream_flight
 import json
+import requests
 
 logger = logging.getLogger(__name__)
 
@@ -12,109 +29,816 @@ class ChatService:
     def __init__(self, ollama_settings: OllamaSettings):
         self.ollama_settings = ollama_settings
         
-    def _get_ollama_client(self):
-        """Crear cliente de Ollama con la URL configurada"""
+    def _get_ollama_client(self, host: Optional[str] = None) -> OllamaClient:
+        """Obtener el cliente compartido (con pool de conexiones) para un host; por defecto el configurado"""
+        host = host or self.ollama_settings.ollama_host
         try:
-            client = ollama.Client(host=self.ollama_settings.ollama_host)
-            return client
+            return get_ollama_client(host, settings=self.ollama_settings)
         except Exception as e:
             logger.error(f"Error creando cliente Ollama: {str(e)}")
-            raise Exception(f"No se pudo conectar a Ollama en {self.ollama_settings.ollama_host}. Verifica que esté ejecutándose y accesible.")
+            raise Exception(f"No se pudo conectar a Ollama en {host}. Verifica que esté ejecutándose y accesible.")
 
-    @staticmethod
-    def send_message(query: str) -> Dict[str, Any]:
+    def send_message(self, query: str, options: Optional[Dict[str, Any]] = None, use_cache: bool = True,
+                     priority: int = PRIORITY_NORMAL, rag: bool = False,
+                     deadline: Optional[Deadline] = None, budget: Optional[GenerationBudget] = None,
+                     model: Optional[str] = None) -> Dict[str, Any]:
         """
         Envía un mensaje al modelo Gemma:7B y retorna la respuesta
         
         Args:
             query (str): La consulta del usuario
+            options (Dict[str, Any], optional): Opciones de generación de Ollama
+            use_cache (bool): Si es False no se consulta la caché (la respuesta nueva sí se guarda)
+            priority (int): Clase de prioridad en la cola de admisión
+            rag (bool): Si es True se añaden al prompt los pasajes del padrón más relevantes
+            deadline (Deadline, optional): Plazo de la petición; al agotarse se aborta la generación
+            budget (GenerationBudget, optional): Límites de la generación; el prompt se recorta a
+                ``max_prompt_tokens`` y ``num_predict``, ``num_ctx`` y ``temperature`` se envían como opciones
+            model (str, optional): Modelo a usar sin pasar por el enrutador (``routing_reason`` ``pinned``)
             
         Returns:
-            Dict[str, Any]: Respuesta del modelo con metadata
+            Dict[str, Any]: Respuesta del modelo con metadata; ``model`` es el modelo elegido por el
+            enrutador y ``cached`` indica si vino de la caché. Si el servidor está saturado incluye
+            ``retry_after`` (segundos). En modo RAG incluye ``sources`` con los pasajes usados. Si se
+            agota el plazo incluye ``deadline_exceeded``. Con ``budget`` incluye ``budget`` con los
+            límites aplicados. Las preguntas frecuentes se responden con la respuesta precalculada
+            (``precomputed``) sin llamar al modelo
+        """
+        # Primero lo que no necesita embeddings: la clave exacta de las FAQ y, en
+        # _send_prompt, la caché exacta; solo si fallan se calcula el embedding
+        if use_cache:
+            faq_response = self._lookup_faq(query)
+            if faq_response is not None:
+                return faq_response
+
+        route, prompt, options, budget_report, sources = self._prepare_prompt(query, options, rag, budget, model)
+        response = self._send_prompt(query, prompt, options, use_cache, priority, rag, deadline, route.model)
+        if response.get('precomputed'):
+            return response
+        return self._finish_response(response, route, budget_report, sources)
+
+    def _prepare_prompt(self, query: str, options: Optional[Dict[str, Any]], rag: bool,
+                        budget: Optional[GenerationBudget], model: Optional[str] = None):
+        """
+        Elige el modelo y construye el prompt final (presupuesto y contexto RAG)
+
+        Returns:
+            Tuple: (decisión de enrutado, prompt, opciones, informe del presupuesto o None,
+            fuentes RAG o None)
+        """
+        route = RoutingDecision(model, 'pinned') if model else self._route(query)
+
+        if not rag:
+            prompt, budget_report = budget.apply(query) if budget is not None else (query, None)
+            sources = None
+        else:
+            # El presupuesto se aplica al prompt final, con los pasajes ya añadidos
+            prompt, budget_report, sources = self._build_rag_prompt(query, budget)
+
+        if budget is not None:
+            options = dict(options or {}, **budget.options())
+
+        return route, prompt, options, budget_report, sources
+
+    @staticmethod
+    def _finish_response(response: Dict[str, Any], route: RoutingDecision, budget_report: Optional[Dict[str, Any]],
+                         sources: Optional[List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Añade a la respuesta el motivo del enrutado, el presupuesto y las fuentes"""
+        response['routing_reason'] = route.reason
+        if budget_report is not None:
+            response['budget'] = budget_report
+        if sources is not None:
+            response['sources'] = sources
+        return response
+
+    @staticmethod
+    def _lookup_faq(query: str, embedding=None, semantic: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Respuesta precalculada de una pregunta frecuente, o None si no hay ninguna
+
+        Args:
+            query (str): La consulta del usuario
+            embedding (np.ndarray, optional): Embedding de la consulta ya calculado con el modelo del almacén
+            semantic (bool): Buscar también por similitud; si es False solo por clave exacta
+        """
+        store = get_faq_store()
+        if store is None:
+            return None
+
+        match = store.lookup(query, embedding) if semantic else store.lookup_key(query)
+        if match is None:
+            return None
+
+        return {
+            "success": True,
+            "response": match['answer'],
+            "model": match['model'],
+            "query": query,
+            "cached": True,
+            "cache_type": "faq",
+            "precomputed": True,
+            "faq_question": match['question'],
+            "similarity": round(match['similarity'], 4)
+        }
+
+    @staticmethod
+    def _route(query: str) -> RoutingDecision:
+        """Elige el modelo según la consulta y la profundidad actual de la cola de admisión"""
+        return get_model_router().route(query, get_admission_controller().queue_depth())
+
+    def _build_rag_prompt(self, query: str, budget: Optional[GenerationBudget]):
+        """
+        Recupera los pasajes del índice BM25 y construye el prompt aumentado
+
+        Con presupuesto, los pasajes que no caben en ``max_prompt_tokens`` se
+        recortan o se descartan.
+
+        Returns:
+            Tuple: (prompt, informe del presupuesto o None, fuentes de los pasajes incluidos)
         """
+        passages = get_padron_index().search(query, get_rag_settings().rag_top_k)
+        prompt, included, truncated = fit_rag_prompt(
+            query, passages, budget.max_prompt_tokens if budget is not None else None)
+
+        budget_report = None
+        if budget is not None:
+            original_prompt = build_rag_prompt(query, passages) if passages else query
+            budget_report = budget.report(original_prompt, prompt, truncated)
+
+        sources = [{"url": p['url'], "title": p['title'], "score": p['score']} for p in included]
+        return prompt, budget_report, sources
+
+    def _send_prompt(self, query: str, prompt: str, options: Optional[Dict[str, Any]], use_cache: bool,
+                     priority: int, rag: bool, deadline: Optional[Deadline], model: str) -> Dict[str, Any]:
+        cache_key = make_cache_key(model, prompt, options)
+        cached_response, embedding = self._lookup_caches(query, cache_key, rag, use_cache)
+        if cached_response is not None:
+            return cached_response
+
+        # Las peticiones idénticas en curso comparten una única generación, pero cada una
+        # espera como mucho hasta su propio plazo
+        def generate():
+            return self._generate(prompt, options, priority, deadline, model)
+
         try:
-            service = ChatService(ollama_settings=OllamaSettings())
-            
-            url = f"{service.ollama_settings.ollama_host}/api/generate" 
-
-            payload = json.dumps({
-                "model": service.ollama_settings.model_name,
-                "prompt": query,
-                "stream": False
-            })
-            headers = {
-                'Content-Type': 'application/json'
+            response, coalesced = get_single_flight().do(cache_key, generate, deadline)
+            if coalesced and response.get('deadline_exceeded') and not (deadline and deadline.expired()):
+                # El plazo agotado era el de la petición que generaba; esta aún tiene tiempo
+                response, coalesced = get_single_flight().do(cache_key, generate, deadline)
+        except DeadlineExceeded as e:
+            return self._generation_error(e)
+        return self._store_response(query, response, coalesced, cache_key, rag, embedding)
+
+    @staticmethod
+    def _semantic_namespace(cache_key, rag: bool) -> str:
+        # Las respuestas con contexto recuperado no se mezclan con las respuestas directas
+        return f"{cache_key[0]}|{cache_key[2]}" + ("|rag" if rag else "")
+
+    def _lookup_caches(self, query: str, cache_key, rag: bool, use_cache: bool):
+        """
+        Busca la respuesta en la caché exacta, en las FAQ por similitud y en la caché semántica
+
+        El embedding de la consulta solo se calcula si falla la caché exacta, y
+        una sola vez: las FAQ reutilizan el de la caché semántica si el almacén
+        se construyó con el mismo modelo de embeddings.
+
+        Returns:
+            Tuple: (respuesta cacheada o None, embedding de la consulta o None); el
+            embedding se calcula aunque ``use_cache`` sea False para guardar la respuesta nueva
+        """
+        cache = get_response_cache()
+        if cache is not None and use_cache:
+            cached_response = cache.get(cache_key)
+            if cached_response is not None:
+                cached_response['query'] = query
+                cached_response['cached'] = True
+                cached_response['cache_type'] = 'exact'
+                return cached_response, None
+
+        semantic_cache = get_semantic_cache()
+        embedding = None
+
+        if semantic_cache is not None:
+            try:
+                embedding = semantic_cache.embed(query)
+            except Exception as e:
+                logger.warning(f"No se pudo calcular el embedding para la caché semántica: {str(e)}")
+
+        faq_store = get_faq_store() if use_cache else None
+        if faq_store is not None and faq_store.embeddings is not None:
+            shared = embedding is not None and \
+                getattr(semantic_cache.embedder, 'model', None) == faq_store.embedding_model
+            faq_response = self._lookup_faq(query, embedding if shared else None, semantic=True)
+            if faq_response is not None:
+                return faq_response, embedding
+
+        if embedding is not None and use_cache:
+            cached_response, similarity = semantic_cache.lookup(embedding, self._semantic_namespace(cache_key, rag))
+            if cached_response is not None:
+                cached_response['query'] = query
+                cached_response['cached'] = True
+                cached_response['cache_type'] = 'semantic'
+                cached_response['similarity'] = round(similarity, 4)
+                return cached_response, embedding
+
+        return None, embedding
+
+    @staticmethod
+    def _lookup_needs_embedding(use_cache: bool) -> bool:
+        """Si ``_lookup_caches`` puede llamar a Ollama para calcular un embedding"""
+        if get_semantic_cache() is not None:
+            return True
+        faq_store = get_faq_store() if use_cache else None
+        return faq_store is not None and faq_store.embeddings is not None
+
+    def _store_response(self, query: str, response: Dict[str, Any], coalesced: bool, cache_key, rag: bool,
+                        embedding) -> Dict[str, Any]:
+        """Guarda en las cachés una respuesta recién generada (las agrupadas ya las guardó su líder)"""
+        response['query'] = query
+        if coalesced:
+            response['coalesced'] = True
+            return response
+
+        if response.get('success'):
+            cache = get_response_cache()
+            if cache is not None:
+                cache.set(cache_key, response)
+            if embedding is not None:
+                get_semantic_cache().add(embedding, self._semantic_namespace(cache_key, rag), response)
+
+        return response
+
+    def iter_batch(self, queries: List[str], concurrency: int = 1, options: Optional[Dict[str, Any]] = None,
+                   priority: int = PRIORITY_LOW, item_timeout: Optional[float] = None,
+                   budget: Optional[GenerationBudget] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Procesa un lote de consultas con un número limitado de generaciones simultáneas
+
+        Args:
+            queries (List[str]): Consultas del lote
+            concurrency (int): Máximo de consultas procesándose a la vez
+            options (Dict[str, Any], optional): Opciones de generación de Ollama
+            priority (int): Clase de prioridad en la cola de admisión (por defecto baja)
+            item_timeout (float, optional): Segundos de plazo de cada consulta, contados desde
+                que empieza a procesarse (None = sin plazo)
+            budget (GenerationBudget, optional): Límites aplicados a cada consulta
+
+        Yields:
+            Dict[str, Any]: Resultado de cada consulta con su ``index`` en el lote,
+            en el orden en que terminan
+        """
+        executor = ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(queries))))
+        try:
+            futures = {
+                executor.submit(self._send_batch_item, query, options, priority, item_timeout, budget): index
+                for index, query in enumerate(queries)
             }
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Error en el lote, consulta {index}: {str(e)}")
+                    result = {
+                        "success": False,
+                        "error": f"Error al procesar la consulta: {str(e)}",
+                        "response": None
+                    }
+                yield {"index": index, **result}
+        finally:
+            # Si el cliente abandona el stream, las consultas pendientes no llegan a enviarse
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def send_batch(self, queries: List[str], concurrency: int = 1, options: Optional[Dict[str, Any]] = None,
+                   priority: int = PRIORITY_LOW, item_timeout: Optional[float] = None,
+                   budget: Optional[GenerationBudget] = None) -> List[Dict[str, Any]]:
+        """
+        Procesa un lote de consultas y devuelve los resultados en el orden original
 
-            response = requests.post(url, headers=headers, data=payload)
+        Args:
+            queries (List[str]): Consultas del lote
+            concurrency (int): Máximo de consultas procesándose a la vez
+            options (Dict[str, Any], optional): Opciones de generación de Ollama
+            priority (int): Clase de prioridad en la cola de admisión (por defecto baja)
+            item_timeout (float, optional): Segundos de plazo de cada consulta, contados desde
+                que empieza a procesarse (None = sin plazo)
+            budget (GenerationBudget, optional): Límites aplicados a cada consulta
 
-            print(f"\n\n res: {response.text} \n\n")
+        Returns:
+            List[Dict[str, Any]]: Un resultado por consulta (con su error si falló)
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+        for result in self.iter_batch(queries, concurrency, options, priority, item_timeout, budget):
+            results[result['index']] = result
+        return results
 
+    def _send_batch_item(self, query: str, options: Optional[Dict[str, Any]], priority: int,
+                         item_timeout: Optional[float], budget: Optional[GenerationBudget]) -> Dict[str, Any]:
+        """Procesa una consulta del lote con su propio plazo, que empieza a contar al sacarla de la cola"""
+        deadline = Deadline(item_timeout) if item_timeout else None
+        return self.send_message(query, options, True, priority, deadline=deadline, budget=budget)
 
-            if response.status_code != 200:
-                raise Exception(f"Error en la petición: {response.status_code} - {response.text}")
+    def _generate(self, query: str, options: Optional[Dict[str, Any]] = None, priority: int = PRIORITY_NORMAL,
+                  deadline: Optional[Deadline] = None, model: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Genera la respuesta llamando a Ollama (sin caché)
 
-            data = response.json()
+        Args:
+            query (str): La consulta del usuario
+            options (Dict[str, Any], optional): Opciones de generación de Ollama
+            priority (int): Clase de prioridad en la cola de admisión
+            deadline (Deadline, optional): Plazo de la petición
+            model (str, optional): Modelo a usar (por defecto MODEL_NAME)
 
+        Returns:
+            Dict[str, Any]: Respuesta del modelo con metadata; ``usage`` lleva los contadores
+            de tokens y duraciones de Ollama
+        """
+        model = model or self.ollama_settings.model_name
+        try:
+            payload = self._build_payload(query, stream=False, options=options, model=model)
+            data = self._post_generate(payload, priority, deadline)
+            return self._generation_result(query, model, data)
+        except Exception as e:
+            return self._generation_error(e)
+
+    @staticmethod
+    def _generation_result(query: str, model: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Respuesta de ``send_message`` a partir del JSON de ``/api/generate``"""
+        return {
+            "success": True,
+            "response": data.get('response', ''),
+            "model": model,
+            "query": query,
+            "cached": False,
+            "usage": {field: data[field] for field in USAGE_FIELDS if field in data}
+        }
+
+    @staticmethod
+    def _generation_error(error: Exception) -> Dict[str, Any]:
+        """Respuesta de error de ``send_message`` (plazo agotado, rechazo de admisión u otro fallo)"""
+        if isinstance(error, DeadlineExceeded):
+            logger.warning(f"Generación abortada: {str(error)}")
             return {
-                "success": True,
-                "response": data.get('response', ''),  
-                "model": service.ollama_settings.model_name,
-                "query": query
+                "success": False,
+                "error": str(error),
+                "response": None,
+                "deadline_exceeded": True
             }
-        
-        except Exception as e:
-            logger.error(f"Error en ChatService.send_message: {str(e)}")
+
+        if isinstance(error, AdmissionRejected):
+            logger.warning(f"Petición rechazada por el control de admisión: {str(error)}")
             return {
                 "success": False,
-                "error": f"Error al comunicarse con el modelo: {str(e)}",
-                "response": None
+                "error": str(error),
+                "response": None,
+                "retry_after": error.retry_after
             }
-    
+
+        logger.error(f"Error en ChatService.send_message: {str(error)}")
+        return {
+            "success": False,
+            "error": f"Error al comunicarse con el modelo: {str(error)}",
+            "response": None
+        }
+
+    def _build_payload(self, prompt: str, stream: bool, options: Optional[Dict[str, Any]] = None,
+                       model: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Construye el cuerpo de una petición a ``/api/generate``
+
+        Incluye siempre ``keep_alive`` para que Ollama mantenga el modelo cargado.
+        """
+        payload = {
+            "model": model or self.ollama_settings.model_name,
+            "prompt": prompt,
+            "stream": stream,
+            "keep_alive": self.ollama_settings.keep_alive
+        }
+        if options:
+            payload["options"] = options
+        return payload
+
+    def _post_generate(self, payload: Dict[str, Any], priority: int = PRIORITY_NORMAL,
+                       deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """
+        Envía una petición no streaming a ``/api/generate``
+
+        Se espera turno en la cola de admisión y el balanceador elige el
+        servidor con menos peticiones en curso. Con ``deadline`` la espera en
+        la cola y el timeout de lectura se acotan al tiempo restante; al
+        agotarse se cierra la conexión, lo que hace que Ollama aborte la
+        generación.
+
+        Args:
+            payload (Dict[str, Any]): Cuerpo de la petición a Ollama
+            priority (int): Clase de prioridad en la cola de admisión
+            deadline (Deadline, optional): Plazo de la petición
+
+        Returns:
+            Dict[str, Any]: Respuesta JSON de Ollama
+
+        Raises:
+            AdmissionRejected: Si el servidor está saturado
+            DeadlineExceeded: Si se agota el plazo
+        """
+        with self._admission_slot(priority, deadline):
+            with get_ollama_balancer().lease() as backend:
+                client = self._get_ollama_client(backend.host)
+                try:
+                    response = client.post('/api/generate', payload,
+                                           timeout=deadline.upstream_timeout(client.timeout) if deadline else None)
+                except requests.RequestException:
+                    self._check_deadline(deadline)
+                    raise
+
+                if response.status_code != 200:
+                    raise OllamaHTTPError(response.status_code, response.text)
+
+                return response.json()
+
+    @staticmethod
+    @contextmanager
+    def _admission_slot(priority: int, deadline: Optional[Deadline]) -> Iterator[None]:
+        """Hueco en la cola de admisión; con plazo, la espera no puede superar el tiempo restante"""
+        admission = get_admission_controller()
+        try:
+            admission.acquire(priority, ChatService._admission_timeout(admission, deadline))
+        except AdmissionRejected:
+            ChatService._check_admission_deadline(deadline)
+            raise
+
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            admission.release(time.monotonic() - started_at)
+
+    @staticmethod
+    def _admission_timeout(admission, deadline: Optional[Deadline]) -> Optional[float]:
+        """Espera máxima en la cola: la de admisión acotada por el tiempo restante del plazo"""
+        if deadline is None:
+            return None
+        deadline.check()
+        return min(admission.default_timeout, deadline.remaining())
+
+    @staticmethod
+    def _check_admission_deadline(deadline: Optional[Deadline]):
+        """Un rechazo por tiempo de espera con el plazo ya agotado se convierte en DeadlineExceeded"""
+        if deadline is not None and deadline.expired():
+            raise DeadlineExceeded(f"Plazo de {deadline.timeout_seconds:g}s agotado esperando turno") from None
+
+    @staticmethod
+    def _check_deadline(deadline: Optional[Deadline]):
+        """Si el plazo se agotó durante la generación, la cuenta como cancelada y lanza DeadlineExceeded"""
+        if deadline is not None and deadline.expired():
+            get_cancellation_metrics().record(CancellationMetrics.DEADLINE)
+            raise DeadlineExceeded(f"Plazo de {deadline.timeout_seconds:g}s agotado; generación abortada")
+
+    def send_session_message(self, session: ConversationSession, query: str, priority: int = PRIORITY_NORMAL,
+                             deadline: Optional[Deadline] = None,
+                             budget: Optional[GenerationBudget] = None) -> Dict[str, Any]:
+        """
+        Envía un turno de una conversación guardada en el servidor
+
+        Solo se envía el mensaje nuevo junto con el ``context`` que Ollama
+        devolvió en el turno anterior, así el modelo no vuelve a procesar
+        toda la conversación.
+
+        Args:
+            session (ConversationSession): Conversación a continuar
+            query (str): Mensaje nuevo del usuario
+            priority (int): Clase de prioridad en la cola de admisión
+            deadline (Deadline, optional): Plazo de la petición
+            budget (GenerationBudget, optional): Límites de la generación (se recorta el mensaje nuevo)
+
+        Returns:
+            Dict[str, Any]: Respuesta del modelo con metadata
+        """
+        with session.lock:
+            try:
+                prompt = query
+                options = None
+                budget_report = None
+                if budget is not None:
+                    prompt, budget_report = budget.apply(query)
+                    options = budget.options()
+
+                # Sin enrutado: el ``context`` de Ollama solo es válido para el modelo que lo generó
+                payload = self._build_payload(prompt, stream=False, options=options)
+                if session.context:
+                    payload["context"] = session.context
+
+                data = self._post_generate(payload, priority, deadline)
+                response_text = data.get('response', '')
+                get_conversation_store().record_turn(session, query, response_text, data.get('context'))
+
+                response = {
+                    "success": True,
+                    "response": response_text,
+                    "model": self.ollama_settings.model_name,
+                    "query": query,
+                    "session_id": session.id,
+                    "turn": len(session.turns) // 2,
+                    "prompt_eval_count": data.get('prompt_eval_count'),
+                    "usage": {field: data[field] for field in USAGE_FIELDS if field in data}
+                }
+                if budget_report is not None:
+                    response['budget'] = budget_report
+                return response
+
+            except DeadlineExceeded as e:
+                logger.warning(f"Generación abortada: {str(e)}")
+                return {
+                    "success": False,
+                    "error": str(e),
+                    "response": None,
+                    "deadline_exceeded": True
+                }
+
+            except AdmissionRejected as e:
+                logger.warning(f"Petición rechazada por el control de admisión: {str(e)}")
+                return {
+                    "success": False,
+                    "error": str(e),
+                    "response": None,
+                    "retry_after": e.retry_after
+                }
+
+            except Exception as e:
+                logger.error(f"Error en ChatService.send_session_message: {str(e)}")
+                return {
+                    "success": False,
+                    "error": f"Error al comunicarse con el modelo: {str(e)}",
+                    "response": None
+                }
+
+    def stream_message(self, query: str, priority: int = PRIORITY_NORMAL, deadline: Optional[Deadline] = None,
+                       budget: Optional[GenerationBudget] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Envía un mensaje al modelo en modo streaming y emite los fragmentos
+        a medida que Ollama los genera
+
+        Si ya hay una generación en streaming idéntica en curso, la petición se
+        suscribe a ella en lugar de iniciar otra. La generación se aborta si se
+        agota el plazo o si todos los suscriptores cierran el stream. El modelo
+        lo elige el enrutador, igual que en ``send_message``.
+
+        Args:
+            query (str): La consulta del usuario
+            priority (int): Clase de prioridad en la cola de admisión
+            deadline (Deadline, optional): Plazo de la petición
+            budget (GenerationBudget, optional): Límites de la generación
+
+        Returns:
+            Iterator[Dict[str, Any]]: Eventos ``token`` con cada fragmento de
+            texto, un evento final ``done`` con el modelo y las estadísticas de
+            tiempo (y ``budget`` si se aplicó uno), o un evento ``error`` si la
+            comunicación falla (con ``retry_after`` si el servidor está saturado
+            o ``deadline_exceeded`` si se agota el plazo)
+        """
+        model = self._route(query).model
+
+        prompt = query
+        options = None
+        budget_report = None
+        if budget is not None:
+            prompt, budget_report = budget.apply(query)
+            options = budget.options()
+
+        key = make_cache_key(model, prompt, options) + ('stream',)
+        events = get_stream_flight().subscribe(
+            key, lambda: self._generate_stream(prompt, priority, deadline, model, options), deadline)
+        if budget_report is None:
+            return events
+        return self._with_budget_report(events, budget_report)
+
+    @staticmethod
+    def _with_budget_report(events: Iterator[Dict[str, Any]], budget_report: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Añade el informe del presupuesto al evento ``done``"""
+        try:
+            for event in events:
+                if event['type'] == 'done':
+                    event['budget'] = budget_report
+                yield event
+        finally:
+            events.close()
+
+    def _generate_stream(self, query: str, priority: int = PRIORITY_NORMAL, deadline: Optional[Deadline] = None,
+                         model: Optional[str] = None,
+                         options: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Genera la respuesta en streaming llamando a Ollama
+
+        Cerrar el generador cierra la conexión con Ollama, que deja de generar.
+
+        Args:
+            query (str): La consulta del usuario
+            priority (int): Clase de prioridad en la cola de admisión
+            deadline (Deadline, optional): Plazo de la petición
+            model (str, optional): Modelo a usar (por defecto MODEL_NAME)
+            options (Dict[str, Any], optional): Opciones de generación de Ollama
+
+        Yields:
+            Dict[str, Any]: Eventos ``token``, ``done`` o ``error``
+        """
+        model = model or self.ollama_settings.model_name
+        payload = self._build_payload(query, stream=True, options=options, model=model)
+
+        started_at = time.perf_counter()
+        first_token_at = None
+
+        try:
+            with self._admission_slot(priority, deadline):
+                with get_ollama_balancer().lease() as backend:
+                    client = self._get_ollama_client(backend.host)
+                    timeout = deadline.upstream_timeout(client.timeout) if deadline else None
+
+                    with client.post('/api/generate', payload, stream=True, timeout=timeout) as response:
+                        if response.status_code != 200:
+                            raise OllamaHTTPError(response.status_code, response.text)
+
+                        # Ollama responde con NDJSON: un objeto JSON por línea
+                        for line in self._iter_lines(response, deadline):
+                            self._check_deadline(deadline)
+                            if not line:
+                                continue
+
+                            chunk = json.loads(line)
+
+                            if chunk.get('error'):
+                                raise Exception(chunk['error'])
+
+                            text = chunk.get('response', '')
+                            if text:
+                                if first_token_at is None:
+                                    first_token_at = time.perf_counter()
+                                yield {"type": "token", "response": text}
+
+                            if chunk.get('done'):
+                                yield {
+                                    "type": "done",
+                                    "model": chunk.get('model', model),
+                                    "stats": self._build_stats(chunk, started_at, first_token_at)
+                                }
+                                return
+
+                    raise Exception("La conexión con Ollama se cerró antes de completar la respuesta")
+
+        except DeadlineExceeded as e:
+            logger.warning(f"Generación en streaming abortada: {str(e)}")
+            yield {
+                "type": "error",
+                "error": str(e),
+                "deadline_exceeded": True
+            }
+
+        except AdmissionRejected as e:
+            logger.warning(f"Petición rechazada por el control de admisión: {str(e)}")
+            yield {
+                "type": "error",
+                "error": str(e),
+                "retry_after": e.retry_after
+            }
+
+        except Exception as e:
+            logger.error(f"Error en ChatService.stream_message: {str(e)}")
+            yield {
+                "type": "error",
+                "error": f"Error al comunicarse con el modelo: {str(e)}"
+            }
+
+    @classmethod
+    def _iter_lines(cls, response, deadline: Optional[Deadline]) -> Iterator[bytes]:
+        """Líneas de la respuesta; un timeout de lectura por plazo agotado se convierte en DeadlineExceeded"""
+        try:
+            yield from response.iter_lines()
+        except requests.RequestException:
+            cls._check_deadline(deadline)
+            raise
+
+    @staticmethod
+    def _build_stats(chunk: Dict[str, Any], started_at: float, first_token_at) -> Dict[str, Any]:
+        """
+        Construye las estadísticas de tiempo a partir del último fragmento de Ollama
+
+        Las duraciones de Ollama vienen en nanosegundos; se mantienen tal cual y
+        se añade el tiempo hasta el primer token medido en este servidor.
+        """
+        stats = {
+            key: chunk[key]
+            for key in (
+                'total_duration', 'load_duration', 'prompt_eval_count',
+                'prompt_eval_duration', 'eval_count', 'eval_duration'
+            )
+            if key in chunk
+        }
+
+        if first_token_at is not None:
+            stats['time_to_first_token_ms'] = round((first_token_at - started_at) * 1000, 2)
+
+        if stats.get('eval_count') and stats.get('eval_duration'):
+            stats['tokens_per_second'] = round(stats['eval_count'] / (stats['eval_duration'] / 1e9), 2)
+
+        return stats
+
     def _is_model_available(self) -> bool:
         """
-        Verifica si el modelo Gemma:7B está disponible en Ollama
+        Verifica si el modelo Gemma:7B está disponible en algún servidor Ollama
         
         Returns:
             bool: True si el modelo está disponible, False en caso contrario
         """
         try:
-            client = self._get_ollama_client()
-            models = client.list()
-            available_models = [model['name'] for model in models.get('models', [])]
-            return any(self.ollama_settings.model_name in model for model in available_models)
+            backends = self._model_info_cache().get()['backends'] or []
+            return any(backend['model_available'] for backend in backends)
         except Exception as e:
             logger.error(f"Error verificando disponibilidad del modelo: {str(e)}")
             return False
+
+    def _model_info_cache(self) -> ModelInfoCache:
+        """Caché compartida de los modelos de cada servidor, recargada en segundo plano"""
+        return get_model_info_cache(self._collect_backend_models)
+
+    def _collect_backend_models(self) -> List[Dict[str, Any]]:
+        """
+        Consulta los modelos de cada servidor Ollama del balanceador
+
+        Returns:
+            List[Dict[str, Any]]: Estado de cada backend con ``model_available``
+            y, si lo tiene, la ficha del modelo en ``model``
+        """
+        backends = []
+        for state in get_ollama_balancer().states():
+            try:
+                models = self._get_ollama_client(state['host']).list_models()
+                model = next(
+                    (m for m in models.get('models', []) if self.ollama_settings.model_name in m['name']),
+                    None
+                )
+                state['model_available'] = model is not None
+                state['model'] = model
+            except Exception as e:
+                logger.error(f"Error listando modelos en {state['host']}: {str(e)}")
+                state['model_available'] = False
+                state['model'] = None
+                state['error'] = str(e)
+            backends.append(state)
+        return backends
     
-    @staticmethod
-    def get_model_info() -> Dict[str, Any]:
+    def get_model_info(self) -> Dict[str, Any]:
         """
-        Obtiene información sobre el modelo actual
+        Obtiene información sobre el modelo actual y el estado de cada servidor Ollama
+
+        Los datos salen de una caché recargada en segundo plano; si están
+        caducados se devuelven igualmente mientras se recargan.
         
         Returns:
             Dict[str, Any]: Información del modelo
         """
         try:
-            service = ChatService(ollama_settings=OllamaSettings())
-            client = service._get_ollama_client()
-            models = client.list()
-            
-            for model in models.get('models', []):
-                if service.ollama_settings.model_name in model['name']:
+            cached = self._model_info_cache().get()
+            backends = cached['backends']
+            if backends is None:
+                raise Exception("No se pudo obtener la lista de modelos de ningún servidor")
+
+            balancer_states = {state['host']: state for state in get_ollama_balancer().states()}
+            backend_states = [
+                {
+                    **{key: value for key, value in backend.items() if key != 'model'},
+                    **balancer_states.get(backend['host'], {})
+                }
+                for backend in backends
+            ]
+            freshness = {
+                "cache_age_seconds": cached['age_seconds'],
+                "refreshing": cached['refreshing']
+            }
+
+            for backend in backends:
+                model = backend['model']
+                if model:
                     return {
                         "success": True,
                         "model_info": {
                             "name": model['name'],
                             "size": model.get('size', 'Unknown'),
                             "modified_at": model.get('modified_at', 'Unknown'),
-                            "host": service.ollama_settings.ollama_host
-                        }
+                            "host": backend['host'],
+                            "backends": backend_states
+                        },
+                        **freshness
                     }
-            
+
+            errors = [backend['error'] for backend in backends if backend.get('error')]
+            if len(errors) == len(backends):
+                raise Exception(errors[-1])
+
             return {
                 "success": False,
-                "error": f"Modelo {service.ollama_settings.model_name} no encontrado"
+                "error": f"Modelo {self.ollama_settings.model_name} no encontrado",
+                "backends": backend_states,
+                **freshness
             }
             
         except Exception as e:
@@ -123,3 +847,32 @@ class ChatService:
                 "success": False,
                 "error": f"Error obteniendo información del modelo: {str(e)}"
             }
+
+    @staticmethod
+    def get_stats() -> Dict[str, Any]:
+        """
+        Obtiene los contadores de rendimiento del servicio de chat
+
+        Returns:
+            Dict[str, Any]: Estadísticas de las cachés de respuestas y de la agrupación de peticiones
+        """
+        cache = get_response_cache()
+        semantic_cache = get_semantic_cache()
+        faq_store = get_faq_store()
+        chat_log_writer = get_chat_log_writer()
+        return {
+            "success": True,
+            "cache": cache.stats() if cache is not None else {"enabled": False},
+            "semantic_cache": semantic_cache.stats() if semantic_cache is not None else {"enabled": False},
+            "coalescing": {
+                "requests": get_single_flight().stats(),
+                "streams": get_stream_flight().stats()
+            },
+            "backends": get_ollama_balancer().states(),
+            "admission": get_admission_controller().stats(),
+            "sessions": get_conversation_store().stats(),
+            "cancellations": get_cancellation_metrics().stats(),
+            "routing": get_model_router().stats(),
+            "faq": faq_store.stats() if faq_store is not None else {"enabled": False},
+            "chat_log": chat_log_writer.stats() if chat_log_writer is not None else {"enabled": False}
+        }
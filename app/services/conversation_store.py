@@ -0,0 +1,127 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+from config.ollama_settings import get_ollama_settings
+
+
+class ConversationSession:
+    """Conversación guardada en el servidor con el estado ``context`` de Ollama"""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.context: List[int] = []
+        self.turns: List[Dict[str, str]] = []
+        self.created_at = time.time()
+        self.last_used = time.monotonic()
+        # Serializa los turnos de una misma conversación
+        self.lock = threading.Lock()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.id,
+            "created_at": self.created_at,
+            "turns": list(self.turns),
+            "context_tokens": len(self.context)
+        }
+
+
+class ConversationStore:
+    """
+    Almacén en memoria de conversaciones.
+
+    Guarda como máximo ``max_sessions`` conversaciones (expulsando la usada
+    hace más tiempo), descarta las inactivas durante ``ttl_seconds`` y limita
+    tanto los turnos guardados como el tamaño del ``context`` de cada una.
+    """
+
+    def __init__(self, max_sessions: int = 1000, ttl_seconds: float = 1800,
+                 max_turns: int = 50, max_context_tokens: int = 8192):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_turns = max_turns
+        self.max_context_tokens = max_context_tokens
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def create(self) -> ConversationSession:
+        """Crea una conversación vacía"""
+        session = ConversationSession()
+        with self._lock:
+            self._purge_expired()
+            self._sessions[session.id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+        return session
+
+    def get(self, session_id: str) -> Optional[ConversationSession]:
+        """Devuelve una conversación y la marca como usada, o None si no existe o expiró"""
+        with self._lock:
+            self._purge_expired()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_used = time.monotonic()
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        """Elimina una conversación"""
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def record_turn(self, session: ConversationSession, query: str, response: str, context: Optional[List[int]]):
+        """Guarda el turno y el nuevo ``context`` devuelto por Ollama (respetando los límites)"""
+        session.turns.append({"role": "user", "content": query})
+        session.turns.append({"role": "assistant", "content": response})
+        del session.turns[:-2 * self.max_turns]
+
+        # Si el contexto crece demasiado se conservan los tokens más recientes,
+        # igual que hace Ollama al superar num_ctx
+        session.context = list(context or [])[-self.max_context_tokens:]
+        session.last_used = time.monotonic()
+
+    def _purge_expired(self):
+        # Debe llamarse con el lock tomado; el OrderedDict está ordenado por último uso
+        now = time.monotonic()
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_used <= self.ttl_seconds:
+                break
+            del self._sessions[session_id]
+            self.expirations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores del almacén"""
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "ttl_seconds": self.ttl_seconds,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+
+_conversation_store: Optional[ConversationStore] = None
+_conversation_store_lock = threading.Lock()
+
+
+def get_conversation_store() -> ConversationStore:
+    """Devuelve el almacén de conversaciones del proceso"""
+    global _conversation_store
+
+    if _conversation_store is None:
+        with _conversation_store_lock:
+            if _conversation_store is None:
+                settings = get_ollama_settings()
+                _conversation_store = ConversationStore(
+                    max_sessions=settings.chat_sessions_max,
+                    ttl_seconds=settings.chat_sessions_ttl_seconds,
+                    max_turns=settings.chat_session_max_turns,
+                    max_context_tokens=settings.chat_session_max_context_tokens
+                )
+    return _conversation_store
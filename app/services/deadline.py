@@ -0,0 +1,96 @@
+import math
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+
+
+class DeadlineExceeded(Exception):
+    """Se agotó el plazo de la petición antes de completar la generación"""
+
+
+class Deadline:
+    """
+    Instante límite de una petición de chat.
+
+    Se crea al recibir la petición y acompaña a la generación: limita la
+    espera en la cola de admisión y se convierte en el timeout de lectura de
+    la petición a Ollama.
+    """
+
+    def __init__(self, timeout_seconds: float):
+        self.timeout_seconds = timeout_seconds
+        self.expires_at = time.monotonic() + timeout_seconds
+
+    def remaining(self) -> float:
+        """Segundos que quedan (0 si ya expiró)"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def check(self):
+        """Lanza DeadlineExceeded si el plazo ya expiró"""
+        if self.expired():
+            raise DeadlineExceeded(f"Plazo de {self.timeout_seconds:g}s agotado")
+
+    def upstream_timeout(self, timeout: Tuple[float, float]) -> Tuple[float, float]:
+        """Timeout (connect, read) para Ollama acotado por el tiempo restante"""
+        connect_timeout, read_timeout = timeout
+        remaining = max(self.remaining(), 0.001)
+        return min(connect_timeout, remaining), min(read_timeout, remaining)
+
+
+class CancellationMetrics:
+    """Contadores de generaciones abortadas, por motivo"""
+
+    DEADLINE = 'deadline'
+    CLIENT_DISCONNECT = 'client_disconnect'
+
+    def __init__(self):
+        self._counts: Dict[str, int] = {self.DEADLINE: 0, self.CLIENT_DISCONNECT: 0}
+        self._lock = threading.Lock()
+
+    def record(self, reason: str):
+        with self._lock:
+            self._counts[reason] = self._counts.get(reason, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._counts, total=sum(self._counts.values()))
+
+
+_cancellation_metrics = CancellationMetrics()
+
+
+def get_cancellation_metrics() -> CancellationMetrics:
+    """Devuelve los contadores de cancelaciones del proceso"""
+    return _cancellation_metrics
+
+
+def parse_timeout(header_value: Optional[str], default_seconds: float, max_seconds: float) -> Optional[float]:
+    """
+    Segundos de plazo de una petición a partir de la cabecera ``X-Request-Timeout``
+
+    Args:
+        header_value (str, optional): Segundos indicados por el cliente
+        default_seconds (float): Plazo si no hay cabecera (0 = sin plazo)
+        max_seconds (float): Plazo máximo aceptado
+
+    Returns:
+        Optional[float]: Los segundos, o None si no se aplica ningún plazo
+
+    Raises:
+        ValueError: Si la cabecera no es un número finito mayor que 0 (``nan``, ``inf``, ``-1``...)
+    """
+    seconds = default_seconds
+    if header_value is not None and header_value.strip():
+        try:
+            seconds = float(header_value)
+        except ValueError:
+            seconds = math.nan
+        if not math.isfinite(seconds) or seconds <= 0:
+            raise ValueError(f"X-Request-Timeout debe ser un número de segundos mayor que 0: {header_value!r}")
+
+    if not seconds or seconds <= 0:
+        return None
+    return min(seconds, max_seconds)
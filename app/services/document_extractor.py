@@ -0,0 +1,287 @@
+import logging
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from bs4 import BeautifulSoup, NavigableString, Tag
+from bs4.builder import builder_registry
+
+logger = logging.getLogger(__name__)
+
+# Parsers HTML admitidos; ``auto`` usa lxml (en C) si está instalado y si no el de la biblioteca estándar
+PARSER_AUTO = 'auto'
+PARSER_LXML = 'lxml'
+PARSER_HTML = 'html.parser'
+PARSERS = (PARSER_AUTO, PARSER_LXML, PARSER_HTML)
+
+# Selectores de cada campo, en orden de prioridad
+TITLE_SELECTORS = (
+    'h1', 'h2.titulo', '.titulo-tramite', '.page-title',
+    '[class*="titulo"]', '[class*="title"]'
+)
+DESCRIPTION_SELECTORS = (
+    '.descripcion', '.description', '.resumen', '.summary',
+    '[class*="descripcion"]', '[class*="description"]',
+    'p.intro', '.contenido-principal p'
+)
+ADDITIONAL_SELECTORS = (
+    '.info-adicional', '.additional-info', '.notas', '.notes',
+    '.importante', '.important', '.observaciones'
+)
+
+# Palabras clave de las secciones de requisitos y de procedimientos
+REQUIREMENT_KEYWORDS = (
+    'requisitos', 'requirements', 'documentos', 'documents',
+    'necesario', 'requerido'
+)
+PROCEDURE_KEYWORDS = (
+    'procedimiento', 'procedure', 'tramite', 'proceso',
+    'pasos', 'steps', 'como'
+)
+
+MAX_SECTION_TEXTS = 10
+# A partir de este número de textos solo se añade un hermano por coincidencia
+SIBLING_TEXTS_LIMIT = 5
+
+_KEYWORD_PATTERNS = {keyword: re.compile(keyword, re.IGNORECASE)
+                     for keyword in REQUIREMENT_KEYWORDS + PROCEDURE_KEYWORDS}
+# Una sola alternativa con todas las palabras clave: descarta de una vez los textos sin ninguna
+_ANY_KEYWORD = re.compile('|'.join(f'(?:{keyword})' for keyword in _KEYWORD_PATTERNS), re.IGNORECASE)
+
+_COMPOUND = re.compile(r'([a-z][a-z0-9]*)?((?:\.[\w-]+|\[class\*="[^"]+"\])*)', re.IGNORECASE)
+_COMPOUND_PART = re.compile(r'\.([\w-]+)|\[class\*="([^"]+)"\]')
+
+TextOf = Callable[[Tag], str]
+
+
+def parser_backend(name: str = PARSER_AUTO) -> str:
+    """
+    Parser de BeautifulSoup que se usará para ``name``
+
+    Con ``auto`` (o si se pide lxml y no está instalado) se usa lxml cuando
+    está disponible y si no ``html.parser``. En páginas bien formadas ambos
+    producen la misma extracción; con marcado roto (párrafos sin cerrar...)
+    los árboles pueden diferir.
+
+    Raises:
+        ValueError: Si ``name`` no es uno de ``PARSERS``
+    """
+    if name not in PARSERS:
+        raise ValueError(f"Parser no soportado: {name} (usa uno de: {', '.join(PARSERS)})")
+    if name == PARSER_HTML:
+        return PARSER_HTML
+    if builder_registry.lookup(PARSER_LXML) is not None:
+        return PARSER_LXML
+    if name == PARSER_LXML:
+        logger.warning("lxml no está instalado; se usa html.parser")
+    return PARSER_HTML
+
+
+def parse_page(content, parser: str = PARSER_HTML) -> BeautifulSoup:
+    """Parsea el HTML descargado con el parser indicado (ya resuelto con ``parser_backend``)"""
+    return BeautifulSoup(content, parser)
+
+
+class SimpleSelector:
+    """
+    Selector CSS precompilado que se evalúa elemento a elemento.
+
+    Admite el subconjunto que usa la extracción: tipo (``h1``), clases
+    (``.titulo``), subcadena en la clase (``[class*="titulo"]``), sus
+    combinaciones (``h2.titulo``) y el combinador descendiente
+    (``.contenido-principal p``). Coincide con los mismos elementos que
+    ``select`` de BeautifulSoup, pero sin recorrer el árbol: así todos los
+    selectores se evalúan en un único recorrido del documento.
+    """
+
+    def __init__(self, selector: str):
+        self.selector = selector
+        # Último compuesto primero; los anteriores deben coincidir con algún antecesor, en orden
+        self._compounds = [self._compile(part) for part in reversed(selector.split())]
+
+    @staticmethod
+    def _compile(compound: str) -> Tuple[Optional[str], Tuple[str, ...], Tuple[str, ...]]:
+        match = _COMPOUND.fullmatch(compound)
+        if not match or not compound:
+            raise ValueError(f"Selector no soportado: {compound}")
+        classes = tuple(cls for cls, _ in _COMPOUND_PART.findall(match.group(2)) if cls)
+        substrings = tuple(sub for _, sub in _COMPOUND_PART.findall(match.group(2)) if sub)
+        return (match.group(1) or '').lower() or None, classes, substrings
+
+    @staticmethod
+    def _matches_compound(tag: Tag, compound) -> bool:
+        name, classes, substrings = compound
+        if name is not None and tag.name != name:
+            return False
+        if not classes and not substrings:
+            return True
+
+        tag_classes = tag.get('class')
+        if tag_classes is None:
+            return False
+        if isinstance(tag_classes, str):
+            tag_classes = tag_classes.split()
+        if any(cls not in tag_classes for cls in classes):
+            return False
+        class_value = ' '.join(tag_classes)
+        return all(sub in class_value for sub in substrings)
+
+    def match(self, tag: Tag) -> bool:
+        if not self._matches_compound(tag, self._compounds[0]):
+            return False
+        ancestor = tag.parent
+        for compound in self._compounds[1:]:
+            while ancestor is not None and not (isinstance(ancestor, Tag) and ancestor.name != '[document]'
+                                                and self._matches_compound(ancestor, compound)):
+                ancestor = ancestor.parent
+            if ancestor is None:
+                return False
+            ancestor = ancestor.parent
+        return True
+
+
+def _compile_all(selectors: Sequence[str]) -> List[SimpleSelector]:
+    return [SimpleSelector(selector) for selector in selectors]
+
+
+_TITLE = _compile_all(TITLE_SELECTORS)
+_DESCRIPTION = _compile_all(DESCRIPTION_SELECTORS)
+_ADDITIONAL = _compile_all(ADDITIONAL_SELECTORS)
+
+
+class _FirstWithText:
+    """
+    Texto del primer selector (por prioridad) cuyo primer elemento tiene texto
+
+    Equivale a probar ``select_one`` selector a selector. Cuando un selector
+    ya da texto, los de menor prioridad dejan de evaluarse.
+    """
+
+    def __init__(self, selectors: List[SimpleSelector]):
+        self.selectors = selectors
+        self.texts: List[Optional[str]] = [None] * len(selectors)
+        self.found = [False] * len(selectors)
+        self.limit = len(selectors)
+
+    def feed(self, tag: Tag, text_of: TextOf):
+        for i in range(self.limit):
+            if not self.found[i] and self.selectors[i].match(tag):
+                self.found[i] = True
+                text = text_of(tag)
+                if text:
+                    self.texts[i] = text
+                    self.limit = i
+                    return
+
+    def result(self) -> str:
+        return next((text for text in self.texts if text), '')
+
+
+def extract_document_info(soup) -> Dict[str, Any]:
+    """
+    Extrae la información del documento recorriendo el árbol una sola vez
+
+    En el mismo recorrido se evalúan los selectores de título, descripción e
+    información adicional y se buscan las palabras clave de requisitos y
+    procedimientos (con una sola expresión regular). El resultado es el mismo
+    que el de la extracción original selector a selector y palabra a palabra:
+    mismo orden de prioridad, mismos textos y mismos límites.
+
+    Args:
+        soup (BeautifulSoup): Página parseada; al terminar se han eliminado sus
+            ``script``, ``style``, ``meta`` y ``link``
+
+    Returns:
+        Dict[str, Any]: ``title``, ``description``, ``requirements``,
+        ``procedures``, ``additional_info`` y ``raw_text``
+    """
+    document_info = {
+        'title': '',
+        'description': '',
+        'requirements': [],
+        'procedures': [],
+        'additional_info': [],
+        'raw_text': ''
+    }
+
+    texts: Dict[int, str] = {}
+
+    def text_of(tag: Tag) -> str:
+        key = id(tag)
+        if key not in texts:
+            texts[key] = tag.get_text(strip=True)
+        return texts[key]
+
+    title = _FirstWithText(_TITLE)
+    description = _FirstWithText(_DESCRIPTION)
+    additional: List[List[Tag]] = [[] for _ in _ADDITIONAL]
+    keyword_matches: Dict[str, List[NavigableString]] = {keyword: [] for keyword in _KEYWORD_PATTERNS}
+
+    for node in soup.descendants:
+        if isinstance(node, Tag):
+            title.feed(node, text_of)
+            description.feed(node, text_of)
+            for selector, elements in zip(_ADDITIONAL, additional):
+                if selector.match(node):
+                    elements.append(node)
+        elif isinstance(node, NavigableString) and _ANY_KEYWORD.search(node):
+            for keyword, pattern in _KEYWORD_PATTERNS.items():
+                if pattern.search(node):
+                    keyword_matches[keyword].append(node)
+
+    document_info['title'] = title.result()
+    document_info['description'] = description.result()
+    document_info['requirements'] = _section_texts(keyword_matches, REQUIREMENT_KEYWORDS, text_of)
+    document_info['procedures'] = _section_texts(keyword_matches, PROCEDURE_KEYWORDS, text_of)
+
+    for elements in additional:
+        for elem in elements:
+            text = text_of(elem)
+            if text and len(text) > 10:
+                document_info['additional_info'].append(text)
+
+    # Extraer todo el texto visible de la página (sin scripts, estilos, etc.)
+    for script in soup(["script", "style", "meta", "link"]):
+        script.decompose()
+
+    all_text = soup.get_text()
+    lines = (line.strip() for line in all_text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    document_info['raw_text'] = ' '.join(chunk for chunk in chunks if chunk)
+
+    return document_info
+
+
+def _section_texts(keyword_matches: Dict[str, List[NavigableString]], keywords: Sequence[str],
+                   text_of: TextOf) -> List[str]:
+    """
+    Textos de una sección a partir de los textos que contienen sus palabras clave
+
+    Recorre las coincidencias palabra a palabra y, dentro de cada palabra, en
+    orden de documento. De cada una toma el texto del elemento padre (sin
+    repetir) y el de sus hermanos siguientes hasta reunir
+    ``SIBLING_TEXTS_LIMIT`` textos. Solo se devuelven los
+    ``MAX_SECTION_TEXTS`` primeros, así que al llegar a ese número se para.
+    """
+    texts: List[str] = []
+
+    for keyword in keywords:
+        for element in keyword_matches[keyword]:
+            if len(texts) >= MAX_SECTION_TEXTS:
+                return texts[:MAX_SECTION_TEXTS]
+
+            parent = element.parent
+            if parent:
+                text = text_of(parent)
+                if text and len(text) > 20 and text not in texts:
+                    texts.append(text)
+
+                for sibling in parent.next_siblings:
+                    if not isinstance(sibling, Tag):
+                        continue
+                    sibling_text = text_of(sibling)
+                    if sibling_text and len(sibling_text) > 20:
+                        texts.append(sibling_text)
+                    if len(texts) >= SIBLING_TEXTS_LIMIT:
+                        break
+
+    return texts[:MAX_SECTION_TEXTS]
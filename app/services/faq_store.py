@@ -0,0 +1,240 @@
+import os
+import re
+import tempfile
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, List, Optional, Sequence
+import logging
+import numpy as np
+from config.faq_settings import get_faq_settings
+from services.semantic_cache import OllamaEmbedder
+
+logger = logging.getLogger(__name__)
+
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def faq_key(question: str) -> str:
+    """
+    Clave normalizada de una pregunta: sin acentos, signos ni mayúsculas
+
+    Se conservan todas las palabras (también "no", "sin", "con"...): quitarlas
+    daría la misma clave, y la misma respuesta, a preguntas opuestas.
+    """
+    text = unicodedata.normalize('NFKD', question.lower()).replace('·', '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(_WORD_RE.findall(text))
+
+
+def load_questions(path: str) -> List[str]:
+    """Lee la lista de preguntas (una por línea; se ignoran las vacías y las que empiezan por #)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+
+class FaqStore:
+    """
+    Respuestas precalculadas a preguntas frecuentes.
+
+    La búsqueda es primero por clave normalizada (un acceso a diccionario) y,
+    si el almacén se construyó con embeddings, por similitud coseno contra la
+    matriz de embeddings de las preguntas. Se guarda en un único fichero
+    ``.npz`` comprimido.
+    """
+
+    def __init__(self, questions: Sequence[str], answers: Sequence[str], models: Sequence[str],
+                 embeddings: Optional[np.ndarray] = None, embedding_model: Optional[str] = None,
+                 built_at: Optional[float] = None, threshold: float = 0.9):
+        self.questions = list(questions)
+        self.answers = list(answers)
+        self.models = list(models)
+        self.embeddings = embeddings if embeddings is not None and len(embeddings) else None
+        self.embedding_model = embedding_model or None
+        self.built_at = built_at or time.time()
+        self.threshold = threshold
+        self._embedder = None
+        self._keys = {faq_key(question): index for index, question in enumerate(self.questions)}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    def embed(self, text: str) -> np.ndarray:
+        """Embedding normalizado de una consulta con el modelo usado al construir el almacén"""
+        if self._embedder is None:
+            self._embedder = OllamaEmbedder(self.embedding_model)
+        vector = np.asarray(self._embedder(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup_key(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Busca solo por clave normalizada, sin calcular embeddings
+
+        Un fallo solo cuenta si el almacén no tiene embeddings; si los tiene,
+        la búsqueda sigue después con ``lookup`` y el embedding de la consulta.
+        """
+        index = self._keys.get(faq_key(query))
+        if index is None and self.embeddings is not None:
+            return None
+        return self._match(index, 1.0)
+
+    def lookup(self, query: str, embedding: Optional[np.ndarray] = None) -> Optional[Dict[str, Any]]:
+        """
+        Busca la respuesta precalculada de una consulta
+
+        Args:
+            query (str): Consulta del usuario
+            embedding (np.ndarray, optional): Embedding normalizado de la consulta con
+                ``embedding_model`` si ya se calculó (p. ej. para la caché semántica);
+                si no se indica, se calcula aquí
+
+        Returns:
+            Optional[Dict[str, Any]]: ``question``, ``answer``, ``model`` y ``similarity``,
+            o None si no hay ninguna suficientemente parecida
+        """
+        index = self._keys.get(faq_key(query))
+        similarity = 1.0
+
+        if index is None and self.embeddings is not None:
+            try:
+                scores = self.embeddings @ (embedding if embedding is not None else self.embed(query))
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    index, similarity = best, float(scores[best])
+            except Exception as e:
+                logger.warning(f"No se pudo calcular el embedding para las FAQ: {str(e)}")
+
+        return self._match(index, similarity)
+
+    def _match(self, index: Optional[int], similarity: float) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if index is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        return {
+            "question": self.questions[index],
+            "answer": self.answers[index],
+            "model": self.models[index],
+            "similarity": similarity
+        }
+
+    def save(self, path: str):
+        """Guarda el almacén (escritura atómica)"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.npz')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez_compressed(
+                f,
+                questions=np.array(self.questions, dtype=str),
+                answers=np.array(self.answers, dtype=str),
+                models=np.array(self.models, dtype=str),
+                embeddings=self.embeddings if self.embeddings is not None else np.zeros((0, 0), dtype=np.float32),
+                embedding_model=np.array(self.embedding_model or ''),
+                built_at=np.array(self.built_at)
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, threshold: float = 0.9) -> 'FaqStore':
+        """Carga un almacén guardado con ``save``"""
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                questions=data['questions'].tolist(),
+                answers=data['answers'].tolist(),
+                models=data['models'].tolist(),
+                embeddings=data['embeddings'].astype(np.float32),
+                embedding_model=str(data['embedding_model']),
+                built_at=float(data['built_at']),
+                threshold=threshold
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self.questions),
+                "semantic": self.embeddings is not None,
+                "built_at": self.built_at,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+def build_faq_store(questions: Sequence[str], answer: Callable[[str], Dict[str, Any]],
+                    embedder: Optional[Callable[[str], Sequence[float]]] = None, embedding_model: Optional[str] = None,
+                    concurrency: int = 1,
+                    progress: Optional[Callable[[int, int, str, bool], None]] = None) -> FaqStore:
+    """
+    Genera las respuestas de una lista de preguntas
+
+    Args:
+        questions (Sequence[str]): Preguntas curadas
+        answer (Callable): Función que responde una pregunta (p. ej. ``ChatService.send_message``)
+        embedder (Callable, optional): Función de embeddings; sin ella solo se busca por clave
+        embedding_model (str, optional): Nombre del modelo de embeddings (se guarda en el almacén)
+        concurrency (int): Preguntas respondidas a la vez
+        progress (Callable, optional): Se llama con (hechas, total, pregunta, éxito) tras cada pregunta
+
+    Returns:
+        FaqStore: Almacén con las preguntas respondidas correctamente
+    """
+    done = [0]
+    done_lock = threading.Lock()
+
+    def run(question: str) -> Optional[Dict[str, Any]]:
+        result = answer(question)
+        ok = bool(result.get('success'))
+        with done_lock:
+            done[0] += 1
+            if progress:
+                progress(done[0], len(questions), question, ok)
+        return result if ok else None
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        results = list(executor.map(run, questions))
+
+    answered = [(question, result) for question, result in zip(questions, results) if result is not None]
+    embeddings = None
+    if embedder is not None and answered:
+        vectors = np.asarray([embedder(question) for question, _ in answered], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        embeddings = vectors / np.where(norms == 0, 1, norms)
+
+    return FaqStore(
+        questions=[question for question, _ in answered],
+        answers=[result['response'] for _, result in answered],
+        models=[result.get('model') or '' for _, result in answered],
+        embeddings=embeddings,
+        embedding_model=embedding_model if embeddings is not None else None
+    )
+
+
+_faq_store: Optional[FaqStore] = None
+_faq_store_loaded = False
+_faq_store_lock = threading.Lock()
+
+
+def get_faq_store() -> Optional[FaqStore]:
+    """Devuelve el almacén de FAQ del proceso, o None si está desactivado o no se ha construido"""
+    global _faq_store, _faq_store_loaded
+
+    if not _faq_store_loaded:
+        with _faq_store_lock:
+            if not _faq_store_loaded:
+                settings = get_faq_settings()
+                if settings.faq_enabled and os.path.exists(settings.faq_store_path):
+                    try:
+                        _faq_store = FaqStore.load(settings.faq_store_path, settings.faq_similarity_threshold)
+                        logger.info(f"FAQ precalculadas cargadas: {len(_faq_store)} preguntas")
+                    except Exception as e:
+                        logger.error(f"No se pudo cargar el almacén de FAQ {settings.faq_store_path}: {str(e)}")
+                _faq_store_loaded = True
+    return _faq_store
@@ -0,0 +1,253 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from config.scraping_settings import get_scraping_settings
+
+logger = logging.getLogger(__name__)
+
+
+class FetchEntry:
+    """Última descarga correcta de una URL: validadores HTTP y extracción"""
+
+    def __init__(self, url: str, etag: Optional[str], last_modified: Optional[str], fetched_at: float,
+                 document_info: Dict[str, Any], size: int = 0):
+        self.url = url
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+        self.document_info = document_info
+        self.size = size
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Cabeceras ``If-None-Match`` / ``If-Modified-Since`` para revalidar la descarga"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class FetchCache:
+    """
+    Caché en disco de las páginas descargadas por ``ScrapingService``.
+
+    Por cada URL guarda el cuerpo descargado (``<clave>.body``) y, en un JSON
+    aparte (``<clave>.json``), el ``ETag``, el ``Last-Modified``, la hora de la
+    descarga y la información extraída. Al volver a descargar la URL se envían
+    ``If-None-Match`` / ``If-Modified-Since``; si la sede responde ``304 Not
+    Modified`` se reutiliza la extracción guardada sin descargar ni parsear la
+    página.
+
+    El tamaño total en disco está acotado a ``max_bytes``: al superarlo se
+    eliminan las entradas usadas hace más tiempo. Solo se guardan las
+    respuestas que traen algún validador (sin ellos no hay revalidación
+    posible). Las entradas sobreviven a los reinicios del proceso.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 50 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max(0, max_bytes)
+        # Claves por orden de uso (la primera es la usada hace más tiempo) -> bytes en disco
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.stores = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        """Carga el tamaño de las entradas ya guardadas, de la más antigua a la más reciente"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            key = name[:-len('.json')]
+            try:
+                meta_path = self._path(key, '.json')
+                size = os.path.getsize(meta_path) + os.path.getsize(self._path(key, '.body'))
+                entries.append((os.path.getmtime(meta_path), key, size))
+            except OSError:
+                self._remove_files(key)
+        for _, key, size in sorted(entries):
+            self._sizes[key] = size
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, key + suffix)
+
+    def get(self, url: str) -> Optional[FetchEntry]:
+        """
+        Entrada guardada de ``url``
+
+        Returns:
+            Optional[FetchEntry]: La entrada, o None si la URL no está en la caché
+        """
+        key = self._key(url)
+        with self._lock:
+            if key not in self._sizes:
+                self.misses += 1
+                return None
+            self._sizes.move_to_end(key)
+
+        try:
+            with open(self._path(key, '.json'), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Entrada de la caché de descargas ilegible para {url}: {str(e)}")
+            with self._lock:
+                self._drop(key)
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return FetchEntry(meta['url'], meta.get('etag'), meta.get('last_modified'), meta['fetched_at'],
+                          meta['document_info'], self._sizes.get(key, 0))
+
+    def body(self, url: str) -> Optional[bytes]:
+        """Cuerpo guardado de ``url``, o None si no está en la caché"""
+        try:
+            with open(self._path(self._key(url), '.body'), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def revalidated(self, url: str):
+        """Anota que la sede confirmó (``304``) que la copia guardada sigue vigente"""
+        key = self._key(url)
+        with self._lock:
+            self.not_modified += 1
+            if key in self._sizes:
+                self._sizes.move_to_end(key)
+        try:
+            os.utime(self._path(key, '.json'))
+        except OSError:
+            pass
+
+    def store(self, url: str, content: bytes, etag: Optional[str], last_modified: Optional[str],
+              document_info: Dict[str, Any]) -> bool:
+        """
+        Guarda una descarga correcta y su extracción
+
+        Args:
+            url (str): URL descargada
+            content (bytes): Cuerpo de la respuesta
+            etag (str, optional): Cabecera ``ETag`` de la respuesta
+            last_modified (str, optional): Cabecera ``Last-Modified`` de la respuesta
+            document_info (Dict[str, Any]): Información extraída de la página
+
+        Returns:
+            bool: False si no se guardó (sin validadores, demasiado grande o error de disco)
+        """
+        if not etag and not last_modified:
+            return False
+
+        key = self._key(url)
+        meta = json.dumps({
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'fetched_at': time.time(),
+            'document_info': document_info
+        }, ensure_ascii=False).encode('utf-8')
+        size = len(meta) + len(content)
+        if size > self.max_bytes:
+            return False
+
+        try:
+            # Primero el cuerpo y después el JSON: una entrada solo existe cuando su JSON está completo
+            self._write_atomic(self._path(key, '.body'), content)
+            self._write_atomic(self._path(key, '.json'), meta)
+        except OSError as e:
+            logger.error(f"No se pudo guardar {url} en la caché de descargas: {str(e)}")
+            return False
+
+        with self._lock:
+            self._sizes[key] = size
+            self._sizes.move_to_end(key)
+            self.stores += 1
+            self._evict()
+        return True
+
+    def _write_atomic(self, path: str, data: bytes):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _evict(self):
+        """Elimina las entradas usadas hace más tiempo hasta volver a ``max_bytes`` (con el lock tomado)"""
+        while self._sizes and sum(self._sizes.values()) > self.max_bytes:
+            key = next(iter(self._sizes))
+            self._drop(key)
+            self.evictions += 1
+
+    def _drop(self, key: str):
+        self._sizes.pop(key, None)
+        self._remove_files(key)
+
+    def _remove_files(self, key: str):
+        for suffix in ('.json', '.body'):
+            try:
+                os.remove(self._path(key, suffix))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"No se pudo borrar {key}{suffix} de la caché de descargas: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": True,
+                "entries": len(self._sizes),
+                "bytes": sum(self._sizes.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "stores": self.stores,
+                "evictions": self.evictions
+            }
+
+
+_fetch_cache: Optional[FetchCache] = None
+_fetch_cache_created = False
+_fetch_cache_lock = threading.Lock()
+
+
+def get_fetch_cache() -> Optional[FetchCache]:
+    """Devuelve la caché de descargas del proceso, o None si está desactivada"""
+    global _fetch_cache, _fetch_cache_created
+
+    if not _fetch_cache_created:
+        with _fetch_cache_lock:
+            if not _fetch_cache_created:
+                settings = get_scraping_settings()
+                if settings.scrape_fetch_cache_enabled:
+                    try:
+                        _fetch_cache = FetchCache(settings.scrape_fetch_cache_dir,
+                                                  max_bytes=settings.scrape_fetch_cache_max_bytes)
+                    except OSError as e:
+                        logger.error(f"No se pudo abrir la caché de descargas en "
+                                     f"{settings.scrape_fetch_cache_dir}: {str(e)}")
+                _fetch_cache_created = True
+    return _fetch_cache
@@ -0,0 +1,139 @@
+import math
+import re
+from typing import Dict, Any, Optional, Tuple
+from config.ollama_settings import get_ollama_settings
+
+BUDGET_ANONYMOUS = 'anonymous'
+BUDGET_AUTHENTICATED = 'authenticated'
+BUDGET_BATCH = 'batch'
+
+# Marca que sustituye a la parte recortada del prompt
+TRUNCATION_MARKER = "\n[...]\n"
+
+# Aproximación sin tokenizador: ~4 caracteres por token en castellano/catalán con gemma
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimación del número de tokens de un texto"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_prompt(prompt: str, max_tokens: int) -> Tuple[str, bool]:
+    """
+    Recorta un prompt al presupuesto de tokens conservando el principio y el final
+
+    La pregunta suele estar al final (después de un texto pegado) y el
+    contexto al principio, así que se elimina la parte central. Los cortes se
+    hacen en espacios para no partir palabras.
+
+    Returns:
+        Tuple[str, bool]: Prompt (recortado o no) y si se recortó
+    """
+    if estimate_tokens(prompt) <= max_tokens:
+        return prompt, False
+
+    max_chars = max(max_tokens * CHARS_PER_TOKEN - len(TRUNCATION_MARKER), 2)
+    head_chars = max_chars // 3
+    tail_chars = max_chars - head_chars
+
+    head = prompt[:head_chars]
+    cut = head.rfind(' ')
+    if cut > head_chars // 2:
+        head = head[:cut]
+
+    tail = prompt[-tail_chars:]
+    match = re.search(r"\s", tail)
+    if match and match.start() < tail_chars // 2:
+        tail = tail[match.end():]
+
+    return head.rstrip() + TRUNCATION_MARKER + tail.lstrip(), True
+
+
+class GenerationBudget:
+    """
+    Límites de una generación: tokens del prompt, tokens generados
+    (``num_predict``), tamaño de contexto (``num_ctx``) y temperatura.
+    """
+
+    def __init__(self, name: str, max_prompt_tokens: int, num_predict: int, num_ctx: int, temperature: float):
+        self.name = name
+        self.num_ctx = num_ctx
+        # El prompt y la respuesta tienen que caber juntos en el contexto. Con un contexto
+        # pequeño se reduce la respuesta para que el prompt conserve al menos la mitad
+        # (o todo su límite, si es menor)
+        reserved_prompt_tokens = min(max_prompt_tokens, num_ctx // 2)
+        self.num_predict = max(1, min(num_predict, num_ctx - reserved_prompt_tokens))
+        self.max_prompt_tokens = max(1, min(max_prompt_tokens, num_ctx - self.num_predict))
+        self.temperature = temperature
+
+    def narrow(self, max_prompt_tokens: Optional[int] = None, num_predict: Optional[int] = None,
+               num_ctx: Optional[int] = None, temperature: Optional[float] = None) -> 'GenerationBudget':
+        """
+        Aplica los valores pedidos por el cliente sin superar los del presupuesto
+
+        Returns:
+            GenerationBudget: Nuevo presupuesto (los límites solo pueden bajar; la temperatura se sustituye)
+        """
+        return GenerationBudget(
+            name=self.name,
+            max_prompt_tokens=min(max_prompt_tokens or self.max_prompt_tokens, self.max_prompt_tokens),
+            num_predict=min(num_predict or self.num_predict, self.num_predict),
+            num_ctx=min(num_ctx or self.num_ctx, self.num_ctx),
+            temperature=self.temperature if temperature is None else temperature
+        )
+
+    def options(self) -> Dict[str, Any]:
+        """Opciones de Ollama correspondientes al presupuesto"""
+        return {
+            "num_predict": self.num_predict,
+            "num_ctx": self.num_ctx,
+            "temperature": self.temperature
+        }
+
+    def apply(self, prompt: str) -> Tuple[str, Dict[str, Any]]:
+        """
+        Recorta el prompt al presupuesto
+
+        Returns:
+            Tuple[str, Dict[str, Any]]: Prompt a enviar e informe del presupuesto aplicado
+        """
+        truncated_prompt, truncated = truncate_prompt(prompt, self.max_prompt_tokens)
+        return truncated_prompt, self.report(prompt, truncated_prompt, truncated)
+
+    def report(self, original_prompt: str, prompt: str, truncated: bool) -> Dict[str, Any]:
+        """
+        Informe del presupuesto aplicado a un prompt ya recortado
+
+        Args:
+            original_prompt (str): Prompt completo antes de recortarlo
+            prompt (str): Prompt que se envía al modelo
+            truncated (bool): Si se recortó alguna parte
+        """
+        return {
+            "class": self.name,
+            "max_prompt_tokens": self.max_prompt_tokens,
+            "num_predict": self.num_predict,
+            "num_ctx": self.num_ctx,
+            "temperature": self.temperature,
+            "prompt_tokens": estimate_tokens(prompt),
+            "original_prompt_tokens": estimate_tokens(original_prompt),
+            "truncated": truncated
+        }
+
+
+def get_generation_budget(name: str) -> GenerationBudget:
+    """
+    Presupuesto configurado para una clase de petición (CHAT_BUDGETS)
+
+    Las clases sin configuración usan la de ``anonymous``.
+    """
+    budgets = get_ollama_settings().chat_budgets
+    config = budgets.get(name) or budgets[BUDGET_ANONYMOUS]
+    return GenerationBudget(
+        name=name,
+        max_prompt_tokens=int(config['max_prompt_tokens']),
+        num_predict=int(config['num_predict']),
+        num_ctx=int(config['num_ctx']),
+        temperature=float(config['temperature'])
+    )
@@ -0,0 +1,146 @@
+import copy
+import threading
+import time
+from typing import Callable, Dict, Any, List, Optional
+import logging
+from config.ollama_settings import get_ollama_settings
+
+logger = logging.getLogger(__name__)
+
+ModelInfoLoader = Callable[[], List[Dict[str, Any]]]
+
+
+class ModelInfoCache:
+    """
+    Caché en memoria de los modelos disponibles en cada servidor Ollama.
+
+    Un hilo en segundo plano recarga los datos cada ``refresh_interval``
+    segundos. Las lecturas nunca esperan a una recarga salvo la primera: si
+    los datos están caducados se devuelven igualmente y se lanza una única
+    recarga en segundo plano. Si una recarga falla se conservan los últimos
+    datos buenos.
+    """
+
+    def __init__(self, loader: ModelInfoLoader, refresh_interval: float = 30.0):
+        self.loader = loader
+        self.refresh_interval = refresh_interval
+        self._snapshot: Optional[List[Dict[str, Any]]] = None
+        self._refreshed_at: Optional[float] = None
+        self._refreshing = False
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.refreshes = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    def get(self) -> Dict[str, Any]:
+        """
+        Devuelve los datos cacheados
+
+        Returns:
+            Dict[str, Any]: ``backends`` (lista por servidor o None si nunca se
+            pudieron cargar), ``age_seconds`` y ``refreshing``
+        """
+        with self._condition:
+            stale = self._snapshot is None or self._age() > self.refresh_interval
+            start_refresh = stale and not self._refreshing
+            if start_refresh:
+                self._refreshing = True
+            first_load = self._snapshot is None
+
+        if first_load:
+            if start_refresh:
+                self._refresh()
+            else:
+                with self._condition:
+                    self._condition.wait_for(lambda: not self._refreshing, timeout=30)
+        elif start_refresh:
+            threading.Thread(target=self._refresh, name='model-info-refresh', daemon=True).start()
+
+        with self._condition:
+            return {
+                "backends": copy.deepcopy(self._snapshot),
+                "age_seconds": round(self._age(), 2) if self._refreshed_at is not None else None,
+                "refreshing": self._refreshing
+            }
+
+    def refresh(self):
+        """Recarga los datos ahora (si no hay otra recarga en curso)"""
+        with self._condition:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        self._refresh()
+
+    def _refresh(self):
+        # Quien llama ya ha marcado _refreshing
+        try:
+            snapshot = self.loader()
+            with self._condition:
+                self._snapshot = snapshot
+                self._refreshed_at = time.monotonic()
+                self.refreshes += 1
+        except Exception as e:
+            logger.error(f"Error recargando la información de modelos: {str(e)}")
+            with self._condition:
+                self.failures += 1
+                self.last_error = str(e)
+        finally:
+            with self._condition:
+                self._refreshing = False
+                self._condition.notify_all()
+
+    def _age(self) -> float:
+        return time.monotonic() - self._refreshed_at if self._refreshed_at is not None else float('inf')
+
+    def start(self):
+        """Arranca la recarga periódica en segundo plano"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._refresh_loop, name='model-info-timer', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Detiene la recarga periódica"""
+        self._stop.set()
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_interval):
+            self.refresh()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de recarga"""
+        with self._condition:
+            return {
+                "refresh_interval": self.refresh_interval,
+                "age_seconds": round(self._age(), 2) if self._refreshed_at is not None else None,
+                "refreshing": self._refreshing,
+                "refreshes": self.refreshes,
+                "failures": self.failures,
+                "last_error": self.last_error
+            }
+
+
+_model_info_cache: Optional[ModelInfoCache] = None
+_model_info_cache_lock = threading.Lock()
+
+
+def get_model_info_cache(loader: ModelInfoLoader) -> ModelInfoCache:
+    """
+    Devuelve la caché de modelos del proceso (MODEL_INFO_REFRESH_INTERVAL)
+
+    Args:
+        loader (Callable): Función que consulta los modelos de cada servidor;
+            solo se usa la primera vez, al crear la caché
+    """
+    global _model_info_cache
+
+    if _model_info_cache is None:
+        with _model_info_cache_lock:
+            if _model_info_cache is None:
+                _model_info_cache = ModelInfoCache(
+                    loader=loader,
+                    refresh_interval=get_ollama_settings().model_info_refresh_interval
+                )
+                _model_info_cache.start()
+    return _model_info_cache
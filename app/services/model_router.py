@@ -0,0 +1,110 @@
+import re
+import threading
+import unicodedata
+from typing import Dict, Any, NamedTuple, Optional
+from config.ollama_settings import get_ollama_settings
+
+# Peticiones que piden razonar o redactar (castellano y catalán, sin acentos):
+# se envían al modelo de calidad aunque sean cortas
+QUALITY_INTENT_RE = re.compile(
+    r"\b(explica|explicame|compar|diferenci|por que|per que|redact|escrib|escriu|resum|anali[zt]|"
+    r"detall|paso a paso|pas a pas|ventaja|avantatge|desavantatge|traduc|argument|razona|raona)"
+)
+
+
+class RoutingDecision(NamedTuple):
+    """Modelo elegido para una petición y el motivo"""
+    model: str
+    reason: str
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+
+class ModelRouter:
+    """
+    Elige entre un modelo rápido y uno de calidad para cada petición.
+
+    Reglas, en orden:
+
+    1. Sin modelo rápido configurado, todo va al modelo de calidad.
+    2. Si la cola de admisión tiene ``overload_queue_depth`` peticiones o más,
+       se usa el modelo rápido para mantener la latencia.
+    3. Las peticiones que piden explicar, comparar, redactar, etc. van al
+       modelo de calidad.
+    4. Las peticiones de más de ``max_fast_words`` palabras van al modelo de
+       calidad; el resto, al rápido.
+    """
+
+    def __init__(self, quality_model: str, fast_model: Optional[str] = None, max_fast_words: int = 30,
+                 overload_queue_depth: int = 4):
+        self.quality_model = quality_model
+        self.fast_model = fast_model or None
+        self.max_fast_words = max_fast_words
+        self.overload_queue_depth = overload_queue_depth
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.fast_model is not None and self.fast_model != self.quality_model
+
+    def route(self, prompt: str, queue_depth: int = 0) -> RoutingDecision:
+        """
+        Elige el modelo para una petición
+
+        Args:
+            prompt (str): Consulta del usuario (sin el contexto añadido por el servidor)
+            queue_depth (int): Peticiones esperando en la cola de admisión
+
+        Returns:
+            RoutingDecision: Modelo elegido y motivo (disabled, overload, intent, length o short)
+        """
+        if not self.enabled:
+            decision = RoutingDecision(self.quality_model, 'disabled')
+        elif self.overload_queue_depth > 0 and queue_depth >= self.overload_queue_depth:
+            decision = RoutingDecision(self.fast_model, 'overload')
+        elif QUALITY_INTENT_RE.search(_normalize(prompt)):
+            decision = RoutingDecision(self.quality_model, 'intent')
+        elif len(prompt.split()) > self.max_fast_words:
+            decision = RoutingDecision(self.quality_model, 'length')
+        else:
+            decision = RoutingDecision(self.fast_model, 'short')
+
+        with self._lock:
+            key = f"{decision.model}:{decision.reason}"
+            self._counts[key] = self._counts.get(key, 0) + 1
+        return decision
+
+    def stats(self) -> Dict[str, Any]:
+        """Modelos configurados y peticiones enrutadas por modelo y motivo"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "fast_model": self.fast_model,
+                "quality_model": self.quality_model,
+                "decisions": dict(self._counts)
+            }
+
+
+_model_router: Optional[ModelRouter] = None
+_model_router_lock = threading.Lock()
+
+
+def get_model_router() -> ModelRouter:
+    """Devuelve el enrutador del proceso (CHAT_FAST_MODEL, CHAT_ROUTING_MAX_FAST_WORDS, CHAT_ROUTING_OVERLOAD_QUEUE_DEPTH)"""
+    global _model_router
+
+    if _model_router is None:
+        with _model_router_lock:
+            if _model_router is None:
+                settings = get_ollama_settings()
+                _model_router = ModelRouter(
+                    quality_model=settings.model_name,
+                    fast_model=settings.chat_fast_model,
+                    max_fast_words=settings.chat_routing_max_fast_words,
+                    overload_queue_depth=settings.chat_routing_overload_queue_depth
+                )
+    return _model_router
@@ -0,0 +1,129 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Union
+import logging
+from config.ollama_settings import OllamaSettings, get_ollama_settings
+from services.ollama_balancer import OllamaBalancer, get_ollama_balancer
+from services.ollama_client import OllamaHTTPError, get_ollama_client
+
+logger = logging.getLogger(__name__)
+
+
+class ModelWarmer:
+    """
+    Mantiene el modelo cargado en memoria en cada servidor Ollama.
+
+    ``warm_up`` envía a todos los servidores una generación vacía (Ollama
+    carga el modelo sin generar texto) con el ``keep_alive`` configurado. El
+    hilo de mantenimiento repite ese ping cada ``interval`` segundos, pero
+    solo en los servidores que no han recibido peticiones desde el último
+    ciclo: el tráfico normal ya renueva el ``keep_alive``.
+    """
+
+    def __init__(self, balancer: OllamaBalancer, model: str, keep_alive: Union[str, int], interval: float = 240.0):
+        self.balancer = balancer
+        self.model = model
+        self.keep_alive = keep_alive
+        self.interval = interval
+        self._last_requests: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.pings = 0
+        self.failures = 0
+
+    def warm_up(self, hosts: Optional[List[str]] = None) -> Dict[str, bool]:
+        """
+        Carga el modelo en los servidores indicados (por defecto en todos)
+
+        Returns:
+            Dict[str, bool]: Resultado por servidor
+        """
+        hosts = hosts if hosts is not None else [backend.host for backend in self.balancer.backends]
+        if not hosts:
+            return {}
+
+        with ThreadPoolExecutor(max_workers=len(hosts)) as executor:
+            return dict(zip(hosts, executor.map(self._ping, hosts)))
+
+    def _ping(self, host: str) -> bool:
+        try:
+            client = get_ollama_client(host)
+            response = client.post('/api/generate', {
+                "model": self.model,
+                "prompt": "",
+                "stream": False,
+                "keep_alive": self.keep_alive
+            })
+            if response.status_code != 200:
+                raise OllamaHTTPError(response.status_code, response.text)
+            self.pings += 1
+            logger.info(f"Modelo {self.model} cargado en {host}")
+            return True
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"No se pudo precargar {self.model} en {host}: {str(e)}")
+            return False
+
+    def idle_hosts(self) -> List[str]:
+        """Servidores sanos sin peticiones desde la última comprobación"""
+        idle = []
+        for state in self.balancer.states():
+            previous = self._last_requests.get(state['host'])
+            self._last_requests[state['host']] = state['total_requests']
+            if state['healthy'] and state['in_flight'] == 0 and previous == state['total_requests']:
+                idle.append(state['host'])
+        return idle
+
+    def start(self):
+        """Arranca el ping periódico de mantenimiento"""
+        if self._thread is None and self.interval > 0:
+            self.idle_hosts()
+            self._thread = threading.Thread(target=self._keep_warm_loop, name='ollama-keep-warm', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Detiene el ping periódico"""
+        self._stop.set()
+
+    def _keep_warm_loop(self):
+        while not self._stop.wait(self.interval):
+            hosts = self.idle_hosts()
+            if hosts:
+                self.warm_up(hosts)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "keep_alive": self.keep_alive,
+            "interval": self.interval,
+            "pings": self.pings,
+            "failures": self.failures
+        }
+
+
+def start_model_warmer(settings: Optional[OllamaSettings] = None) -> Optional[ModelWarmer]:
+    """
+    Precarga el modelo y arranca el ping de mantenimiento según la configuración
+
+    Con ``OLLAMA_WARMUP_ON_STARTUP`` se envía la generación de calentamiento a
+    todos los servidores (en segundo plano, sin bloquear el arranque). Con
+    ``OLLAMA_KEEP_WARM_INTERVAL`` > 0 se arranca el ping periódico.
+
+    Returns:
+        ModelWarmer: El calentador, o None si ambas opciones están desactivadas
+    """
+    settings = settings or get_ollama_settings()
+    if not settings.ollama_warmup_on_startup and settings.ollama_keep_warm_interval <= 0:
+        return None
+
+    warmer = ModelWarmer(
+        balancer=get_ollama_balancer(),
+        model=settings.model_name,
+        keep_alive=settings.keep_alive,
+        interval=settings.ollama_keep_warm_interval
+    )
+
+    if settings.ollama_warmup_on_startup:
+        threading.Thread(target=warmer.warm_up, name='ollama-warm-up', daemon=True).start()
+
+    warmer.start()
+    return warmer
@@ -0,0 +1,199 @@
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, Iterator, List, Optional
+import logging
+from config.ollama_settings import get_ollama_settings
+from services.deadline import DeadlineExceeded
+from services.ollama_client import OllamaHTTPError, get_ollama_client
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaBackend:
+    """Estado de un servidor Ollama dentro del balanceador"""
+
+    def __init__(self, host: str):
+        self.host = host.rstrip('/')
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.healthy = True
+        self.ejected_at: Optional[float] = None
+        self.total_requests = 0
+        self.total_failures = 0
+        self.last_error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "host": self.host,
+            "healthy": self.healthy,
+            "in_flight": self.in_flight,
+            "consecutive_failures": self.consecutive_failures,
+            "total_requests": self.total_requests,
+            "total_failures": self.total_failures,
+            "ejected_seconds_ago": round(time.monotonic() - self.ejected_at, 1) if self.ejected_at else None,
+            "last_error": self.last_error
+        }
+
+
+def _probe_host(host: str) -> bool:
+    """Comprueba que un host de Ollama responde a ``/api/tags``"""
+    client = get_ollama_client(host)
+    response = client.get('/api/tags', timeout=(client.timeout[0], client.timeout[0]))
+    return response.status_code == 200
+
+
+class OllamaBalancer:
+    """
+    Reparte las peticiones entre varios servidores Ollama.
+
+    Cada petición va al backend sano con menos peticiones en curso (a igualdad,
+    por turnos). Un backend se expulsa tras ``eject_after`` fallos consecutivos
+    y un hilo en segundo plano lo vuelve a sondear cada ``probe_interval``
+    segundos hasta que responde. Si todos están expulsados se sigue usando el
+    que lleva más tiempo fuera, para no cortar el servicio por completo.
+    """
+
+    def __init__(self, hosts: List[str], eject_after: int = 3, probe_interval: float = 10.0,
+                 probe: Callable[[str], bool] = _probe_host):
+        if not hosts:
+            raise ValueError("Se necesita al menos un host de Ollama")
+
+        self.backends = [OllamaBackend(host) for host in hosts]
+        self.eject_after = eject_after
+        self.probe_interval = probe_interval
+        self.probe = probe
+        self._lock = threading.Lock()
+        self._next = 0
+        self._stop = threading.Event()
+        self._probe_thread: Optional[threading.Thread] = None
+
+    def acquire(self) -> OllamaBackend:
+        """Elige el backend para una petición y lo marca como ocupado"""
+        with self._lock:
+            candidates = [backend for backend in self.backends if backend.healthy]
+            if not candidates:
+                candidates = [min(self.backends, key=lambda backend: backend.ejected_at or 0)]
+
+            # Menos peticiones en curso; a igualdad, el siguiente por turnos
+            count = len(self.backends)
+            backend = min(
+                candidates,
+                key=lambda b: (b.in_flight, (self.backends.index(b) - self._next) % count)
+            )
+            self._next = (self.backends.index(backend) + 1) % count
+
+            backend.in_flight += 1
+            backend.total_requests += 1
+            return backend
+
+    def release(self, backend: OllamaBackend, success: bool, error: Optional[str] = None):
+        """Libera el backend y registra el resultado de la petición"""
+        with self._lock:
+            backend.in_flight -= 1
+            if success:
+                backend.consecutive_failures = 0
+                if not backend.healthy:
+                    backend.healthy = True
+                    backend.ejected_at = None
+                    logger.info(f"Backend Ollama {backend.host} readmitido tras una petición correcta")
+                return
+
+            backend.consecutive_failures += 1
+            backend.total_failures += 1
+            backend.last_error = error
+            if backend.healthy and backend.consecutive_failures >= self.eject_after:
+                backend.healthy = False
+                backend.ejected_at = time.monotonic()
+                logger.warning(f"Backend Ollama {backend.host} expulsado tras {backend.consecutive_failures} fallos: {error}")
+
+    @contextmanager
+    def lease(self) -> Iterator[OllamaBackend]:
+        """
+        Reserva un backend durante el bloque
+
+        Cuentan como fallo los errores de conexión, los timeouts y las respuestas
+        5xx. Una respuesta 4xx (modelo no descargado, petición inválida) es un
+        error de la petición y no del servidor, que sí ha respondido.
+        """
+        backend = self.acquire()
+        try:
+            yield backend
+        except (GeneratorExit, DeadlineExceeded, asyncio.CancelledError):
+            # El consumidor cerró el stream, se agotó su plazo o se canceló la corrutina: no es un fallo del backend
+            self.release(backend, success=True)
+            raise
+        except OllamaHTTPError as e:
+            if e.status_code < 500:
+                self.release(backend, success=True)
+            else:
+                self.release(backend, success=False, error=str(e))
+            raise
+        except Exception as e:
+            self.release(backend, success=False, error=str(e))
+            raise
+        else:
+            self.release(backend, success=True)
+
+    def probe_ejected(self):
+        """Sondea los backends expulsados y readmite los que responden"""
+        with self._lock:
+            ejected = [backend for backend in self.backends if not backend.healthy]
+
+        for backend in ejected:
+            try:
+                alive = self.probe(backend.host)
+            except Exception as e:
+                alive = False
+                backend.last_error = str(e)
+
+            if alive:
+                with self._lock:
+                    backend.healthy = True
+                    backend.ejected_at = None
+                    backend.consecutive_failures = 0
+                logger.info(f"Backend Ollama {backend.host} readmitido")
+
+    def start(self):
+        """Arranca el hilo de sondeo de backends expulsados"""
+        if self._probe_thread is None and len(self.backends) > 1:
+            self._probe_thread = threading.Thread(target=self._probe_loop, name='ollama-probe', daemon=True)
+            self._probe_thread.start()
+
+    def stop(self):
+        """Detiene el hilo de sondeo"""
+        self._stop.set()
+
+    def _probe_loop(self):
+        while not self._stop.wait(self.probe_interval):
+            try:
+                self.probe_ejected()
+            except Exception as e:
+                logger.error(f"Error sondeando backends de Ollama: {str(e)}")
+
+    def states(self) -> List[Dict[str, Any]]:
+        """Estado de cada backend"""
+        with self._lock:
+            return [backend.to_dict() for backend in self.backends]
+
+
+_balancer: Optional[OllamaBalancer] = None
+_balancer_lock = threading.Lock()
+
+
+def get_ollama_balancer() -> OllamaBalancer:
+    """Devuelve el balanceador del proceso construido a partir de OLLAMA_HOSTS / OLLAMA_HOST"""
+    global _balancer
+
+    if _balancer is None:
+        with _balancer_lock:
+            if _balancer is None:
+                settings = get_ollama_settings()
+                _balancer = OllamaBalancer(
+                    hosts=settings.ollama_host_list,
+                    eject_after=settings.ollama_eject_after_failures,
+                    probe_interval=settings.ollama_probe_interval
+                )
+                _balancer.start()
+    return _balancer
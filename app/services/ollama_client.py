@@ -0,0 +1,118 @@
+import threading
+from typing import Dict, Any, Optional, Tuple
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from config.ollama_settings import OllamaSettings, get_ollama_settings
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaHTTPError(Exception):
+    """Ollama respondió con un código HTTP distinto de 200"""
+
+    def __init__(self, status_code: int, text: str):
+        super().__init__(f"Error en la petición: {status_code} - {text}")
+        self.status_code = status_code
+
+
+class OllamaClient:
+    """
+    Cliente HTTP para la API de Ollama con un pool de conexiones keep-alive.
+
+    Una instancia por host se comparte entre todas las peticiones e hilos del
+    proceso (ver ``get_ollama_client``), de modo que las conexiones TCP se
+    reutilizan en lugar de abrirse y cerrarse en cada llamada.
+    """
+
+    def __init__(self, host: str, pool_size: int = 10, connect_timeout: float = 5.0, read_timeout: float = 120.0):
+        self.host = host.rstrip('/')
+        self.timeout: Tuple[float, float] = (connect_timeout, read_timeout)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'Content-Type': 'application/json'
+        })
+
+    def post(self, path: str, payload: Dict[str, Any], stream: bool = False,
+             timeout: Optional[Tuple[float, float]] = None) -> requests.Response:
+        """
+        Envía un POST JSON a la API de Ollama
+
+        Args:
+            path (str): Ruta de la API, por ejemplo ``/api/generate``
+            payload (Dict[str, Any]): Cuerpo de la petición
+            stream (bool): Si es True no se descarga el cuerpo hasta iterarlo
+            timeout: Timeout (connect, read) que sustituye al configurado
+
+        Returns:
+            requests.Response: Respuesta HTTP de Ollama
+        """
+        return self.session.post(f"{self.host}{path}", json=payload, stream=stream, timeout=timeout or self.timeout)
+
+    def get(self, path: str, timeout: Optional[Tuple[float, float]] = None) -> requests.Response:
+        """Envía un GET a la API de Ollama"""
+        return self.session.get(f"{self.host}{path}", timeout=timeout or self.timeout)
+
+    def list_models(self) -> Dict[str, Any]:
+        """
+        Lista los modelos disponibles en el host (equivalente a ``ollama list``)
+
+        Returns:
+            Dict[str, Any]: Respuesta de ``/api/tags`` con la clave ``models``
+        """
+        response = self.get('/api/tags')
+        if response.status_code != 200:
+            raise OllamaHTTPError(response.status_code, response.text)
+        return response.json()
+
+    def close(self):
+        """Cierra todas las conexiones del pool"""
+        self.session.close()
+
+
+_clients: Dict[str, OllamaClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_ollama_client(host: Optional[str] = None, settings: Optional[OllamaSettings] = None) -> OllamaClient:
+    """
+    Devuelve el cliente compartido para un host de Ollama, creándolo la primera vez
+
+    Args:
+        host (str, optional): URL del host; por defecto ``OLLAMA_HOST``
+        settings (OllamaSettings, optional): Configuración del pool y timeouts
+
+    Returns:
+        OllamaClient: Cliente reutilizable entre peticiones e hilos
+    """
+    settings = settings or get_ollama_settings()
+    host = (host or settings.ollama_host).rstrip('/')
+
+    client = _clients.get(host)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(host)
+        if client is None:
+            logger.info(f"Creando pool de conexiones Ollama para {host}")
+            client = OllamaClient(
+                host=host,
+                pool_size=settings.ollama_pool_size,
+                connect_timeout=settings.ollama_connect_timeout,
+                read_timeout=settings.ollama_read_timeout
+            )
+            _clients[host] = client
+        return client
+
+
+def close_ollama_clients():
+    """Cierra y descarta todos los clientes compartidos"""
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
@@ -0,0 +1,314 @@
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, Any, List, Optional, Tuple
+import logging
+from config.rag_settings import get_rag_settings
+from services.generation_budget import CHARS_PER_TOKEN, TRUNCATION_MARKER, estimate_tokens, truncate_prompt
+
+logger = logging.getLogger(__name__)
+
+# Palabras vacías frecuentes en castellano y catalán (sin acentos, como quedan tras normalizar)
+STOPWORDS = frozenset("""
+a al algo als amb aquest aquesta aqui com con cual cuando de del dels des el els ella ellos en entre es esta
+este esto estos fins ha han hay i la las le les lo los mas me mes mi no nos o on per pero perque por que qui
+se segons ser si sin sobre son su sus te tambien tot tots tu un una uno unos va y ya
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Tokeniza texto en castellano o catalán para el índice
+
+    Pasa a minúsculas, elimina acentos y diacríticos (incluida la ela geminada
+    ``l·l``), separa apóstrofos (``d'habitants`` → ``habitants``), descarta
+    palabras vacías y reduce los plurales simples.
+    """
+    text = unicodedata.normalize('NFKD', text.lower()).replace('·', '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+
+    tokens = []
+    for token in _TOKEN_RE.findall(text):
+        if len(token) < 2 or token in STOPWORDS:
+            continue
+        if len(token) > 4 and token.endswith('s'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def split_passages(document_info: Dict[str, Any], passage_words: int = 80) -> List[str]:
+    """
+    Divide la información extraída de una página en pasajes cortos
+
+    Cada elemento de ``requirements``, ``procedures`` y ``additional_info`` es
+    un pasaje; el ``raw_text`` se trocea en ventanas de ``passage_words``
+    palabras.
+    """
+    passages = []
+    description = document_info.get('description')
+    if description:
+        passages.append(description)
+
+    for field in ('requirements', 'procedures', 'additional_info'):
+        passages.extend(text for text in document_info.get(field) or [] if text)
+
+    words = (document_info.get('raw_text') or '').split()
+    for start in range(0, len(words), passage_words):
+        passages.append(' '.join(words[start:start + passage_words]))
+
+    # Sin duplicados, conservando el orden
+    return list(dict.fromkeys(passage.strip() for passage in passages if passage.strip()))
+
+
+class PadronIndex:
+    """
+    Índice invertido BM25 de pasajes de las páginas de trámites.
+
+    Cada página (identificada por su URL) aporta varios pasajes. Volver a
+    indexar una URL sustituye sus pasajes anteriores, de modo que el índice se
+    actualiza de forma incremental al re-scrapear. El índice se guarda en
+    disco como JSON.
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._passages: Dict[int, Dict[str, Any]] = {}
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self._documents: Dict[str, List[int]] = {}
+        self._total_length = 0
+        self._next_id = 0
+        self._lock = threading.RLock()
+
+        if path and os.path.exists(path):
+            self.load()
+
+    def upsert_document(self, url: str, document_info: Dict[str, Any], passage_words: int = 80) -> int:
+        """
+        Indexa (o reindexa) una página
+
+        Args:
+            url (str): URL de la página
+            document_info (Dict[str, Any]): Información extraída por ScrapingService
+            passage_words (int): Palabras por pasaje del texto completo
+
+        Returns:
+            int: Número de pasajes indexados
+        """
+        title = document_info.get('title', '')
+        passages = split_passages(document_info, passage_words)
+
+        with self._lock:
+            self._remove_document(url)
+            ids = []
+            for text in passages:
+                terms = Counter(tokenize(f"{title} {text}"))
+                if not terms:
+                    continue
+                passage_id = self._next_id
+                self._next_id += 1
+                length = sum(terms.values())
+                self._passages[passage_id] = {"url": url, "title": title, "text": text, "length": length}
+                for term, frequency in terms.items():
+                    self._postings[term][passage_id] = frequency
+                self._total_length += length
+                ids.append(passage_id)
+            self._documents[url] = ids
+
+        return len(ids)
+
+    def remove_document(self, url: str) -> bool:
+        """Elimina los pasajes de una página"""
+        with self._lock:
+            return self._remove_document(url)
+
+    def _remove_document(self, url: str) -> bool:
+        ids = self._documents.pop(url, None)
+        if ids is None:
+            return False
+        for passage_id in ids:
+            passage = self._passages.pop(passage_id)
+            self._total_length -= passage['length']
+            for term in set(tokenize(f"{passage['title']} {passage['text']}")):
+                postings = self._postings.get(term)
+                if postings is not None:
+                    postings.pop(passage_id, None)
+                    if not postings:
+                        del self._postings[term]
+        return True
+
+    def search(self, query: str, top_k: int = 4) -> List[Dict[str, Any]]:
+        """
+        Devuelve los ``top_k`` pasajes más relevantes según BM25
+
+        Returns:
+            List[Dict[str, Any]]: Pasajes con ``text``, ``url``, ``title`` y ``score``
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            total = len(self._passages)
+            if not total or not terms:
+                return []
+
+            average_length = self._total_length / total
+            scores: Dict[int, float] = defaultdict(float)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                for passage_id, frequency in postings.items():
+                    length = self._passages[passage_id]['length']
+                    norm = self.k1 * (1 - self.b + self.b * length / average_length)
+                    scores[passage_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+            best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+            return [
+                {
+                    "text": self._passages[passage_id]['text'],
+                    "url": self._passages[passage_id]['url'],
+                    "title": self._passages[passage_id]['title'],
+                    "score": round(score, 4)
+                }
+                for passage_id, score in best
+            ]
+
+    def save(self):
+        """Guarda el índice en disco (escritura atómica)"""
+        if not self.path:
+            return
+        # Copia tomada con el lock: un upsert concurrente no puede cambiar los diccionarios durante el volcado
+        with self._lock:
+            data = {
+                "next_id": self._next_id,
+                "passages": {str(passage_id): passage for passage_id, passage in self._passages.items()},
+                "documents": dict(self._documents)
+            }
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def load(self):
+        """Carga el índice desde disco y reconstruye las listas invertidas"""
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        with self._lock:
+            self._passages = {int(passage_id): passage for passage_id, passage in data['passages'].items()}
+            self._documents = data['documents']
+            self._next_id = data['next_id']
+            self._postings = defaultdict(dict)
+            self._total_length = 0
+            for passage_id, passage in self._passages.items():
+                for term, frequency in Counter(tokenize(f"{passage['title']} {passage['text']}")).items():
+                    self._postings[term][passage_id] = frequency
+                self._total_length += passage['length']
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "documents": len(self._documents),
+                "passages": len(self._passages),
+                "terms": len(self._postings)
+            }
+
+
+def build_rag_prompt(query: str, passages: List[Dict[str, Any]]) -> str:
+    """Construye el prompt con los pasajes recuperados como contexto"""
+    context = '\n'.join(f"[{i}] {passage['text']}" for i, passage in enumerate(passages, 1))
+    return (
+        "Responde a la pregunta usando únicamente la información de los siguientes fragmentos "
+        "de la sede electrónica del Ayuntamiento de Tarragona. Si la respuesta no está en los "
+        "fragmentos, dilo.\n\n"
+        f"Fragmentos:\n{context}\n\n"
+        f"Pregunta: {query}\nRespuesta:"
+    )
+
+
+def fit_rag_prompt(query: str, passages: List[Dict[str, Any]],
+                   max_tokens: Optional[int]) -> Tuple[str, List[Dict[str, Any]], bool]:
+    """
+    Construye el prompt RAG sin superar ``max_tokens``
+
+    La pregunta tiene preferencia: se recorta solo si no cabe ni con la
+    plantilla vacía. Los pasajes (ordenados por relevancia) se añaden mientras
+    caben; el primero que no cabe entero se recorta por el final y los
+    siguientes se descartan. Sin pasajes el prompt es la pregunta sola.
+
+    Args:
+        query (str): Pregunta del usuario
+        passages (List[Dict[str, Any]]): Pasajes recuperados, de más a menos relevante
+        max_tokens (int, optional): Tokens máximos del prompt (None = sin límite)
+
+    Returns:
+        Tuple: (prompt, pasajes incluidos, si se recortó algo)
+    """
+    if max_tokens is None:
+        return (build_rag_prompt(query, passages) if passages else query), passages, False
+    if not passages:
+        prompt, truncated = truncate_prompt(query, max_tokens)
+        return prompt, [], truncated
+
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    question, truncated = truncate_prompt(query, max(1, max_tokens - estimate_tokens(build_rag_prompt('', []))))
+
+    included: List[Dict[str, Any]] = []
+    for passage in passages:
+        if len(build_rag_prompt(question, included + [passage])) <= max_chars:
+            included.append(passage)
+            continue
+
+        truncated = True
+        room = max_chars - len(build_rag_prompt(question, included + [dict(passage, text='')])) \
+            - len(TRUNCATION_MARKER)
+        if room > 0:
+            text = passage['text'][:room]
+            cut = text.rfind(' ')
+            if cut > room // 2:
+                text = text[:cut]
+            included.append(dict(passage, text=text.rstrip() + TRUNCATION_MARKER.rstrip()))
+        break
+
+    if not included:
+        prompt, _ = truncate_prompt(query, max_tokens)
+        return prompt, [], True
+    return build_rag_prompt(question, included), included, truncated
+
+
+_padron_index: Optional[PadronIndex] = None
+_padron_index_lock = threading.Lock()
+
+
+def get_padron_index() -> PadronIndex:
+    """Devuelve el índice del proceso, cargado desde PADRON_INDEX_PATH si existe"""
+    global _padron_index
+
+    if _padron_index is None:
+        with _padron_index_lock:
+            if _padron_index is None:
+                path = get_rag_settings().padron_index_path
+                try:
+                    _padron_index = PadronIndex(path)
+                except Exception as e:
+                    logger.error(f"No se pudo cargar el índice del padrón de {path}: {str(e)}")
+                    _padron_index = PadronIndex()
+                    _padron_index.path = path
+    return _padron_index
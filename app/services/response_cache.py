@@ -0,0 +1,122 @@
+import copy
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+from config.ollama_settings import get_ollama_settings
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Normaliza un prompt para comparar consultas idénticas (Unicode NFC, minúsculas, espacios colapsados)"""
+    prompt = unicodedata.normalize('NFC', prompt)
+    return _WHITESPACE_RE.sub(' ', prompt).strip().casefold()
+
+
+def make_cache_key(model: str, prompt: str, options: Optional[Dict[str, Any]] = None) -> Tuple[str, str, str]:
+    """
+    Construye la clave de caché de una generación
+
+    Args:
+        model (str): Nombre del modelo
+        prompt (str): Prompt enviado al modelo
+        options (Dict[str, Any], optional): Opciones de generación de Ollama
+
+    Returns:
+        Tuple[str, str, str]: Clave (modelo, prompt normalizado, opciones serializadas)
+    """
+    return (model, normalize_prompt(prompt), json.dumps(options or {}, sort_keys=True))
+
+
+class ResponseCache:
+    """
+    Caché de respuestas del chat por coincidencia exacta.
+
+    Mantiene como máximo ``max_entries`` respuestas con expulsión LRU y un TTL
+    por entrada. Es seguro usarla desde varios hilos.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        """Devuelve una copia de la respuesta cacheada o None si no existe o ha expirado"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(value)
+
+    def set(self, key: Tuple, value: Dict[str, Any], ttl_seconds: Optional[float] = None):
+        """Guarda una respuesta, expulsando la menos usada recientemente si se supera la capacidad"""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Vacía la caché (los contadores se mantienen)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de uso de la caché"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Devuelve la caché de respuestas del proceso, o None si está desactivada (CHAT_CACHE_ENABLED)"""
+    global _response_cache
+
+    settings = get_ollama_settings()
+    if not settings.chat_cache_enabled:
+        return None
+
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = ResponseCache(
+                    max_entries=settings.chat_cache_max_entries,
+                    ttl_seconds=settings.chat_cache_ttl_seconds
+                )
+    return _response_cache
@@ -0,0 +1,207 @@
+import copy
+import threading
+import time
+from typing import Callable, Dict, Any, Optional
+import logging
+from config.scraping_settings import get_scraping_settings
+from services.scraping_service import ScrapingService
+from services.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+ScrapeLoader = Callable[[str], Dict[str, Any]]
+
+# Claves de frescura que la caché añade a cada resultado servido
+FRESHNESS_KEYS = ('cache_age_seconds', 'stale', 'refreshing', 'last_refresh_error')
+
+
+class _Entry:
+    """Último resultado correcto de una URL"""
+
+    def __init__(self, result: Dict[str, Any]):
+        self.result = result
+        self.fetched_at = time.monotonic()
+        self.refreshing = False
+        self.last_error: Optional[str] = None
+
+
+class ScrapeCache:
+    """
+    Caché stale-while-revalidate de resultados de scraping por URL.
+
+    Un resultado es fresco durante ``ttl_seconds``. Pasado ese tiempo se sigue
+    sirviendo al instante y se lanza una única recarga en segundo plano. Si la
+    recarga falla (la sede está caída o lenta) se conserva el último resultado
+    correcto. Solo la primera petición de una URL espera a la descarga, y las
+    que llegan a la vez comparten esa descarga. Los resultados fallidos no se
+    guardan.
+
+    Cada resultado servido lleva ``cache_age_seconds``, ``stale`` y
+    ``refreshing`` (y ``last_refresh_error`` si la última recarga falló).
+    """
+
+    def __init__(self, loader: ScrapeLoader, ttl_seconds: float = 600.0):
+        self.loader = loader
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self._loads = SingleFlight()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.failures = 0
+
+    def get(self, url: str) -> Dict[str, Any]:
+        """
+        Resultado del scraping de ``url``: el cacheado o, la primera vez, uno nuevo
+
+        Returns:
+            Dict[str, Any]: Resultado de ``ScrapingService`` con los datos de frescura
+        """
+        result = self.cached(url)
+        if result is not None:
+            return result
+
+        result, _ = self._loads.do(url, lambda: self._load(url))
+        return result
+
+    def cached(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Resultado cacheado de ``url`` sin esperar nunca a una descarga
+
+        Si está caducado se lanza la recarga en segundo plano.
+
+        Returns:
+            Optional[Dict[str, Any]]: El resultado, o None si la URL no está en la caché
+        """
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                return None
+
+            stale = self._age(entry) > self.ttl_seconds
+            if stale:
+                self.stale_hits += 1
+                if not entry.refreshing:
+                    entry.refreshing = True
+                    threading.Thread(target=self._refresh, args=(url, entry), name='scrape-cache-refresh',
+                                     daemon=True).start()
+            else:
+                self.hits += 1
+            return self._serve(entry, stale)
+
+    def store(self, url: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Guarda un resultado obtenido fuera de la caché (p. ej. la descarga asíncrona del servidor ASGI)
+
+        Returns:
+            Dict[str, Any]: El resultado con los datos de frescura; si falló y hay una copia
+            correcta, se devuelve esa copia
+        """
+        with self._lock:
+            if result.get('success'):
+                entry = _Entry(copy.deepcopy(result))
+                self._entries[url] = entry
+                return self._serve(entry, False)
+
+            self.failures += 1
+            entry = self._entries.get(url)
+            if entry is None:
+                return result
+            entry.last_error = result.get('error')
+            return self._serve(entry, self._age(entry) > self.ttl_seconds)
+
+    def _load(self, url: str) -> Dict[str, Any]:
+        with self._lock:
+            self.misses += 1
+        return self.store(url, self._fetch(url))
+
+    def _refresh(self, url: str, entry: _Entry):
+        # Quien llama ya ha marcado entry.refreshing
+        result = self._fetch(url)
+        with self._lock:
+            self.refreshes += 1
+            entry.refreshing = False
+            if result.get('success'):
+                if self._entries.get(url) is entry:
+                    self._entries[url] = _Entry(copy.deepcopy(result))
+                return
+            self.failures += 1
+            entry.last_error = result.get('error')
+        logger.warning(f"No se pudo recargar {url}; se sigue sirviendo la copia anterior: {result.get('error')}")
+
+    def _fetch(self, url: str) -> Dict[str, Any]:
+        try:
+            return self.loader(url)
+        except Exception as e:
+            return {'success': False, 'error': f"Error general: {str(e)}", 'url': url}
+
+    def _serve(self, entry: _Entry, stale: bool) -> Dict[str, Any]:
+        # Debe llamarse con el lock tomado
+        result = copy.deepcopy(entry.result)
+        result['cache_age_seconds'] = round(self._age(entry), 2)
+        result['stale'] = stale
+        result['refreshing'] = entry.refreshing
+        if entry.last_error:
+            result['last_refresh_error'] = entry.last_error
+        return result
+
+    @staticmethod
+    def _age(entry: _Entry) -> float:
+        return time.monotonic() - entry.fetched_at
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de la caché"""
+        with self._lock:
+            return {
+                "ttl_seconds": self.ttl_seconds,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "failures": self.failures
+            }
+
+
+_scrape_cache: Optional[ScrapeCache] = None
+_scrape_cache_created = False
+_scrape_cache_lock = threading.Lock()
+
+
+def get_scrape_cache() -> Optional[ScrapeCache]:
+    """Devuelve la caché de scraping del proceso (SCRAPE_CACHE_TTL_SECONDS), o None si está desactivada"""
+    global _scrape_cache, _scrape_cache_created
+
+    if not _scrape_cache_created:
+        with _scrape_cache_lock:
+            if not _scrape_cache_created:
+                settings = get_scraping_settings()
+                if settings.scrape_cache_enabled:
+                    _scrape_cache = ScrapeCache(
+                        loader=lambda url: ScrapingService().scrape_tarragona_padron_info(url),
+                        ttl_seconds=settings.scrape_cache_ttl_seconds
+                    )
+                _scrape_cache_created = True
+    return _scrape_cache
+
+
+def cache_freshness(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Datos de frescura de un resultado servido por la caché (vacío si no viene de ella)"""
+    return {key: result[key] for key in FRESHNESS_KEYS if key in result}
+
+
+def age_header(result: Dict[str, Any]) -> Dict[str, str]:
+    """Cabecera HTTP ``Age`` con la antigüedad de la copia cacheada"""
+    if result.get('cache_age_seconds') is None:
+        return {}
+    return {'Age': str(int(result['cache_age_seconds']))}
+
+
+def scrape_cached(url: str) -> Dict[str, Any]:
+    """Scraping de ``url`` servido desde la caché, o en vivo si está desactivada"""
+    cache = get_scrape_cache()
+    if cache is None:
+        return ScrapingService().scrape_tarragona_padron_info(url)
+    return cache.get(url)
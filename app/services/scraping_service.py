@@ -1,49 +1,110 @@
+import asyncio
+import httpx
 import requests
 import traceback
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-import re
+from urllib.parse import urljoin, urlsplit
+from typing import Optional
+from config.rag_settings import get_rag_settings
+from config.scraping_settings import get_scraping_settings
+from services.document_extractor import extract_document_info, parse_page, parser_backend
+from services.fetch_cache import FetchCache, FetchEntry, get_fetch_cache
+from services.padron_index import get_padron_index
+
+# Página del trámite de alta en el padrón (la que usan /padron-info y /scrape/tarragona-padron/quick)
+TARRAGONA_PADRON_URL = "https://seu.tarragona.cat/sta/CarpetaPublic/doEvent?APP_CODE=STA&PAGE_CODE=CATALOGO&DETALLE=6269000003494351199500&lang=ES"
+
+# Headers para simular un navegador real
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'DNT': '1',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1'
+}
+
+# Información simplificada del padrón que devuelve /padron-info cuando la página responde
+PADRON_SUMMARY = {
+    'title': 'Alta al padró d\'habitants - Tarragona',
+    'summary': 'Es la inscripció al padró municipal d\'habitants de la ciutat de Tarragona. El padró municipal és el registre administratiu on consten els veïns del municipi.',
+    'requirements': [
+        'Documentació d\'identitat segons nacionalitat (DNI, NIE, passaport)',
+        'Documentació que acrediti el domicili (escriptura, contracte de lloguer, autorització)',
+        'Per menors d\'edat: llibre de família o certificat de naixement',
+        'Autorització si és necessària per fer tràmits'
+    ],
+    'key_info': [
+        'Qualsevol persona major de 16 anys que visqui al municipi pot presentar la sol·licitud',
+        'Es pot presentar en qualsevol moment',
+        'La inscripció es realitza a l\'instant a les oficines OMAC',
+        'El tràmit és gratuït',
+        'Estrangers no comunitaris han de renovar cada dos anys',
+        'Presentació a Oficines Municipals d\'Atenció Ciutadana (OMAC)'
+    ]
+}
+
+
+# Tamaño de los trozos en que se lee el cuerpo de la respuesta
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+class PageTooLarge(Exception):
+    """La página supera el tamaño máximo de descarga (SCRAPE_MAX_BODY_BYTES)"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"La página supera el tamaño máximo de {max_bytes} bytes")
+        self.max_bytes = max_bytes
 
 
 class ScrapingService:
     
-    def __init__(self):
+    def __init__(self, fetch_cache: Optional[FetchCache] = None, parser: Optional[str] = None,
+                 max_body_bytes: Optional[int] = None, save_index: bool = True):
+        settings = get_scraping_settings()
         self.session = requests.Session()
-        # Headers para simular un navegador real
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'DNT': '1',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1'
-        })
+        self.session.headers.update(BROWSER_HEADERS)
+        self.fetch_cache = fetch_cache if fetch_cache is not None else get_fetch_cache()
+        self.parser = parser_backend(parser or settings.scrape_parser)
+        self.max_body_bytes = max_body_bytes if max_body_bytes is not None else settings.scrape_max_body_bytes
+        # Si es False las páginas se indexan pero el índice no se guarda en disco (lo guarda quien llama)
+        self.save_index = save_index
     
     def scrape_tarragona_padron_info(self, url):
         """
         Hace scraping de la página del padrón de Tarragona y extrae la información del documento.
+
+        Si la página está en la caché de descargas la petición es condicional
+        (``If-None-Match`` / ``If-Modified-Since``); con ``304`` se reutiliza la
+        extracción guardada sin parsear la página. El cuerpo se descarga por
+        trozos y se aborta en cuanto supera ``max_body_bytes``.
         """
         try:
             print(f"🌐 Haciendo scraping de: {url}")
             
             # Realizar la petición
-            response = self.session.get(url, timeout=30)
-            response.raise_for_status()
-            
-            # Parsear el HTML
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Extraer información del documento
-            document_info = self._extract_document_info(soup)
+            cached = self.fetch_cache.get(url) if self.fetch_cache is not None else None
+            with self.session.get(url, timeout=30, stream=True,
+                                  headers=cached.conditional_headers() if cached else None) as response:
+                if cached is not None and response.status_code == 304:
+                    return self._not_modified_page(url, cached)
+                response.raise_for_status()
+
+                self._check_declared_size(response.headers)
+                content = self._read_body(response.iter_content(DOWNLOAD_CHUNK_SIZE))
+
+            result = self._process_page(url, content, response.status_code)
+            self._store_fetch(url, content, response.headers, result)
+            return result
             
+        except PageTooLarge as e:
+            print(f"❌ Página demasiado grande: {url}")
             return {
-                'success': True,
-                'url': url,
-                'document_info': document_info,
-                'status_code': response.status_code
+                'success': False,
+                'error': str(e),
+                'url': url
             }
-            
+
         except requests.RequestException as e:
             print(f"❌ Error de conexión: {e}")
             traceback.print_exc()
@@ -62,117 +123,201 @@ class ScrapingService:
                 'url': url
             }
     
+    async def scrape_tarragona_padron_info_async(self, url, client: Optional[httpx.AsyncClient] = None):
+        """
+        Igual que ``scrape_tarragona_padron_info`` para el servidor ASGI.
+
+        La descarga es una corrutina sobre ``httpx.AsyncClient`` (por defecto el
+        compartido del proceso); el parseo, que es CPU, se hace en un hilo para
+        no bloquear el bucle de eventos.
+        """
+        try:
+            print(f"🌐 Haciendo scraping de: {url}")
+
+            cached = self.fetch_cache.get(url) if self.fetch_cache is not None else None
+            async with (client or get_async_http_client()).stream(
+                    'GET', url, timeout=30, headers=cached.conditional_headers() if cached else None) as response:
+                if cached is not None and response.status_code == 304:
+                    return self._not_modified_page(url, cached)
+                response.raise_for_status()
+
+                self._check_declared_size(response.headers)
+                content = await self._aread_body(response.aiter_bytes(DOWNLOAD_CHUNK_SIZE))
+
+            result = await asyncio.to_thread(self._process_page, url, content, response.status_code)
+            await asyncio.to_thread(self._store_fetch, url, content, response.headers, result)
+            return result
+
+        except PageTooLarge as e:
+            print(f"❌ Página demasiado grande: {url}")
+            return {
+                'success': False,
+                'error': str(e),
+                'url': url
+            }
+
+        except httpx.HTTPError as e:
+            print(f"❌ Error de conexión: {e}")
+            return {
+                'success': False,
+                'error': f"Error de conexión: {str(e)}",
+                'url': url
+            }
+
+        except Exception as e:
+            print(f"❌ Error general: {e}")
+            traceback.print_exc()
+            return {
+                'success': False,
+                'error': f"Error general: {str(e)}",
+                'url': url
+            }
+
+    def fetch_page(self, url) -> bytes:
+        """
+        Descarga una página sin extraer su información (p. ej. un listado del que sacar enlaces).
+        Se aplica el mismo límite de tamaño que al scraping.
+
+        Raises:
+            requests.RequestException: Si la petición falla
+            PageTooLarge: Si la página supera ``max_body_bytes``
+        """
+        with self.session.get(url, timeout=30, stream=True) as response:
+            response.raise_for_status()
+            self._check_declared_size(response.headers)
+            return self._read_body(response.iter_content(DOWNLOAD_CHUNK_SIZE))
+
+    def _check_declared_size(self, headers):
+        """Aborta antes de leer el cuerpo si ``Content-Length`` ya supera el máximo"""
+        declared = headers.get('Content-Length')
+        if declared and declared.isdigit() and int(declared) > self.max_body_bytes:
+            raise PageTooLarge(self.max_body_bytes)
+
+    def _read_body(self, chunks):
+        """Junta los trozos del cuerpo; aborta en cuanto superan ``max_body_bytes``"""
+        body = bytearray()
+        for chunk in chunks:
+            body += chunk
+            if len(body) > self.max_body_bytes:
+                raise PageTooLarge(self.max_body_bytes)
+        return bytes(body)
+
+    async def _aread_body(self, chunks):
+        """Versión asíncrona de ``_read_body``"""
+        body = bytearray()
+        async for chunk in chunks:
+            body += chunk
+            if len(body) > self.max_body_bytes:
+                raise PageTooLarge(self.max_body_bytes)
+        return bytes(body)
+
+    def _process_page(self, url, content, status_code):
+        """
+        Parsea el HTML descargado, extrae la información del documento y la indexa.
+        """
+        # Parsear el HTML
+        soup = parse_page(content, self.parser)
+
+        # Extraer información del documento
+        document_info = self._extract_document_info(soup)
+
+        self._index_document(url, document_info)
+
+        return {
+            'success': True,
+            'url': url,
+            'document_info': document_info,
+            'status_code': status_code
+        }
+
+    def _not_modified_page(self, url, cached: FetchEntry):
+        """
+        Resultado de una página que no ha cambiado (``304``) a partir de la extracción guardada.
+        No se vuelve a indexar: el índice ya tiene esta versión de la página.
+        """
+        print(f"♻️ Sin cambios desde la última descarga: {url}")
+        self.fetch_cache.revalidated(url)
+        return {
+            'success': True,
+            'url': url,
+            'document_info': cached.document_info,
+            'status_code': 304,
+            'not_modified': True
+        }
+
+    def _store_fetch(self, url, content, headers, result):
+        """Guarda la descarga y su extracción en la caché de descargas (si la respuesta trae validadores)"""
+        if self.fetch_cache is None or not result.get('success'):
+            return
+        self.fetch_cache.store(url, content, headers.get('ETag'), headers.get('Last-Modified'),
+                               result['document_info'])
+
+    def _index_document(self, url, document_info):
+        """
+        Actualiza el índice BM25 del padrón con la página recién scrapeada.
+        Un fallo al indexar nunca hace fallar el scraping.
+        """
+        rag_settings = get_rag_settings()
+        if not rag_settings.padron_index_on_scrape:
+            return
+        # El scraping admite URLs enviadas por el cliente: solo se indexan las de la sede del catálogo
+        if not is_catalog_url(url):
+            return
+        try:
+            index = get_padron_index()
+            passages = index.upsert_document(url, document_info, rag_settings.rag_passage_words)
+            if self.save_index:
+                index.save()
+            print(f"📚 Indexados {passages} pasajes de {url}")
+        except Exception as e:
+            print(f"⚠️ No se pudo indexar {url}: {e}")
+
     def _extract_document_info(self, soup):
         """
         Extrae la información específica del documento de la página.
         """
-        document_info = {
-            'title': '',
-            'description': '',
-            'requirements': [],
-            'procedures': [],
-            'additional_info': [],
-            'raw_text': ''
-        }
-        
         try:
-            # Extraer título del documento
-            title_selectors = [
-                'h1', 'h2.titulo', '.titulo-tramite', '.page-title',
-                '[class*="titulo"]', '[class*="title"]'
-            ]
-            
-            for selector in title_selectors:
-                title_elem = soup.select_one(selector)
-                if title_elem and title_elem.get_text(strip=True):
-                    document_info['title'] = title_elem.get_text(strip=True)
-                    break
-            
-            # Extraer descripción general
-            description_selectors = [
-                '.descripcion', '.description', '.resumen', '.summary',
-                '[class*="descripcion"]', '[class*="description"]',
-                'p.intro', '.contenido-principal p'
-            ]
-            
-            for selector in description_selectors:
-                desc_elem = soup.select_one(selector)
-                if desc_elem and desc_elem.get_text(strip=True):
-                    document_info['description'] = desc_elem.get_text(strip=True)
-                    break
-            
-            # Extraer requisitos
-            requirements_text = self._extract_section_text(soup, [
-                'requisitos', 'requirements', 'documentos', 'documents',
-                'necesario', 'requerido'
-            ])
-            document_info['requirements'] = requirements_text
-            
-            # Extraer procedimientos
-            procedures_text = self._extract_section_text(soup, [
-                'procedimiento', 'procedure', 'tramite', 'proceso',
-                'pasos', 'steps', 'como'
-            ])
-            document_info['procedures'] = procedures_text
-            
-            # Extraer información adicional
-            additional_selectors = [
-                '.info-adicional', '.additional-info', '.notas', '.notes',
-                '.importante', '.important', '.observaciones'
-            ]
-            
-            for selector in additional_selectors:
-                for elem in soup.select(selector):
-                    text = elem.get_text(strip=True)
-                    if text and len(text) > 10:
-                        document_info['additional_info'].append(text)
-            
-            # Extraer todo el texto visible de la página
-            # Eliminar scripts, estilos, etc.
-            for script in soup(["script", "style", "meta", "link"]):
-                script.decompose()
-            
-            # Obtener todo el texto
-            all_text = soup.get_text()
-            # Limpiar el texto
-            lines = (line.strip() for line in all_text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            clean_text = ' '.join(chunk for chunk in chunks if chunk)
-            
-            document_info['raw_text'] = clean_text
-            
+            document_info = extract_document_info(soup)
             print(f"✅ Información extraída exitosamente")
             return document_info
-            
+
         except Exception as e:
             print(f"❌ Error extrayendo información: {e}")
             traceback.print_exc()
-            return document_info
-    
-    def _extract_section_text(self, soup, keywords):
-        """
-        Extrae texto de secciones basándose en palabras clave.
-        """
-        texts = []
-        
-        for keyword in keywords:
-            # Buscar por texto que contenga la palabra clave
-            elements = soup.find_all(text=re.compile(keyword, re.IGNORECASE))
-            
-            for element in elements:
-                parent = element.parent
-                if parent:
-                    # Obtener el contenido del elemento padre
-                    text = parent.get_text(strip=True)
-                    if text and len(text) > 20 and text not in texts:
-                        texts.append(text)
-                    
-                    # También revisar hermanos siguientes
-                    for sibling in parent.find_next_siblings():
-                        sibling_text = sibling.get_text(strip=True)
-                        if sibling_text and len(sibling_text) > 20:
-                            texts.append(sibling_text)
-                        if len(texts) >= 5:  # Limitar cantidad
-                            break
-        
-        return texts[:10]  # Retornar máximo 10 elementos
+            return {
+                'title': '',
+                'description': '',
+                'requirements': [],
+                'procedures': [],
+                'additional_info': [],
+                'raw_text': ''
+            }
+
+
+def is_catalog_url(url) -> bool:
+    """Indica si la URL es de la sede del catálogo de trámites (mismo servidor que CRAWL_CATALOG_URL)"""
+    target = urlsplit(url or '')
+    catalog = urlsplit(get_scraping_settings().crawl_catalog_url)
+    return target.scheme in ('http', 'https') and target.netloc.lower() == catalog.netloc.lower()
+
+
+_async_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Devuelve el cliente HTTP asíncrono compartido del servidor ASGI (con los headers de navegador)"""
+    global _async_http_client
+
+    if _async_http_client is None:
+        headers = {key: value for key, value in BROWSER_HEADERS.items() if key != 'Accept-Encoding'}
+        _async_http_client = httpx.AsyncClient(headers=headers, follow_redirects=True)
+    return _async_http_client
+
+
+async def close_async_http_client():
+    """Cierra el cliente HTTP asíncrono (al apagar el servidor ASGI)"""
+    global _async_http_client
+
+    if _async_http_client is not None:
+        client, _async_http_client = _async_http_client, None
+        await client.aclose()
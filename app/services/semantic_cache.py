@@ -0,0 +1,160 @@
+import copy
+import threading
+import time
+from typing import Callable, Dict, Any, Optional, Sequence, Tuple
+import logging
+import numpy as np
+from config.ollama_settings import get_ollama_settings
+from services.ollama_balancer import get_ollama_balancer
+from services.ollama_client import OllamaHTTPError, get_ollama_client
+
+logger = logging.getLogger(__name__)
+
+Embedder = Callable[[str], Sequence[float]]
+
+
+class OllamaEmbedder:
+    """Calcula embeddings de texto con el endpoint ``/api/embeddings`` de Ollama"""
+
+    def __init__(self, model: str):
+        self.model = model
+
+    def __call__(self, text: str) -> Sequence[float]:
+        with get_ollama_balancer().lease() as backend:
+            response = get_ollama_client(backend.host).post('/api/embeddings', {"model": self.model, "prompt": text})
+            if response.status_code != 200:
+                raise OllamaHTTPError(response.status_code, response.text)
+            return response.json()['embedding']
+
+
+class SemanticCache:
+    """
+    Caché de respuestas por similitud semántica.
+
+    Cada prompt se convierte en un embedding normalizado que se guarda como
+    fila de una matriz NumPy de tamaño fijo (``capacity``). La búsqueda es un
+    único producto matriz-vector (similitud coseno) seguido de un argmax
+    restringido al mismo espacio de nombres (modelo + opciones). Cuando la
+    matriz está llena se sobrescribe la fila usada hace más tiempo.
+    """
+
+    def __init__(self, embedder: Embedder, capacity: int = 1024, threshold: float = 0.92):
+        self.embedder = embedder
+        self.capacity = capacity
+        self.threshold = threshold
+        self._vectors: Optional[np.ndarray] = None
+        self._namespaces = np.full(capacity, -1, dtype=np.int64)
+        self._last_used = np.zeros(capacity, dtype=np.float64)
+        self._values: list = [None] * capacity
+        self._namespace_ids: Dict[str, int] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def embed(self, text: str) -> np.ndarray:
+        """Calcula el embedding normalizado (norma 1) de un texto"""
+        vector = np.asarray(self.embedder(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, embedding: np.ndarray, namespace: str) -> Tuple[Optional[Dict[str, Any]], float]:
+        """
+        Busca la respuesta más similar dentro del espacio de nombres
+
+        Args:
+            embedding (np.ndarray): Embedding normalizado del prompt
+            namespace (str): Espacio de nombres (modelo y opciones de generación)
+
+        Returns:
+            Tuple: (copia de la respuesta o None si no supera el umbral, similitud máxima)
+        """
+        with self._lock:
+            namespace_id = self._namespace_ids.get(namespace)
+            if self._vectors is None or namespace_id is None or embedding.shape[0] != self._vectors.shape[1]:
+                self.misses += 1
+                return None, 0.0
+
+            scores = self._vectors[:self._size] @ embedding
+            scores = np.where(self._namespaces[:self._size] == namespace_id, scores, -np.inf)
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+
+            if similarity < self.threshold:
+                self.misses += 1
+                return None, max(similarity, 0.0)
+
+            self._last_used[best] = time.monotonic()
+            self.hits += 1
+            return copy.deepcopy(self._values[best]), similarity
+
+    def add(self, embedding: np.ndarray, namespace: str, value: Dict[str, Any]):
+        """Guarda una respuesta asociada al embedding de su prompt"""
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.capacity, embedding.shape[0]), dtype=np.float32)
+            elif embedding.shape[0] != self._vectors.shape[1]:
+                logger.warning("Dimensión de embedding distinta a la de la caché semántica; se ignora")
+                return
+
+            namespace_id = self._namespace_ids.setdefault(namespace, len(self._namespace_ids))
+
+            if self._size < self.capacity:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.evictions += 1
+
+            self._vectors[slot] = embedding
+            self._namespaces[slot] = namespace_id
+            self._last_used[slot] = time.monotonic()
+            self._values[slot] = copy.deepcopy(value)
+
+    def clear(self):
+        """Vacía la caché (los contadores se mantienen)"""
+        with self._lock:
+            self._vectors = None
+            self._namespaces[:] = -1
+            self._last_used[:] = 0
+            self._values = [None] * self.capacity
+            self._namespace_ids.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de uso de la caché"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": self._size,
+                "capacity": self.capacity,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions
+            }
+
+
+_semantic_cache: Optional[SemanticCache] = None
+_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """Devuelve la caché semántica del proceso, o None si está desactivada (SEMANTIC_CACHE_ENABLED)"""
+    global _semantic_cache
+
+    settings = get_ollama_settings()
+    if not settings.semantic_cache_enabled:
+        return None
+
+    if _semantic_cache is None:
+        with _semantic_cache_lock:
+            if _semantic_cache is None:
+                _semantic_cache = SemanticCache(
+                    embedder=OllamaEmbedder(settings.semantic_cache_embedding_model),
+                    capacity=settings.semantic_cache_capacity,
+                    threshold=settings.semantic_cache_threshold
+                )
+    return _semantic_cache
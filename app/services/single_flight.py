@@ -0,0 +1,319 @@
+import asyncio
+import copy
+import threading
+from typing import Awaitable, Callable, Dict, Any, Hashable, Iterator, List, Optional, Tuple
+import logging
+from services.deadline import CancellationMetrics, Deadline, DeadlineExceeded, get_cancellation_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """Generación en curso compartida por todas las peticiones con la misma clave"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Agrupa llamadas idénticas concurrentes en una sola ejecución.
+
+    La primera petición con una clave ejecuta la función; las que llegan con
+    la misma clave mientras sigue en curso esperan y reciben una copia del
+    mismo resultado. Cada una espera como mucho hasta su propio plazo.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any], deadline: Optional[Deadline] = None) -> Tuple[Any, bool]:
+        """
+        Ejecuta ``fn`` o espera a la ejecución en curso con la misma clave
+
+        Args:
+            key (Hashable): Clave de la llamada
+            fn (Callable): Función a ejecutar si no hay otra en curso
+            deadline (Deadline, optional): Plazo de esta petición; limita la espera
+                a una ejecución ajena (la propia ya la limita ``fn``)
+
+        Returns:
+            Tuple[Any, bool]: (resultado, True si se reutilizó una ejecución en curso)
+
+        Raises:
+            DeadlineExceeded: Si el plazo se agota esperando a la ejecución en curso
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+                leader = True
+
+        if not leader:
+            if not call.done.wait(deadline.remaining() if deadline is not None else None):
+                raise DeadlineExceeded(
+                    f"Plazo de {deadline.timeout_seconds:g}s agotado esperando una generación idéntica en curso")
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result), True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return copy.deepcopy(call.result), False
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de agrupación"""
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced
+            }
+
+
+class _Broadcast:
+    """Eventos de una generación en streaming, reproducibles para cada suscriptor"""
+
+    def __init__(self):
+        self.events: List[Dict[str, Any]] = []
+        self.finished = False
+        self.subscribers = 0
+        # Todos los suscriptores cerraron el stream antes del final
+        self.abandoned = False
+        self.condition = threading.Condition()
+
+    def publish(self, event: Dict[str, Any]):
+        with self.condition:
+            self.events.append(event)
+            self.condition.notify_all()
+
+    def finish(self):
+        with self.condition:
+            self.finished = True
+            self.condition.notify_all()
+
+    def subscribe(self, coalesced: bool = False, deadline: Optional[Deadline] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Eventos de la generación desde el principio
+
+        Args:
+            coalesced (bool): Si el suscriptor se unió a una generación ya iniciada; su
+                evento ``done`` lleva ``coalesced`` para no contar dos veces los tokens
+            deadline (Deadline, optional): Plazo del suscriptor; si se agota esperando
+                eventos recibe un ``error`` con ``deadline_exceeded`` y deja de esperar
+        """
+        with self.condition:
+            self.subscribers += 1
+        index = 0
+        try:
+            while True:
+                with self.condition:
+                    while index >= len(self.events) and not self.finished:
+                        if deadline is not None and deadline.expired():
+                            break
+                        self.condition.wait(deadline.remaining() if deadline is not None else None)
+                    if index < len(self.events):
+                        pending = self.events[index:]
+                    elif self.finished:
+                        return
+                    else:
+                        pending = None
+                if pending is None:
+                    yield {
+                        "type": "error",
+                        "error": f"Plazo de {deadline.timeout_seconds:g}s agotado esperando la generación compartida",
+                        "deadline_exceeded": True
+                    }
+                    return
+                index += len(pending)
+                for event in pending:
+                    event = dict(event)
+                    if coalesced and event.get('type') == 'done':
+                        event['coalesced'] = True
+                    yield event
+        finally:
+            with self.condition:
+                self.subscribers -= 1
+                if self.subscribers == 0 and not self.finished:
+                    self.abandoned = True
+
+
+class StreamFlight:
+    """
+    Agrupa generaciones en streaming idénticas concurrentes.
+
+    La generación se ejecuta en un hilo propio que publica cada evento en un
+    buffer; todos los suscriptores con la misma clave (incluidos los que
+    llegan tarde) reciben la secuencia completa de eventos desde el principio.
+    Los que se unen a una generación ya iniciada dejan de esperar al agotarse
+    su propio plazo. Si todos los suscriptores abandonan, la generación se
+    cierra para que Ollama deje de generar.
+    """
+
+    def __init__(self):
+        self._broadcasts: Dict[Hashable, _Broadcast] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def subscribe(self, key: Hashable, producer: Callable[[], Iterator[Dict[str, Any]]],
+                  deadline: Optional[Deadline] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Se suscribe a la generación en curso con la misma clave o inicia una nueva
+
+        Args:
+            key (Hashable): Clave de la generación
+            producer (Callable): Función que devuelve el iterador de eventos de Ollama
+            deadline (Deadline, optional): Plazo de la petición; el de quien inicia la
+                generación ya lo aplica ``producer``, el de los demás limita su espera
+
+        Returns:
+            Iterator[Dict[str, Any]]: Eventos de la generación
+        """
+        with self._lock:
+            broadcast = self._broadcasts.get(key)
+            coalesced = broadcast is not None and not broadcast.abandoned
+            if coalesced:
+                self.coalesced += 1
+            else:
+                broadcast = _Broadcast()
+                self._broadcasts[key] = broadcast
+                self.leaders += 1
+                threading.Thread(target=self._run, args=(key, broadcast, producer), daemon=True).start()
+
+        return broadcast.subscribe(coalesced, deadline if coalesced else None)
+
+    def _run(self, key: Hashable, broadcast: _Broadcast, producer: Callable[[], Iterator[Dict[str, Any]]]):
+        events = producer()
+        try:
+            for event in events:
+                broadcast.publish(event)
+                if broadcast.abandoned:
+                    logger.info("Todos los clientes cerraron el stream; se aborta la generación")
+                    get_cancellation_metrics().record(CancellationMetrics.CLIENT_DISCONNECT)
+                    close = getattr(events, 'close', None)
+                    if close is not None:
+                        close()
+                    break
+        except Exception as e:
+            logger.error(f"Error en la generación compartida: {str(e)}")
+            broadcast.publish({"type": "error", "error": f"Error al comunicarse con el modelo: {str(e)}"})
+        finally:
+            with self._lock:
+                if self._broadcasts.get(key) is broadcast:
+                    del self._broadcasts[key]
+            broadcast.finish()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de agrupación"""
+        with self._lock:
+            return {
+                "in_flight": len(self._broadcasts),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced
+            }
+
+
+class _AsyncCall:
+    """Generación asíncrona en curso y número de corrutinas que esperan su resultado"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class AsyncSingleFlight:
+    """
+    Versión para corrutinas de ``SingleFlight``.
+
+    La primera corrutina con una clave lanza la generación como tarea; las que
+    llegan con la misma clave esperan esa tarea. Si todas las que esperan se
+    cancelan (los clientes se desconectan) la tarea también se cancela, lo que
+    cierra la conexión con Ollama. Solo se usa desde el bucle de eventos, así
+    que no necesita lock.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _AsyncCall] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Ejecuta ``fn`` o espera a la ejecución en curso con la misma clave
+
+        Returns:
+            Tuple[Any, bool]: (resultado, True si se reutilizó una ejecución en curso)
+        """
+        call = self._calls.get(key)
+        coalesced = call is not None
+        if coalesced:
+            self.coalesced += 1
+        else:
+            call = _AsyncCall(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            self.leaders += 1
+            call.task.add_done_callback(lambda task: self._forget(key, call))
+
+        call.waiters += 1
+        try:
+            result = await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                call.task.cancel()
+                get_cancellation_metrics().record(CancellationMetrics.CLIENT_DISCONNECT)
+            raise
+        finally:
+            call.waiters -= 1
+
+        return copy.deepcopy(result), coalesced
+
+    def _forget(self, key: Hashable, call: _AsyncCall):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de agrupación"""
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced
+        }
+
+
+_single_flight = SingleFlight()
+_stream_flight = StreamFlight()
+_async_single_flight = AsyncSingleFlight()
+
+
+def get_single_flight() -> SingleFlight:
+    """Devuelve el agrupador de peticiones del proceso"""
+    return _single_flight
+
+
+def get_stream_flight() -> StreamFlight:
+    """Devuelve el agrupador de generaciones en streaming del proceso"""
+    return _stream_flight
+
+
+def get_async_single_flight() -> AsyncSingleFlight:
+    """Devuelve el agrupador de peticiones del servidor ASGI"""
+    return _async_single_flight
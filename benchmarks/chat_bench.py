@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Benchmark de latencia y throughput de los endpoints de chat
+
+Arranca un servidor Ollama falso (``benchmarks.fake_ollama``) y la aplicación
+Flask en local, lanza cada escenario con varios niveles de concurrencia y
+escribe los resultados en JSON (throughput, latencia p50/p95/p99 y tiempo
+hasta el primer token) para comparar entre versiones.
+
+Uso:
+    python -m benchmarks.chat_bench --concurrency 1,4,16 --requests 100 --output bench.json
+    python -m benchmarks.chat_bench --target http://localhost:8000 --scenarios chat,model-info
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+from benchmarks.fake_ollama import FakeOllamaServer, add_fake_ollama_arguments, config_from_args
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = ('chat', 'stream', 'batch', 'model-info')
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Percentil ``q`` (0-100) con interpolación lineal; None si no hay valores"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(values: List[float]) -> Optional[Dict[str, float]]:
+    """Resumen en milisegundos de una lista de duraciones en segundos"""
+    if not values:
+        return None
+    return {
+        "p50": round(percentile(values, 50) * 1000, 2),
+        "p95": round(percentile(values, 95) * 1000, 2),
+        "p99": round(percentile(values, 99) * 1000, 2),
+        "mean": round(sum(values) / len(values) * 1000, 2),
+        "max": round(max(values) * 1000, 2)
+    }
+
+
+class ChatBenchmark:
+    """Ejecuta los escenarios contra una instancia de la API"""
+
+    def __init__(self, base_url: str, batch_size: int = 5, timeout: float = 120):
+        self.base_url = base_url.rstrip('/')
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self._local = threading.local()
+        self._counter = 0
+        self._counter_lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def _next_query(self) -> str:
+        # Consultas únicas para que ni la caché ni la agrupación de peticiones falseen la medida
+        with self._counter_lock:
+            self._counter += 1
+            return f"bench consulta {self._counter}"
+
+    def _post(self, path: str, body: Dict[str, Any], **kwargs) -> requests.Response:
+        return self.session.post(f"{self.base_url}{path}", json=body, timeout=self.timeout,
+                                 headers={'X-Cache-Bypass': 'true'}, **kwargs)
+
+    def request_chat(self) -> Dict[str, Any]:
+        response = self._post('/chat', {'query': self._next_query()})
+        return {"status": response.status_code, "ok": response.status_code == 200}
+
+    def request_stream(self) -> Dict[str, Any]:
+        started = time.perf_counter()
+        ttft = None
+        ok = False
+        with self._post('/chat/stream', {'query': self._next_query()}, stream=True) as response:
+            for line in response.iter_lines(decode_unicode=True):
+                if line == 'event: token' and ttft is None:
+                    ttft = time.perf_counter() - started
+                elif line == 'event: done':
+                    ok = True
+                elif line == 'event: error':
+                    ok = False
+            return {"status": response.status_code, "ok": ok and response.status_code == 200, "ttft": ttft}
+
+    def request_batch(self) -> Dict[str, Any]:
+        queries = [{'query': self._next_query()} for _ in range(self.batch_size)]
+        response = self._post('/chat/batch', {'queries': queries})
+        ok = response.status_code == 200 and all(r.get('success') for r in response.json().get('results', []))
+        return {"status": response.status_code, "ok": ok}
+
+    def request_model_info(self) -> Dict[str, Any]:
+        response = self.session.get(f"{self.base_url}/chat/model-info", timeout=self.timeout)
+        return {"status": response.status_code, "ok": response.status_code == 200}
+
+    def _request_fn(self, scenario: str) -> Callable[[], Dict[str, Any]]:
+        return {
+            'chat': self.request_chat,
+            'stream': self.request_stream,
+            'batch': self.request_batch,
+            'model-info': self.request_model_info
+        }[scenario]
+
+    def run(self, scenario: str, concurrency: int, total_requests: int) -> Dict[str, Any]:
+        """
+        Lanza ``total_requests`` peticiones del escenario con ``concurrency`` clientes
+
+        Returns:
+            Dict[str, Any]: Métricas del nivel de concurrencia
+        """
+        request_fn = self._request_fn(scenario)
+
+        def timed():
+            started = time.perf_counter()
+            try:
+                result = request_fn()
+            except requests.RequestException as e:
+                result = {"status": None, "ok": False, "exception": type(e).__name__}
+            result["latency"] = time.perf_counter() - started
+            return result
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(lambda _: timed(), range(total_requests)))
+        elapsed = time.perf_counter() - started
+
+        ok = [r for r in results if r['ok']]
+        status_codes: Dict[str, int] = {}
+        for r in results:
+            key = str(r['status']) if r['status'] is not None else r.get('exception', 'error')
+            status_codes[key] = status_codes.get(key, 0) + 1
+
+        items = self.batch_size if scenario == 'batch' else 1
+        return {
+            "scenario": scenario,
+            "concurrency": concurrency,
+            "requests": total_requests,
+            "successes": len(ok),
+            "errors": total_requests - len(ok),
+            "status_codes": status_codes,
+            "duration_s": round(elapsed, 3),
+            "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else None,
+            "items_per_second": round(len(ok) * items / elapsed, 2) if elapsed else None,
+            "latency_ms": summarize([r['latency'] for r in ok]),
+            "ttft_ms": summarize([r['ttft'] for r in ok if r.get('ttft') is not None])
+        }
+
+
+def run_benchmark(base_url: str, scenarios: List[str], concurrency_levels: List[int], total_requests: int,
+                  batch_size: int = 5) -> List[Dict[str, Any]]:
+    """Ejecuta todos los escenarios en todos los niveles de concurrencia"""
+    benchmark = ChatBenchmark(base_url, batch_size=batch_size)
+    results = []
+    for scenario in scenarios:
+        for concurrency in concurrency_levels:
+            result = benchmark.run(scenario, concurrency, total_requests)
+            print(f"⏱️  {scenario:<10} c={concurrency:<3} {result['throughput_rps']} req/s "
+                  f"p95={(result['latency_ms'] or {}).get('p95')} ms errores={result['errors']}",
+                  file=sys.stderr)
+            results.append(result)
+    return results
+
+
+def start_local_app(ollama_url: str, max_in_flight: int):
+    """
+    Arranca la aplicación Flask en un hilo apuntando al Ollama falso
+
+    La configuración se lee del entorno una sola vez por proceso, así que las
+    variables se fijan antes de importar la aplicación.
+    """
+    os.environ['OLLAMA_HOST'] = ollama_url
+    os.environ['OLLAMA_HOSTS'] = ''
+    os.environ.setdefault('CHAT_CACHE_ENABLED', 'false')
+    os.environ.setdefault('SEMANTIC_CACHE_ENABLED', 'false')
+    os.environ.setdefault('CHAT_MAX_IN_FLIGHT', str(max_in_flight))
+    os.environ.setdefault('CHAT_MAX_QUEUE', str(max_in_flight * 4))
+
+    app_dir = os.path.join(ROOT_DIR, 'app')
+    if app_dir not in sys.path:
+        sys.path.insert(0, app_dir)
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    from main import create_app
+
+    class QuietRequestHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, create_app(), threaded=True, request_handler=QuietRequestHandler)
+    threading.Thread(target=server.serve_forever, name='bench-app', daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description='Benchmark de los endpoints de chat')
+    parser.add_argument('--target', help='URL de una API ya en marcha (si se omite se arranca una local con Ollama falso)')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help=f"Escenarios separados por comas ({', '.join(SCENARIOS)})")
+    parser.add_argument('--concurrency', default='1,4,16', help='Niveles de concurrencia separados por comas')
+    parser.add_argument('--requests', type=int, default=50, help='Peticiones por escenario y nivel')
+    parser.add_argument('--batch-size', type=int, default=5, help='Consultas por petición en el escenario batch')
+    parser.add_argument('--output', help='Fichero JSON de salida (por defecto, salida estándar)')
+    add_fake_ollama_arguments(parser)
+    args = parser.parse_args(argv)
+
+    scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Escenarios desconocidos: {', '.join(sorted(unknown))}")
+    concurrency_levels = [int(c) for c in args.concurrency.split(',') if c.strip()]
+
+    fake_server = None
+    app_server = None
+    base_url = args.target
+    if base_url is None:
+        fake_server = FakeOllamaServer(config_from_args(args)).start()
+        app_server, base_url = start_local_app(fake_server.url, max(concurrency_levels))
+
+    try:
+        results = run_benchmark(base_url, scenarios, concurrency_levels, args.requests, args.batch_size)
+    finally:
+        if app_server is not None:
+            app_server.shutdown()
+        if fake_server is not None:
+            fake_server.stop()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "target": args.target or 'local',
+            "fake_ollama": None if args.target else {
+                "tokens": args.tokens,
+                "token_delay": args.token_delay,
+                "first_token_delay": args.first_token_delay,
+                "error_rate": args.error_rate
+            }
+        },
+        "results": results
+    }
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Servidor Ollama falso para benchmarks
+
+Implementa ``/api/generate`` (con y sin streaming), ``/api/tags`` y
+``/api/embeddings`` con un retardo configurable por token e inyección de
+errores, de modo que la latencia del backend sea conocida y reproducible.
+
+Uso independiente:
+    python -m benchmarks.fake_ollama --port 11434 --token-delay 0.02 --tokens 50
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOllamaConfig:
+    """Comportamiento del servidor falso (se puede modificar en caliente)"""
+
+    def __init__(self, model='gemma:7b', tokens=20, token_delay=0.0, first_token_delay=0.0,
+                 error_rate=0.0, seed=None):
+        self.model = model
+        self.tokens = tokens
+        self.token_delay = token_delay
+        self.first_token_delay = first_token_delay
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+
+    def should_fail(self) -> bool:
+        return self.error_rate > 0 and self.random.random() < self.error_rate
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def config(self) -> FakeOllamaConfig:
+        return self.server.config
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        return json.loads(body) if body else {}
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == '/api/tags':
+            self._send_json({'models': [{
+                'name': self.config.model,
+                'size': 5000000000,
+                'modified_at': '2024-01-15T10:30:00Z'
+            }]})
+        else:
+            self._send_json({'error': 'not found'}, status=404)
+
+    def do_POST(self):
+        self.server.count_request()
+        payload = self._read_json()
+
+        if self.path == '/api/embeddings':
+            digest = hashlib.sha256(payload.get('prompt', '').encode('utf-8')).digest()
+            self._send_json({'embedding': [byte / 255 for byte in digest]})
+            return
+
+        if self.path != '/api/generate':
+            self._send_json({'error': 'not found'}, status=404)
+            return
+
+        if self.config.should_fail():
+            self.server.count_error()
+            self._send_json({'error': 'injected failure'}, status=500)
+            return
+
+        model = payload.get('model', self.config.model)
+        # Petición de precarga (prompt vacío): Ollama responde sin generar
+        tokens = self.config.tokens if payload.get('prompt') else 0
+        started = time.perf_counter()
+
+        if not payload.get('stream', True):
+            time.sleep(self.config.first_token_delay + tokens * self.config.token_delay)
+            self._send_json({
+                'model': model,
+                'response': ' '.join(f"tok{i}" for i in range(tokens)),
+                'done': True,
+                'context': list(range(tokens)),
+                'eval_count': tokens,
+                'eval_duration': int((time.perf_counter() - started) * 1e9)
+            })
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        try:
+            time.sleep(self.config.first_token_delay)
+            for i in range(tokens):
+                time.sleep(self.config.token_delay)
+                self._write_chunk(json.dumps({'model': model, 'response': f"tok{i} ", 'done': False}).encode() + b"\n")
+            self._write_chunk(json.dumps({
+                'model': model,
+                'response': '',
+                'done': True,
+                'context': list(range(tokens)),
+                'eval_count': tokens,
+                'eval_duration': int((time.perf_counter() - started) * 1e9)
+            }).encode() + b"\n")
+            self._write_chunk(b'')
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    """Servidor HTTP multihilo con la API falsa; ``url`` da la dirección real tras arrancar"""
+
+    daemon_threads = True
+
+    def __init__(self, config: FakeOllamaConfig = None, host='127.0.0.1', port=0):
+        super().__init__((host, port), _Handler)
+        self.config = config or FakeOllamaConfig()
+        self.requests = 0
+        self.errors = 0
+        self._counter_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def handle_error(self, request, client_address):
+        # Los clientes que cierran la conexión al recibir el último token no son un error
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+    def count_request(self):
+        with self._counter_lock:
+            self.requests += 1
+
+    def count_error(self):
+        with self._counter_lock:
+            self.errors += 1
+
+    def start(self) -> 'FakeOllamaServer':
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-ollama', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+        return False
+
+
+def add_fake_ollama_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--model', default='gemma:7b', help='Nombre del modelo anunciado en /api/tags')
+    parser.add_argument('--tokens', type=int, default=20, help='Tokens generados por respuesta')
+    parser.add_argument('--token-delay', type=float, default=0.01, help='Segundos por token')
+    parser.add_argument('--first-token-delay', type=float, default=0.0, help='Segundos antes del primer token')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fracción de generaciones que devuelven 500')
+    parser.add_argument('--seed', type=int, default=None, help='Semilla para la inyección de errores')
+
+
+def config_from_args(args) -> FakeOllamaConfig:
+    return FakeOllamaConfig(model=args.model, tokens=args.tokens, token_delay=args.token_delay,
+                            first_token_delay=args.first_token_delay, error_rate=args.error_rate,
+                            seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor Ollama falso para benchmarks')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11434)
+    add_fake_ollama_arguments(parser)
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(config_from_args(args), host=args.host, port=args.port)
+    print(f"🤖 Ollama falso escuchando en {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
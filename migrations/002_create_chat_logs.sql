@@ -0,0 +1,26 @@
+-- Registro de chats y consumo de tokens de Ollama (escrito por services/chat_log_writer.py)
+CREATE TABLE IF NOT EXISTS `chat_logs` (
+  `id` bigint NOT NULL AUTO_INCREMENT,
+  `created_at` datetime NOT NULL,
+  `username` varchar(80) DEFAULT NULL,
+  `endpoint` varchar(32) NOT NULL,
+  `model` varchar(120) DEFAULT NULL,
+  `query` text,
+  `response` text,
+  `success` tinyint(1) NOT NULL,
+  `cached` tinyint(1) NOT NULL DEFAULT '0',
+  `cache_type` varchar(16) DEFAULT NULL,
+  `error` varchar(500) DEFAULT NULL,
+  `prompt_eval_count` int DEFAULT NULL,
+  `eval_count` int DEFAULT NULL,
+  `total_duration` bigint DEFAULT NULL,
+  `prompt_eval_duration` bigint DEFAULT NULL,
+  `eval_duration` bigint DEFAULT NULL,
+  `latency_ms` int DEFAULT NULL,
+  PRIMARY KEY (`id`),
+  KEY `ix_chat_logs_created_at` (`created_at`),
+  KEY `ix_chat_logs_username` (`username`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- Rollback:
+-- DROP TABLE `chat_logs`;
@@ -0,0 +1,190 @@
+import json
+import os
+import sys
+
+import pytest
+
+# Los módulos de la aplicación se importan relativos a app/ (igual que al ejecutar main.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+
+class FakeResponse:
+    """Respuesta HTTP mínima compatible con el uso que se hace de requests.Response"""
+
+    def __init__(self, body=None, lines=None, status_code=200):
+        self.body = body
+        self.lines = lines or []
+        self.status_code = status_code
+        self.text = json.dumps(body) if body is not None else ''
+        self.closed = False
+
+    def json(self):
+        return self.body
+
+    def iter_lines(self):
+        for line in self.lines:
+            yield json.dumps(line).encode('utf-8')
+
+    def close(self):
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        return False
+
+
+class FakeOllamaClient:
+    """
+    Sustituto de OllamaClient que responde sin red.
+
+    Por defecto ``/api/generate`` contesta "respuesta: <prompt>" (troceado por
+    palabras en modo streaming). ``handler`` permite personalizar la respuesta.
+    """
+
+    def __init__(self, host='http://fake-ollama:11434'):
+        self.host = host
+        self.timeout = (5.0, 120.0)
+        self.calls = []
+        self.models = [{'name': 'gemma:7b', 'size': 5000000000, 'modified_at': '2024-01-15T10:30:00Z'}]
+        self.handler = None
+
+    def post(self, path, payload, stream=False, timeout=None):
+        self.calls.append({'path': path, 'payload': payload, 'stream': stream, 'timeout': timeout})
+        if self.handler:
+            return self.handler(path, payload, stream)
+
+        text = f"respuesta: {payload.get('prompt', '')}"
+        if not stream:
+            return FakeResponse({'model': payload['model'], 'response': text, 'done': True, 'eval_count': 3})
+
+        lines = [{'model': payload['model'], 'response': word + ' ', 'done': False} for word in text.split(' ')]
+        lines.append({'model': payload['model'], 'response': '', 'done': True,
+                      'eval_count': len(lines), 'eval_duration': 1000000000})
+        return FakeResponse(lines=lines)
+
+    def list_models(self):
+        return {'models': self.models}
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_ollama(monkeypatch):
+    from services import chat_service
+    from services.ollama_balancer import OllamaBalancer
+    from services.admission_controller import AdmissionController
+    from services.model_info_cache import ModelInfoCache
+
+    client = FakeOllamaClient()
+    balancer = OllamaBalancer([client.host], probe=lambda host: True)
+    admission = AdmissionController(max_in_flight=4, max_queue=8, default_timeout=5)
+    monkeypatch.setattr(chat_service, 'get_ollama_client', lambda *args, **kwargs: client)
+    monkeypatch.setattr(chat_service, 'get_ollama_balancer', lambda: balancer)
+    monkeypatch.setattr(chat_service, 'get_admission_controller', lambda: admission)
+    model_info_cache = {}
+
+    def get_model_info_cache(loader):
+        return model_info_cache.setdefault('cache', ModelInfoCache(loader))
+
+    monkeypatch.setattr(chat_service, 'get_model_info_cache', get_model_info_cache)
+    monkeypatch.setattr(chat_service, 'get_faq_store', lambda: None)
+    monkeypatch.setattr(chat_service, 'get_chat_log_writer', lambda: None)
+    client.balancer = balancer
+    client.admission = admission
+    return client
+
+
+@pytest.fixture
+def response_cache(monkeypatch):
+    from services import chat_service
+    from services.response_cache import ResponseCache
+
+    cache = ResponseCache(max_entries=16, ttl_seconds=60)
+    monkeypatch.setattr(chat_service, 'get_response_cache', lambda: cache)
+    return cache
+
+
+@pytest.fixture
+def auth_token():
+    """Devuelve una función que emite el token firmado de /login de un usuario"""
+    from types import SimpleNamespace
+    from services.auth_service import AuthService
+
+    return lambda username: AuthService(None).encode_auth_token(SimpleNamespace(username=username))
+
+
+@pytest.fixture
+def chat_client(fake_ollama, response_cache, monkeypatch):
+    from flask import Flask
+    from routes import chat_bp as chat_routes
+    from routes.chat_bp import chat_bp
+
+    monkeypatch.setattr(chat_routes, 'get_chat_log_writer', lambda: None)
+
+    app = Flask(__name__)
+    app.register_blueprint(chat_bp)
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+
+class PageServer:
+    """
+    Servidor HTTP local para las pruebas de scraping.
+
+    Sirve los ficheros de ``test/fixtures`` y las rutas añadidas a ``routes``
+    (ruta, con o sin query string -> función que recibe el
+    ``BaseHTTPRequestHandler`` y escribe la respuesta). Guarda en ``requests`` la ruta de cada petición recibida.
+    """
+
+    def __init__(self):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        server = self
+        self.routes = {}
+        self.requests = []
+        self.fixtures = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append(self.path)
+                route = server.routes.get(self.path) or server.routes.get(self.path.split('?')[0])
+                if route is not None:
+                    route(self)
+                    return
+                path = os.path.join(server.fixtures, self.path.lstrip('/').split('?')[0])
+                if not os.path.isfile(path):
+                    self.send_error(404)
+                    return
+                with open(path, 'rb') as f:
+                    body = f.read()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+
+    def url(self, path):
+        return f'http://127.0.0.1:{self.httpd.server_address[1]}{path}'
+
+
+@pytest.fixture
+def page_server():
+    import threading
+
+    server = PageServer()
+    thread = threading.Thread(target=server.httpd.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.httpd.shutdown()
+    server.httpd.server_close()
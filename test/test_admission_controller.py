@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services.admission_controller import (
+    AdmissionController, AdmissionRejected, PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL
+)
+from services.chat_service import ChatService
+
+
+def _wait_for_queue(controller, depth):
+    while controller.queue_depth() < depth:
+        time.sleep(0.001)
+
+
+def test_queued_requests_are_admitted_by_priority():
+    controller = AdmissionController(max_in_flight=1, max_queue=4, default_timeout=5)
+    controller.acquire()
+    order = []
+
+    def worker(name, priority):
+        controller.acquire(priority)
+        order.append(name)
+        controller.release()
+
+    threads = []
+    for depth, (name, priority) in enumerate([('low', PRIORITY_LOW), ('normal', PRIORITY_NORMAL), ('high', PRIORITY_HIGH)], 1):
+        thread = threading.Thread(target=worker, args=(name, priority))
+        thread.start()
+        threads.append(thread)
+        _wait_for_queue(controller, depth)
+
+    controller.release()
+    for thread in threads:
+        thread.join(5)
+
+    assert order == ['high', 'normal', 'low']
+    assert controller.stats()['admitted'] == 4
+
+
+def test_rejects_when_queue_is_full_or_deadline_passes():
+    controller = AdmissionController(max_in_flight=1, max_queue=1, default_timeout=5)
+    controller.acquire()
+
+    with pytest.raises(AdmissionRejected):
+        controller.acquire(timeout=0.01)
+
+    waiter = threading.Thread(target=lambda: pytest.raises(AdmissionRejected, controller.acquire, timeout=0.2))
+    waiter.start()
+    _wait_for_queue(controller, 1)
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.acquire()
+    waiter.join(5)
+
+    assert rejected.value.retry_after >= 1
+    stats = controller.stats()
+    assert stats['rejected_queue_full'] == 1
+    assert stats['rejected_timeout'] == 2
+    assert stats['queue_depth'] == 0
+
+
+def test_chat_returns_429_with_retry_after_when_saturated(chat_client, fake_ollama):
+    fake_ollama.admission.max_in_flight = 1
+    fake_ollama.admission.max_queue = 0
+    fake_ollama.admission.acquire()
+
+    response = chat_client.post('/chat', json={'query': 'Hola'})
+
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert fake_ollama.calls == []
+
+    stream_response = chat_client.post('/chat/stream', json={'query': 'Hola'})
+    assert stream_response.status_code == 429
+
+
+def test_async_waiters_share_the_queue_and_leave_it_when_cancelled():
+    controller = AdmissionController(max_in_flight=1, max_queue=4, default_timeout=5)
+
+    async def run():
+        await controller.acquire_async()
+        cancelled = asyncio.ensure_future(controller.acquire_async())
+        admitted = asyncio.ensure_future(controller.acquire_async(PRIORITY_LOW))
+        await asyncio.sleep(0.01)
+        assert controller.queue_depth() == 2
+
+        cancelled.cancel()
+        await asyncio.sleep(0.01)
+        assert controller.queue_depth() == 1
+
+        # Un hilo libera el hueco: la corrutina que sigue en la cola se despierta
+        threading.Thread(target=controller.release).start()
+        await asyncio.wait_for(admitted, 1)
+
+    asyncio.run(run())
+    assert controller.stats()['in_flight'] == 1
+    assert controller.stats()['queue_depth'] == 0
+
+
+@pytest.mark.parametrize('authorization, expected', [
+    (None, PRIORITY_NORMAL),
+    ('Bearer x', PRIORITY_NORMAL),
+    ('token_ana_garcia_abc', PRIORITY_NORMAL),
+    ('Bearer token_ana_garcia_1700000000', PRIORITY_NORMAL),
+    ('Bearer {token}', PRIORITY_HIGH),
+])
+def test_chat_priority_requires_a_valid_token(chat_client, monkeypatch, auth_token, authorization, expected):
+    priorities = []
+    original = ChatService.send_message
+
+    def send_message(self, *args, **kwargs):
+        priorities.append(kwargs.get('priority'))
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(ChatService, 'send_message', send_message)
+    headers = {'Authorization': authorization.format(token=auth_token('ana_garcia'))} if authorization else {}
+    chat_client.post('/chat', json={'query': 'Hola'}, headers=headers)
+
+    assert priorities == [expected]
@@ -0,0 +1,122 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import asgi_app
+from services import async_chat_service, scraping_service
+from services.admission_controller import AdmissionController
+from services.scrape_cache import ScrapeCache
+
+
+class FakeAsyncOllamaClient:
+    """Sustituto asíncrono de AsyncOllamaClient: contesta tras ``delay`` segundos"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+
+    async def post(self, path, payload, timeout=None):
+        self.calls.append(payload)
+        if timeout is not None and timeout < self.delay:
+            await asyncio.sleep(timeout)
+            raise httpx.ReadTimeout('timed out')
+        await asyncio.sleep(self.delay)
+        return httpx.Response(200, json={'model': payload['model'], 'response': f"respuesta: {payload['prompt']}",
+                                         'done': True, 'eval_count': 3})
+
+
+@pytest.fixture
+def async_ollama(fake_ollama, response_cache, monkeypatch):
+    client = FakeAsyncOllamaClient()
+    admission = AdmissionController(max_in_flight=64, max_queue=64, default_timeout=5)
+    monkeypatch.setattr(async_chat_service, 'get_async_ollama_client', lambda *args, **kwargs: client)
+    monkeypatch.setattr(async_chat_service, 'get_ollama_balancer', lambda: fake_ollama.balancer)
+    monkeypatch.setattr(async_chat_service, 'get_admission_controller', lambda: admission)
+    monkeypatch.setattr(asgi_app, 'get_chat_log_writer', lambda: None)
+    return client
+
+
+def _request(*requests):
+    """Lanza las peticiones a la app ASGI a la vez y devuelve las respuestas en orden"""
+    async def run():
+        transport = httpx.ASGITransport(app=asgi_app.application)
+        async with httpx.AsyncClient(transport=transport, base_url='http://testserver') as client:
+            return await asyncio.gather(*(client.request(method, url, **kwargs) for method, url, kwargs in requests))
+    return asyncio.run(run())
+
+
+def test_chat_answers_and_caches(async_ollama):
+    first, = _request(('POST', '/chat', {'json': {'query': 'hola'}}))
+    second, = _request(('POST', '/chat', {'json': {'query': 'hola'}}))
+
+    assert first.status_code == 200
+    assert first.json()['response'] == 'respuesta: hola'
+    assert first.headers['X-Cache'] == 'MISS'
+    assert first.headers['Access-Control-Allow-Origin'] == '*'
+    assert 'X-Cache' in first.headers['Access-Control-Expose-Headers']
+    assert second.headers['X-Cache'] == 'HIT'
+    assert len(async_ollama.calls) == 1
+    assert _request(('POST', '/chat', {'json': {}}))[0].status_code == 400
+
+
+def test_slow_upstream_calls_overlap_on_one_thread(async_ollama):
+    async_ollama.delay = 0.3
+    started_at = time.perf_counter()
+    responses = _request(*[('POST', '/chat', {'json': {'query': f'pregunta {i}'}}) for i in range(50)])
+
+    assert all(response.status_code == 200 for response in responses)
+    assert len(async_ollama.calls) == 50
+    assert time.perf_counter() - started_at < 2.0
+
+
+def test_identical_concurrent_queries_share_one_generation(async_ollama):
+    async_ollama.delay = 0.2
+    responses = _request(*[('POST', '/chat', {'json': {'query': 'misma'}}) for _ in range(5)])
+
+    assert [response.status_code for response in responses] == [200] * 5
+    assert len(async_ollama.calls) == 1
+    assert sum(1 for response in responses if response.json().get('coalesced')) == 4
+
+
+def test_deadline_returns_504(async_ollama):
+    async_ollama.delay = 1.0
+    response, = _request(('POST', '/chat', {'json': {'query': 'lenta'}, 'headers': {'X-Request-Timeout': '0.1'}}))
+
+    assert response.status_code == 504
+    assert response.json()['deadline_exceeded'] is True
+
+
+def test_scraping_routes_use_the_async_http_client(monkeypatch):
+    html = '<html><body><h1>Alta al padró</h1><p class="descripcion">Inscripció al padró municipal</p></body></html>'
+    requested = []
+
+    def handler(request):
+        requested.append(str(request.url))
+        return httpx.Response(200, text=html)
+
+    monkeypatch.setattr(scraping_service, 'get_async_http_client',
+                        lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(scraping_service.ScrapingService, '_index_document', lambda self, url, info: None)
+    monkeypatch.setattr(scraping_service, 'get_fetch_cache', lambda: None)
+    cache = ScrapeCache(loader=lambda url: {'success': False, 'error': 'no se usa'}, ttl_seconds=600)
+    monkeypatch.setattr(asgi_app, 'get_scrape_cache', lambda: cache)
+
+    quick, = _request(('GET', '/scrape/tarragona-padron/quick', {}))
+    info, rejected = _request(('GET', '/padron-info', {}),
+                              ('POST', '/scrape/tarragona-padron', {'json': {'url': 'https://example.com'}}))
+
+    assert quick.status_code == 200
+    assert quick.json()['document_info']['title'] == 'Alta al padró'
+    assert info.json()['title'] == scraping_service.PADRON_SUMMARY['title']
+    assert rejected.status_code == 400
+    assert info.json()['cache_age_seconds'] >= 0
+    # La segunda ruta reutiliza la página cacheada por la primera
+    assert requested == [scraping_service.TARRAGONA_PADRON_URL]
+
+
+def test_unknown_routes(async_ollama):
+    missing, wrong_method = _request(('GET', '/nope', {}), ('GET', '/chat', {}))
+    assert missing.status_code == 404
+    assert wrong_method.status_code == 405
@@ -0,0 +1,207 @@
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from services import catalog_crawler, scraping_service
+from services.catalog_crawler import (CRAWL_CANCELLED, CRAWL_COMPLETED, CatalogCrawler, CrawlStore,
+                                      normalize_url)
+from services.padron_index import PadronIndex
+from services.scraping_service import ScrapingService
+
+PATH = '/sta/CarpetaPublic/doEvent'
+LISTING_1 = ('<html><body><ul>'
+             '<li><a href="?APP_CODE=STA&PAGE_CODE=CATALOGO&DETALLE=1&lang=ES">Alta al padró</a></li>'
+             '<li><a href="doEvent?lang=ES&DETALLE=2&PAGE_CODE=CATALOGO&APP_CODE=STA#ficha">Baixa del padró</a></li>'
+             '<li><a href="?APP_CODE=STA&PAGE_CODE=CATALOGO&DETALLE=1&lang=ES">Alta (duplicado)</a></li>'
+             '<li><a href="?APP_CODE=STA&PAGE_CODE=CATALOGO&DETALLE=1&lang=CA">Alta en català</a></li>'
+             '<li><a href="https://example.com/?DETALLE=9">Externo</a></li>'
+             '<li><a href="mailto:omac@tarragona.cat">Correo</a></li>'
+             '</ul><a href="?APP_CODE=STA&PAGE_CODE=CATALOGO&lang=ES&PAGINA=2">Siguiente</a></body></html>')
+LISTING_2 = ('<html><body><ul>'
+             '<li><a href="?APP_CODE=STA&PAGE_CODE=CATALOGO&DETALLE=3&lang=ES">Canvi de domicili</a></li>'
+             '<li><a href="?APP_CODE=STA&PAGE_CODE=CATALOGO&DETALLE=4&lang=ES">Volant de convivència</a></li>'
+             '<li><a href="?APP_CODE=STA&PAGE_CODE=CATALOGO&DETALLE=2&lang=ES">Baixa del padró</a></li>'
+             '</ul><a href="?APP_CODE=STA&PAGE_CODE=CATALOGO&lang=ES">Anterior</a></body></html>')
+TRAMITS = 4
+
+
+class Catalogue:
+    """Sede de prueba: dos listados y cuatro fichas, con contadores de concurrencia"""
+
+    def __init__(self, page_server, tramit_delay=0.02):
+        self.server = page_server
+        self.tramit_delay = tramit_delay
+        self.failing = set()
+        self.tramit_requests = []
+        self.started = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        page_server.routes[PATH] = self.handle
+
+    @property
+    def url(self):
+        return self.server.url(f'{PATH}?APP_CODE=STA&PAGE_CODE=CATALOGO&lang=ES')
+
+    def handle(self, handler):
+        params = parse_qs(urlsplit(handler.path).query)
+        with self._lock:
+            self.started.append(time.monotonic())
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            if 'DETALLE' not in params:
+                body = LISTING_2 if params.get('PAGINA') == ['2'] else LISTING_1
+                status = 200
+            else:
+                detail = params['DETALLE'][0]
+                self.tramit_requests.append(detail)
+                time.sleep(self.tramit_delay)
+                status = 500 if detail in self.failing else 200
+                body = (f'<html><body><h1>Tràmit {detail}</h1><p class="descripcion">Descripció del tràmit '
+                        f'{detail}</p><h3>Requisitos</h3><p>Documentació necessària per al tràmit {detail}</p>'
+                        '</body></html>')
+            data = body.encode('utf-8')
+            handler.send_response(status)
+            handler.send_header('Content-Type', 'text/html; charset=utf-8')
+            handler.send_header('Content-Length', str(len(data)))
+            handler.end_headers()
+            handler.wfile.write(data)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+@pytest.fixture
+def catalogue(page_server, monkeypatch):
+    monkeypatch.setattr(scraping_service, 'get_fetch_cache', lambda: None)
+    monkeypatch.setattr(ScrapingService, '_index_document', lambda self, url, info: None)
+    monkeypatch.setattr(catalog_crawler, 'get_padron_index', lambda: PadronIndex())
+    return Catalogue(page_server)
+
+
+def _crawler(catalogue, tmp_path, **kwargs):
+    options = {'concurrency': 4, 'per_host_concurrency': 2, 'delay_seconds': 0.0}
+    options.update(kwargs)
+    return CatalogCrawler(catalogue.url, CrawlStore(str(tmp_path / 'crawl.jsonl')), **options)
+
+
+def test_normalize_url_ignores_fragment_and_query_order():
+    assert normalize_url('HTTPS://Seu.Tarragona.cat/a?b=2&a=1#x') == normalize_url('https://seu.tarragona.cat/a?a=1&b=2')
+
+
+def test_crawls_every_tramit_once_within_the_per_host_limit(catalogue, tmp_path):
+    crawler = _crawler(catalogue, tmp_path)
+    reported = []
+
+    stats = crawler.crawl(progress=lambda url, result, progress: reported.append(progress['fetched']))
+
+    assert stats['status'] == CRAWL_COMPLETED
+    assert stats['listings'] == 2
+    assert stats['discovered'] == stats['fetched'] == TRAMITS
+    assert sorted(catalogue.tramit_requests) == ['1', '2', '3', '4']
+    assert catalogue.max_active <= 2
+    assert reported == [1, 2, 3, 4]
+
+    results = crawler.store.results()
+    assert sorted(result['document_info']['title'] for result in results.values()) == \
+        ['Tràmit 1', 'Tràmit 2', 'Tràmit 3', 'Tràmit 4']
+
+
+def test_politeness_delay_spaces_requests_to_the_same_host(catalogue, tmp_path):
+    crawler = _crawler(catalogue, tmp_path, per_host_concurrency=1, delay_seconds=0.05)
+
+    crawler.crawl()
+
+    gaps = [b - a for a, b in zip(catalogue.started, catalogue.started[1:])]
+    assert len(catalogue.started) == 2 + TRAMITS
+    assert min(gaps) >= 0.045
+
+
+def test_resume_only_fetches_what_is_missing_from_the_store(catalogue, tmp_path):
+    catalogue.failing = {'3'}
+    first = _crawler(catalogue, tmp_path).crawl()
+    assert first['fetched'] == 3 and first['failed'] == 1
+
+    # Una línea a medio escribir (proceso interrumpido) no impide reanudar
+    with open(tmp_path / 'crawl.jsonl', 'a', encoding='utf-8') as f:
+        f.write('{"url": "http://trunc')
+
+    catalogue.failing = set()
+    catalogue.tramit_requests.clear()
+    second = _crawler(catalogue, tmp_path).crawl()
+
+    assert catalogue.tramit_requests == ['3']
+    assert second['skipped'] == 3 and second['fetched'] == 1
+    assert all(result['success'] for result in CrawlStore(str(tmp_path / 'crawl.jsonl')).results().values())
+
+    catalogue.tramit_requests.clear()
+    _crawler(catalogue, tmp_path).crawl(restart=True)
+    assert sorted(catalogue.tramit_requests) == ['1', '2', '3', '4']
+
+
+def test_background_crawl_reports_progress_and_can_be_cancelled(catalogue, tmp_path):
+    catalogue.tramit_delay = 0.2
+    crawler = _crawler(catalogue, tmp_path, concurrency=1, per_host_concurrency=1)
+
+    crawler.start()
+    while crawler.progress()['fetched'] < 1:
+        time.sleep(0.01)
+    assert crawler.progress()['status'] == 'running'
+    assert crawler.cancel() is True
+    crawler.wait(5)
+
+    stats = crawler.progress()
+    assert stats['status'] == CRAWL_CANCELLED
+    assert stats['fetched'] < TRAMITS
+    assert len(crawler.store.completed_urls()) == stats['fetched']
+
+
+def test_keyboard_interrupt_cancels_without_waiting_for_in_flight_downloads(catalogue, tmp_path):
+    catalogue.tramit_delay = 0.3
+    crawler = _crawler(catalogue, tmp_path, concurrency=2, per_host_concurrency=2)
+    interrupted_at = []
+
+    def progress(url, result, stats):
+        interrupted_at.append(time.monotonic())
+        raise KeyboardInterrupt
+
+    stats = crawler.crawl(progress=progress)
+
+    assert time.monotonic() - interrupted_at[0] < 0.2
+    assert stats['status'] == CRAWL_CANCELLED
+    assert stats['fetched'] == len(crawler.store.completed_urls()) < TRAMITS
+
+
+def test_crawl_routes_start_report_and_reject_a_second_crawl(catalogue, tmp_path, monkeypatch, auth_token):
+    from flask import Flask
+    from config.scraping_settings import get_scraping_settings
+    from routes import scraping_bp as scraping_routes
+
+    catalogue.tramit_delay = 0.1
+    crawler = _crawler(catalogue, tmp_path, concurrency=1, per_host_concurrency=1)
+    monkeypatch.setattr(scraping_routes, 'get_catalog_crawler', lambda: crawler)
+    monkeypatch.setattr(get_scraping_settings(), 'crawl_admins', 'root')
+    app = Flask(__name__)
+    app.register_blueprint(scraping_routes.scraping_bp)
+    admin = {'Authorization': auth_token('root')}
+
+    with app.test_client() as client:
+        anonymous = client.post('/scrape/catalog/crawl', json={'restart': True})
+        forged = client.post('/scrape/catalog/crawl', json={}, headers={'Authorization': 'token_root_1'})
+        not_admin = client.delete('/scrape/catalog/crawl', headers={'Authorization': auth_token('ana')})
+        started = client.post('/scrape/catalog/crawl', json={}, headers=admin)
+        again = client.post('/scrape/catalog/crawl', json={}, headers=admin)
+        crawler.wait(10)
+        progress = client.get('/scrape/catalog/crawl')
+        stop = client.delete('/scrape/catalog/crawl', headers=admin)
+
+    assert anonymous.status_code == 401 and forged.status_code == 401
+    assert not_admin.status_code == 403
+
+    assert started.status_code == 202 and started.get_json()['status'] == 'running'
+    assert again.status_code == 409
+    assert progress.get_json()['status'] == CRAWL_COMPLETED and progress.get_json()['fetched'] == TRAMITS
+    assert stop.status_code == 409
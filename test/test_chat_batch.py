@@ -0,0 +1,64 @@
+import json
+import time
+
+from test.conftest import FakeResponse
+
+
+def test_batch_returns_results_in_order_with_item_errors(chat_client, fake_ollama):
+    def handler(path, payload, stream):
+        if payload['prompt'] == 'falla':
+            return FakeResponse(status_code=500)
+        return FakeResponse({'response': payload['prompt'].upper()})
+
+    fake_ollama.handler = handler
+
+    response = chat_client.post('/chat/batch', json={
+        'queries': [{'query': 'uno'}, {'query': 'falla'}, {'query': 'tres'}],
+        'concurrency': 3
+    })
+
+    data = response.get_json()
+    assert response.status_code == 200
+    assert [r['index'] for r in data['results']] == [0, 1, 2]
+    assert [r['response'] for r in data['results']] == ['UNO', None, 'TRES']
+    assert data['results'][1]['success'] is False
+    assert (data['succeeded'], data['failed']) == (2, 1)
+
+
+def test_batch_streams_ndjson(chat_client, fake_ollama):
+    response = chat_client.post('/chat/batch?stream=true', json={'queries': [{'query': 'uno'}, {'query': 'dos'}]})
+
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert sorted(line['index'] for line in lines) == [0, 1]
+
+
+def test_batch_rejects_blank_queries(chat_client):
+    response = chat_client.post('/chat/batch', json={'queries': [{'query': '  '}]})
+    assert response.status_code == 400
+
+
+def test_batch_gives_each_query_its_own_deadline(chat_client, fake_ollama):
+    timeouts = []
+
+    def handler(path, payload, stream):
+        timeouts.append(fake_ollama.calls[-1]['timeout'])
+        time.sleep(0.05)
+        return FakeResponse({'response': payload['prompt']})
+
+    fake_ollama.handler = handler
+
+    response = chat_client.post('/chat/batch', json={
+        'queries': [{'query': 'uno'}, {'query': 'dos'}, {'query': 'tres'}],
+        'concurrency': 1
+    }, headers={'X-Request-Timeout': '0.12'})
+
+    assert response.get_json()['succeeded'] == 3
+    # Un plazo común habría dejado a la tercera consulta con menos de 0.02 s
+    assert all(0.1 < timeout[1] <= 0.12 for timeout in timeouts)
+
+
+def test_batch_rejects_malformed_timeout_header(chat_client):
+    response = chat_client.post('/chat/batch', json={'queries': [{'query': 'uno'}]},
+                                headers={'X-Request-Timeout': 'nan'})
+    assert response.status_code == 400
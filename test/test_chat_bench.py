@@ -0,0 +1,62 @@
+import threading
+
+import pytest
+import requests
+
+from benchmarks.chat_bench import ChatBenchmark, percentile
+from benchmarks.fake_ollama import FakeOllamaConfig, FakeOllamaServer
+
+
+@pytest.fixture
+def fake_server():
+    with FakeOllamaServer(FakeOllamaConfig(tokens=5, token_delay=0.001)) as server:
+        yield server
+
+
+def test_percentile_interpolates():
+    values = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+    assert percentile(values, 50) == pytest.approx(5.5)
+    assert percentile(values, 99) == pytest.approx(9.91)
+    assert percentile([], 50) is None
+
+
+def test_fake_server_streams_tokens_and_injects_errors(fake_server):
+    lines = list(requests.post(f"{fake_server.url}/api/generate", json={'model': 'gemma:7b', 'prompt': 'hola'},
+                               stream=True).iter_lines())
+    assert len(lines) == 6
+    assert b'"done": true' in lines[-1]
+
+    fake_server.config.error_rate = 1.0
+    response = requests.post(f"{fake_server.url}/api/generate", json={'prompt': 'hola', 'stream': False})
+    assert response.status_code == 500
+    assert fake_server.errors == 1
+
+
+def test_benchmark_reports_latency_and_ttft(fake_ollama, monkeypatch, fake_server):
+    from flask import Flask
+    from werkzeug.serving import make_server
+    from routes.chat_bp import chat_bp
+    from services import chat_service
+    from services.ollama_client import OllamaClient
+
+    client = OllamaClient(fake_server.url)
+    monkeypatch.setattr(chat_service, 'get_ollama_client', lambda *args, **kwargs: client)
+    app = Flask(__name__)
+    app.register_blueprint(chat_bp)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        benchmark = ChatBenchmark(f"http://127.0.0.1:{server.server_port}", batch_size=2)
+        chat = benchmark.run('chat', concurrency=2, total_requests=4)
+        stream = benchmark.run('stream', concurrency=2, total_requests=4)
+    finally:
+        server.shutdown()
+        client.close()
+
+    assert chat['successes'] == 4
+    assert chat['status_codes'] == {'200': 4}
+    assert set(chat['latency_ms']) == {'p50', 'p95', 'p99', 'mean', 'max'}
+    assert chat['ttft_ms'] is None
+    assert stream['successes'] == 4
+    assert stream['ttft_ms']['p50'] <= stream['latency_ms']['p50']
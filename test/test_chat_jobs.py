@@ -0,0 +1,75 @@
+import time
+
+import pytest
+
+from services.chat_jobs import ChatJobManager, JobStoreFull, JOB_COMPLETED, JOB_FAILED
+from routes import chat_bp as chat_routes
+
+
+class FakeChatService:
+
+    def __init__(self, events):
+        self.events = events
+
+    def stream_message(self, query, priority=None, budget=None):
+        for event in self.events:
+            yield dict(event)
+
+
+def _wait_finished(manager, job_id):
+    for _ in range(500):
+        job = manager.get(job_id)
+        if job.finished:
+            return job
+        time.sleep(0.01)
+    raise AssertionError('el trabajo no terminó')
+
+
+def test_job_accumulates_partial_output_and_result():
+    manager = ChatJobManager(FakeChatService([
+        {'type': 'token', 'response': 'Hola'},
+        {'type': 'token', 'response': ' mundo'},
+        {'type': 'done', 'model': 'gemma:7b', 'stats': {'eval_count': 2}},
+    ]))
+
+    job = _wait_finished(manager, manager.submit('saludo').id)
+
+    assert job.status == JOB_COMPLETED
+    assert job.to_dict()['result']['response'] == 'Hola mundo'
+    assert job.to_dict()['partial_response'] == 'Hola mundo'
+
+
+def test_failed_job_and_bounded_store(monkeypatch):
+    manager = ChatJobManager(FakeChatService([{'type': 'error', 'error': 'sin conexión'}]), max_jobs=1, ttl_seconds=60)
+
+    first = _wait_finished(manager, manager.submit('uno').id)
+    assert first.status == JOB_FAILED
+
+    # El trabajo terminado deja sitio al nuevo
+    second = manager.submit('dos')
+    assert manager.get(first.id) is None
+    _wait_finished(manager, second.id)
+
+    monkeypatch.setattr('services.chat_jobs.time.time', lambda: second.finished_at + 61)
+    assert manager.get(second.id) is None
+
+
+def test_job_routes(chat_client, monkeypatch):
+    manager = ChatJobManager(FakeChatService([{'type': 'token', 'response': 'ok'}, {'type': 'done', 'model': 'gemma:7b'}]))
+    monkeypatch.setattr(chat_routes, 'get_chat_job_manager', lambda: manager)
+
+    submitted = chat_client.post('/chat/jobs', json={'query': 'Hola'})
+    assert submitted.status_code == 202
+    job_id = submitted.get_json()['job_id']
+
+    _wait_finished(manager, job_id)
+    data = chat_client.get(f'/chat/jobs/{job_id}').get_json()
+    assert data['status'] == 'completed'
+    assert data['result']['response'] == 'ok'
+    assert chat_client.get('/chat/jobs/desconocido').status_code == 404
+
+
+def test_store_full_of_pending_jobs_rejects():
+    manager = ChatJobManager(FakeChatService([]), max_jobs=0)
+    with pytest.raises(JobStoreFull):
+        manager.submit('uno')
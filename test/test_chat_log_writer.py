@@ -0,0 +1,218 @@
+import time
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+from config.chat_log_settings import get_chat_log_settings
+from database.connection_db import SessionManager
+from models.chat_log_model import ChatLogModel
+from routes import chat_bp as chat_routes
+from services.chat_log_writer import ChatLogWriter, chat_log_entry
+
+
+@pytest.fixture
+def session_manager(tmp_path):
+    manager = SessionManager(SimpleNamespace(database_url=f"sqlite:///{tmp_path / 'chat_logs.db'}"))
+    ChatLogModel.metadata.create_all(manager.engine, tables=[ChatLogModel.__table__])
+    return manager
+
+
+class FlakySessionManager:
+    """Falla las primeras ``failures`` sesiones y luego delega en el SessionManager real"""
+
+    def __init__(self, manager, failures):
+        self.manager = manager
+        self.failures = failures
+        self.sessions = 0
+
+    def get_session(self):
+        self.sessions += 1
+        if self.sessions <= self.failures:
+            raise ConnectionError('MySQL server has gone away')
+        return self.manager.get_session()
+
+
+def _entry(username='ana', model='gemma:7b', eval_count=10, cached=False):
+    response = {'success': True, 'response': 'ok', 'model': model, 'cached': cached,
+                'usage': {'prompt_eval_count': 5, 'eval_count': eval_count, 'eval_duration': 1000}}
+    return chat_log_entry('chat', username, 'hola', response, latency_ms=12.5)
+
+
+def _count(manager):
+    with manager.get_session() as session:
+        return session.query(ChatLogModel).count()
+
+
+def test_flushes_in_batches_and_aggregates_usage(session_manager):
+    writer = ChatLogWriter(session_manager, batch_size=2, flush_interval=60)
+    writer.record(_entry('ana', eval_count=10))
+    writer.record(_entry('ana', eval_count=20))
+    writer.record(_entry('luis', model='gemma:2b', eval_count=7))
+    writer.record(_entry('luis', cached=True))
+
+    assert writer.flush() == 4
+    assert writer.batches == 2
+    assert _count(session_manager) == 4
+
+    by_user = writer.usage('user')
+    assert [group['user'] for group in by_user['usage']] == ['ana', 'luis']
+    assert by_user['usage'][0]['eval_count'] == 30
+    # La respuesta de caché cuenta como petición pero no consume tokens
+    assert by_user['usage'][1] == {'user': 'luis', 'requests': 2, 'cached': 1, 'errors': 0, 'prompt_eval_count': 5,
+                                   'eval_count': 7, 'total_duration': 0, 'prompt_eval_duration': 0,
+                                   'eval_duration': 1000}
+    assert by_user['totals']['requests'] == 4
+
+    assert [group['model'] for group in writer.usage('model', username='luis')['usage']] == ['gemma:2b', 'gemma:7b']
+    assert writer.usage('day', since=date(2000, 1, 1))['totals']['eval_count'] == 37
+    assert writer.usage('user', until=date(2000, 1, 1))['usage'] == []
+
+
+def test_retries_a_failed_batch_and_drops_it_after_the_limit(session_manager):
+    writer = ChatLogWriter(FlakySessionManager(session_manager, failures=2), max_retries=2, retry_backoff=0)
+    writer.record(_entry())
+    assert writer.flush() == 1
+    assert writer.retries == 2
+
+    writer = ChatLogWriter(FlakySessionManager(session_manager, failures=10), max_retries=1, retry_backoff=0)
+    writer.record(_entry())
+    assert writer.flush() == 0
+    assert writer.failed_batches == 1
+    assert writer.dropped == 1
+    assert 'gone away' in writer.last_error
+    assert _count(session_manager) == 1
+
+
+def test_close_makes_a_single_bounded_attempt_when_the_database_is_down(session_manager):
+    writer = ChatLogWriter(FlakySessionManager(session_manager, failures=1000), batch_size=2, flush_interval=60,
+                           max_retries=5, retry_backoff=10, flush_timeout=5)
+    for eval_count in range(6):
+        writer.record(_entry(eval_count=eval_count))
+    writer.start()
+
+    started = time.monotonic()
+    writer.close()
+
+    # El hilo de fondo pudo empezar un reintento, pero close interrumpe la espera
+    assert time.monotonic() - started < 2
+    assert writer.retries <= 1
+    assert writer.pending() == 0
+    assert writer.dropped == 6
+
+
+def test_usage_does_not_retry_and_keeps_rows_that_could_not_be_written(session_manager):
+    flaky = FlakySessionManager(session_manager, failures=1)
+    writer = ChatLogWriter(flaky, flush_interval=60, max_retries=5, retry_backoff=10)
+    writer.record(_entry())
+
+    started = time.monotonic()
+    assert writer.usage('user')['usage'] == []
+    assert time.monotonic() - started < 2
+    assert writer.retries == 0
+    assert writer.dropped == 0
+    assert writer.pending() == 1
+
+    assert writer.usage('user')['totals']['requests'] == 1
+
+
+def test_buffer_is_bounded_and_close_flushes_pending_rows(session_manager):
+    writer = ChatLogWriter(session_manager, batch_size=2, flush_interval=60, max_buffer=3)
+    for eval_count in range(5):
+        writer.record(_entry(eval_count=eval_count))
+    assert writer.pending() == 3
+    assert writer.dropped == 2
+
+    writer.start()
+    writer.close(timeout=5)
+
+    assert writer.pending() == 0
+    assert _count(session_manager) == 3
+
+
+def test_chat_endpoint_records_generated_usage(chat_client, session_manager, monkeypatch, auth_token):
+    writer = ChatLogWriter(session_manager, flush_interval=60)
+    monkeypatch.setattr(chat_routes, 'get_chat_log_writer', lambda: writer)
+
+    headers = {'Authorization': auth_token('ana_garcia')}
+    assert chat_client.post('/chat', json={'query': 'hola'}, headers=headers).get_json()['usage'] == {'eval_count': 3}
+    assert chat_client.post('/chat', json={'query': 'hola'}, headers=headers).get_json()['cached'] is True
+    assert writer.pending() == 2
+
+    response = chat_client.get('/chat/usage?group_by=user', headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['usage'] == [{'user': 'ana_garcia', 'requests': 2, 'cached': 1, 'errors': 0,
+                                             'prompt_eval_count': 0, 'eval_count': 3, 'total_duration': 0,
+                                             'prompt_eval_duration': 0, 'eval_duration': 0}]
+    assert chat_client.get('/chat/usage?group_by=query', headers=headers).status_code == 400
+
+
+def test_usage_is_restricted_to_the_own_user_unless_admin(chat_client, session_manager, monkeypatch, auth_token):
+    writer = ChatLogWriter(session_manager, flush_interval=60)
+    monkeypatch.setattr(chat_routes, 'get_chat_log_writer', lambda: writer)
+    monkeypatch.setattr(get_chat_log_settings(), 'chat_usage_admins', 'root')
+    chat_client.post('/chat', json={'query': 'hola'}, headers={'Authorization': auth_token('ana')})
+    chat_client.post('/chat', json={'query': 'adeu'}, headers={'Authorization': auth_token('luis')})
+
+    assert chat_client.get('/chat/usage').status_code == 401
+    assert chat_client.get('/chat/usage', headers={'Authorization': 'Bearer x'}).status_code == 401
+    # Un token sin firma o con la firma de otro usuario no da acceso de administrador
+    _, _, timestamp, signature = auth_token('luis').split('_')
+    for forged in ('token_root_1', f'token_root_{timestamp}_{signature}'):
+        assert chat_client.get('/chat/usage', headers={'Authorization': forged}).status_code == 401
+
+    luis = {'Authorization': auth_token('luis')}
+    assert chat_client.get('/chat/usage?username=ana', headers=luis).status_code == 403
+    assert [group['user'] for group in chat_client.get('/chat/usage', headers=luis).get_json()['usage']] == ['luis']
+
+    root = {'Authorization': auth_token('root')}
+    assert [group['user'] for group in chat_client.get('/chat/usage', headers=root).get_json()['usage']] == \
+        ['ana', 'luis']
+    assert [group['user'] for group in
+            chat_client.get('/chat/usage?username=ana', headers=root).get_json()['usage']] == ['ana']
+
+
+class _ListWriter:
+    def __init__(self):
+        self.entries = []
+
+    def record(self, entry):
+        self.entries.append(entry)
+
+
+def test_stream_and_session_requests_are_recorded(chat_client, monkeypatch, auth_token):
+    writer = _ListWriter()
+    monkeypatch.setattr(chat_routes, 'get_chat_log_writer', lambda: writer)
+    headers = {'Authorization': auth_token('ana')}
+
+    chat_client.post('/chat/stream', json={'query': 'Hola'}, headers=headers).get_data()
+    session_id = chat_client.post('/chat/sessions').get_json()['session_id']
+    chat_client.post(f'/chat/sessions/{session_id}/messages', json={'query': 'Adeu'}, headers=headers)
+
+    stream, session = writer.entries
+    assert (stream['endpoint'], stream['username'], stream['success']) == ('stream', 'ana', True)
+    assert stream['response'] == 'respuesta: Hola '
+    assert stream['eval_count'] is not None
+    assert (session['endpoint'], session['username'], session['success']) == ('session', 'ana', True)
+
+
+def test_finished_jobs_are_recorded(monkeypatch):
+    from services import chat_jobs
+    from test.test_chat_jobs import FakeChatService, _wait_finished
+
+    writer = _ListWriter()
+    monkeypatch.setattr(chat_jobs, 'get_chat_log_writer', lambda: writer)
+    manager = chat_jobs.ChatJobManager(FakeChatService([
+        {'type': 'token', 'response': 'Hola'},
+        {'type': 'done', 'model': 'gemma:7b', 'stats': {'eval_count': 2}},
+    ]))
+
+    _wait_finished(manager, manager.submit('saludo', username='ana').id)
+    for _ in range(100):
+        if writer.entries:
+            break
+        time.sleep(0.01)
+
+    entry, = writer.entries
+    assert (entry['endpoint'], entry['username'], entry['response'], entry['eval_count']) == \
+        ('job', 'ana', 'Hola', 2)
@@ -0,0 +1,39 @@
+import json
+
+from test.conftest import FakeResponse
+
+
+def _parse_sse(body):
+    events = []
+    for block in body.strip().split('\n\n'):
+        lines = block.split('\n')
+        events.append((lines[0][len('event: '):], json.loads(lines[1][len('data: '):])))
+    return events
+
+
+def test_chat_stream_relays_tokens_and_stats(chat_client, fake_ollama):
+    response = chat_client.post('/chat/stream', json={'query': 'Hola'})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    events = _parse_sse(response.get_data(as_text=True))
+    assert [e[0] for e in events] == ['token', 'token', 'done']
+    assert ''.join(e[1]['response'] for e in events[:2]) == 'respuesta: Hola '
+    assert events[-1][1]['model'] == 'gemma:7b'
+    assert events[-1][1]['stats']['tokens_per_second'] == 2.0
+    assert 'time_to_first_token_ms' in events[-1][1]['stats']
+    assert fake_ollama.calls[0]['stream'] is True
+
+
+def test_chat_stream_reports_upstream_error(chat_client, fake_ollama):
+    fake_ollama.handler = lambda path, payload, stream: FakeResponse(status_code=500)
+
+    response = chat_client.post('/chat/stream', json={'query': 'Hola'})
+
+    events = _parse_sse(response.get_data(as_text=True))
+    assert events[-1][0] == 'error'
+
+
+def test_chat_stream_requires_query(chat_client):
+    response = chat_client.post('/chat/stream', json={'query': '  '})
+    assert response.status_code == 400
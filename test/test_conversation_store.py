@@ -0,0 +1,52 @@
+import pytest
+
+from routes import chat_bp as chat_routes
+from services import chat_service
+from services.conversation_store import ConversationStore
+from test.conftest import FakeResponse
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = ConversationStore(max_sessions=2, ttl_seconds=60, max_turns=2, max_context_tokens=4)
+    monkeypatch.setattr(chat_service, 'get_conversation_store', lambda: store)
+    monkeypatch.setattr(chat_routes, 'get_conversation_store', lambda: store)
+    return store
+
+
+def test_store_limits_sessions_turns_and_context(store, monkeypatch):
+    first = store.create()
+    store.create()
+    store.create()
+    assert store.get(first.id) is None
+
+    session = store.create()
+    for i in range(3):
+        store.record_turn(session, f'pregunta {i}', f'respuesta {i}', list(range(10)))
+    assert [turn['content'] for turn in session.turns] == ['pregunta 1', 'respuesta 1', 'pregunta 2', 'respuesta 2']
+    assert session.context == [6, 7, 8, 9]
+
+    now = session.last_used + 61
+    monkeypatch.setattr('services.conversation_store.time.monotonic', lambda: now)
+    assert store.get(session.id) is None
+
+
+def test_follow_up_turn_sends_only_new_message_with_context(chat_client, fake_ollama, store):
+    contexts = iter([[1, 2], [1, 2, 3, 4]])
+    fake_ollama.handler = lambda path, payload, stream: FakeResponse(
+        {'response': f"eco: {payload['prompt']}", 'context': next(contexts)}
+    )
+
+    session_id = chat_client.post('/chat/sessions').get_json()['session_id']
+    chat_client.post(f'/chat/sessions/{session_id}/messages', json={'query': '¿Qué es el padrón?'})
+    second = chat_client.post(f'/chat/sessions/{session_id}/messages', json={'query': '¿Y para menores?'})
+
+    assert second.get_json()['turn'] == 2
+    assert 'context' not in fake_ollama.calls[0]['payload']
+    assert fake_ollama.calls[1]['payload']['prompt'] == '¿Y para menores?'
+    assert fake_ollama.calls[1]['payload']['context'] == [1, 2]
+
+    history = chat_client.get(f'/chat/sessions/{session_id}').get_json()
+    assert history['context_tokens'] == 4
+    assert chat_client.delete(f'/chat/sessions/{session_id}').status_code == 200
+    assert chat_client.post(f'/chat/sessions/{session_id}/messages', json={'query': 'hola'}).status_code == 404
@@ -0,0 +1,122 @@
+import json
+import threading
+import time
+
+import pytest
+import requests
+
+from config.ollama_settings import get_ollama_settings
+from services.chat_service import ChatService
+from services.deadline import Deadline, get_cancellation_metrics, parse_timeout
+from test.conftest import FakeResponse
+
+
+class SlowStreamResponse(FakeResponse):
+    """Respuesta streaming que emite un token cada ``delay`` segundos hasta que se cierra"""
+
+    def __init__(self, delay=0.01):
+        super().__init__()
+        self.delay = delay
+        self.closed_event = threading.Event()
+
+    def iter_lines(self):
+        while not self.closed:
+            time.sleep(self.delay)
+            yield json.dumps({'model': 'gemma:7b', 'response': 'tok ', 'done': False}).encode('utf-8')
+
+    def close(self):
+        super().close()
+        self.closed_event.set()
+
+
+def test_parse_timeout_uses_header_default_and_maximum():
+    assert parse_timeout('2.5', 120, 600) == 2.5
+    assert parse_timeout('', 120, 600) == 120
+    assert parse_timeout('9999', 120, 600) == 600
+    assert parse_timeout(None, 0, 600) is None
+    assert Deadline(10).upstream_timeout((5, 120))[1] <= 10
+
+
+@pytest.mark.parametrize('value', ['abc', 'nan', 'inf', '-inf', '0', '-1'])
+def test_parse_timeout_rejects_malformed_header(value):
+    with pytest.raises(ValueError):
+        parse_timeout(value, 120, 600)
+
+
+@pytest.mark.parametrize('value', ['nan', 'inf', '0'])
+def test_chat_rejects_malformed_timeout_header(chat_client, fake_ollama, value):
+    response = chat_client.post('/chat', json={'query': 'Hola'}, headers={'X-Request-Timeout': value})
+
+    assert response.status_code == 400
+    assert 'X-Request-Timeout' in response.get_json()['error']
+    assert fake_ollama.calls == []
+
+
+def test_chat_deadline_becomes_upstream_timeout_and_returns_504(chat_client, fake_ollama):
+    def handler(path, payload, stream):
+        fake_ollama.last_timeout = fake_ollama.calls[-1]['timeout']
+        time.sleep(0.06)
+        raise requests.ReadTimeout('read timed out')
+
+    fake_ollama.handler = handler
+    before = get_cancellation_metrics().stats()['deadline']
+
+    response = chat_client.post('/chat', json={'query': 'Hola'}, headers={'X-Request-Timeout': '0.05'})
+
+    assert response.status_code == 504
+    assert response.get_json()['deadline_exceeded'] is True
+    assert fake_ollama.last_timeout[1] <= 0.05
+    assert get_cancellation_metrics().stats()['deadline'] == before + 1
+    # Un plazo agotado no es un fallo del servidor Ollama
+    assert fake_ollama.balancer.states()[0]['consecutive_failures'] == 0
+
+
+def test_identical_request_with_more_time_does_not_inherit_the_leader_deadline(fake_ollama):
+    started = threading.Event()
+
+    def handler(path, payload, stream):
+        if len(fake_ollama.calls) == 1:
+            started.set()
+            time.sleep(0.1)
+            raise requests.ReadTimeout('read timed out')
+        return FakeResponse({'model': payload['model'], 'response': 'ok', 'done': True})
+
+    fake_ollama.handler = handler
+    service = ChatService(get_ollama_settings())
+    results = {}
+    leader = threading.Thread(
+        target=lambda: results.update(leader=service.send_message('Hola', use_cache=False, deadline=Deadline(0.05))))
+    leader.start()
+    started.wait(5)
+    follower = service.send_message('Hola', use_cache=False, deadline=Deadline(5))
+    leader.join(5)
+
+    assert results['leader']['deadline_exceeded'] is True
+    assert follower['success'] is True and follower['response'] == 'ok'
+    assert len(fake_ollama.calls) == 2
+
+
+def test_stream_is_aborted_when_deadline_passes(fake_ollama):
+    upstream = SlowStreamResponse()
+    fake_ollama.handler = lambda path, payload, stream: upstream
+
+    events = list(ChatService(get_ollama_settings()).stream_message('Hola lento', deadline=Deadline(0.05)))
+
+    assert events[0]['type'] == 'token'
+    assert events[-1]['type'] == 'error'
+    assert events[-1]['deadline_exceeded'] is True
+    assert upstream.closed
+
+
+def test_stream_is_aborted_when_client_disconnects(fake_ollama):
+    upstream = SlowStreamResponse()
+    fake_ollama.handler = lambda path, payload, stream: upstream
+    before = get_cancellation_metrics().stats()['client_disconnect']
+
+    events = ChatService(get_ollama_settings()).stream_message('Hola desconectado')
+    assert next(events)['type'] == 'token'
+    events.close()
+
+    assert upstream.closed_event.wait(2)
+    assert get_cancellation_metrics().stats()['client_disconnect'] == before + 1
+    assert fake_ollama.admission.stats()['in_flight'] == 0
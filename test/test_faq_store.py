@@ -0,0 +1,120 @@
+import zlib
+
+import numpy as np
+
+from services import chat_service
+from services.faq_store import FaqStore, build_faq_store, faq_key, load_questions
+from services.semantic_cache import SemanticCache
+
+
+def _embedder(text):
+    vector = np.zeros(64, dtype=np.float32)
+    for word in faq_key(text).split():
+        vector[zlib.crc32(word.encode()) % 64] += 1
+    return vector
+
+
+def test_key_ignores_accents_punctuation_and_case():
+    assert faq_key('¿Cómo me EMPADRONO?') == faq_key('como me empadrono')
+
+
+def test_negated_question_misses_the_store():
+    store = FaqStore(['¿Puedo empadronarme sin contrato de alquiler?', '¿Es gratuito el padrón?'],
+                     ['Sí, con una autorización del propietario', 'Sí, es gratuito'], ['gemma:7b', 'gemma:7b'])
+
+    assert faq_key('¿Puedo empadronarme sin contrato de alquiler?') != \
+        faq_key('¿Puedo empadronarme con contrato de alquiler?')
+    assert store.lookup('puedo empadronarme sin contrato de alquiler')['answer'].startswith('Sí, con')
+    assert store.lookup('¿Puedo empadronarme con contrato de alquiler?') is None
+    assert store.lookup('¿No es gratuito el padrón?') is None
+
+
+def test_build_save_and_load_roundtrip(tmp_path):
+    questions_file = tmp_path / 'questions.txt'
+    questions_file.write_text('# comentario\n¿Qué es el padrón?\n\nFalla\n', encoding='utf-8')
+
+    def answer(question):
+        if question == 'Falla':
+            return {'success': False, 'error': 'boom'}
+        return {'success': True, 'response': f'Respuesta a {question}', 'model': 'gemma:7b'}
+
+    progress = []
+    store = build_faq_store(load_questions(str(questions_file)), answer, embedder=_embedder,
+                            embedding_model='fake-embed', progress=lambda *args: progress.append(args))
+    store.save(str(tmp_path / 'faq.npz'))
+    loaded = FaqStore.load(str(tmp_path / 'faq.npz'))
+
+    assert len(progress) == 2
+    assert len(loaded) == 1
+    assert loaded.embedding_model == 'fake-embed'
+    assert loaded.embeddings.shape == (1, 64)
+    assert loaded.lookup('que es el padron')['answer'] == 'Respuesta a ¿Qué es el padrón?'
+
+
+def test_semantic_match_uses_threshold():
+    store = FaqStore(['¿Qué documentos necesito para empadronarme?'], ['DNI y contrato'], ['gemma:7b'],
+                     embeddings=np.stack([_embedder('documentos necesito empadronarme')]), embedding_model='fake',
+                     threshold=0.7)
+    store._embedder = _embedder
+    store.embeddings /= np.linalg.norm(store.embeddings, axis=1, keepdims=True)
+
+    assert store.lookup('documentos para empadronarme necesito yo')['answer'] == 'DNI y contrato'
+    assert store.lookup('horario de la biblioteca') is None
+    assert store.stats()['hits'] == 1
+
+
+def test_chat_serves_precomputed_answer_without_model(chat_client, fake_ollama, monkeypatch):
+    store = FaqStore(['¿Dónde están las oficinas OMAC?'], ['En la Plaça de la Font, 1'], ['gemma:7b'])
+    monkeypatch.setattr(chat_service, 'get_faq_store', lambda: store)
+
+    response = chat_client.post('/chat', json={'query': 'donde estan las oficinas omac'})
+
+    assert response.status_code == 200
+    assert response.headers['X-Precomputed'] == 'true'
+    assert response.get_json()['cache_type'] == 'faq'
+    assert response.get_json()['response'] == 'En la Plaça de la Font, 1'
+    assert fake_ollama.calls == []
+
+    chat_client.post('/chat', json={'query': 'donde estan las oficinas omac'}, headers={'X-Cache-Bypass': 'true'})
+    assert len(fake_ollama.calls) == 1
+
+
+class _CountingEmbedder:
+    model = 'fake'
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, text):
+        self.calls.append(text)
+        return _embedder(text)
+
+
+def test_exact_checks_run_first_and_one_embedding_is_shared(chat_client, fake_ollama, monkeypatch):
+    embedder = _CountingEmbedder()
+    store = FaqStore(['¿Qué documentos necesito para empadronarme?'], ['DNI y contrato'], ['gemma:7b'],
+                     embeddings=np.stack([_embedder('documentos necesito empadronarme')]), embedding_model='fake',
+                     threshold=0.7)
+    store.embeddings /= np.linalg.norm(store.embeddings, axis=1, keepdims=True)
+    store._embedder = embedder
+    monkeypatch.setattr(chat_service, 'get_faq_store', lambda: store)
+    monkeypatch.setattr(chat_service, 'get_semantic_cache', lambda: SemanticCache(embedder, threshold=0.99))
+
+    # Clave exacta de las FAQ: sin embeddings ni modelo
+    assert chat_client.post('/chat', json={'query': 'que documentos necesito para empadronarme'}) \
+        .get_json()['cache_type'] == 'faq'
+    assert embedder.calls == []
+
+    # Fallo de las FAQ y de la caché: un solo embedding para las FAQ y la caché semántica
+    chat_client.post('/chat', json={'query': 'horario de la biblioteca'})
+    assert embedder.calls == ['horario de la biblioteca']
+
+    # La caché exacta responde antes de calcular ningún embedding
+    assert chat_client.post('/chat', json={'query': 'horario de la biblioteca'}).get_json()['cache_type'] == 'exact'
+    assert len(embedder.calls) == 1
+
+    paraphrase = chat_client.post('/chat', json={'query': 'documentos para empadronarme necesito yo'}).get_json()
+    assert paraphrase['cache_type'] == 'faq' and paraphrase['precomputed'] is True
+    assert 'routing_reason' not in paraphrase
+    assert len(embedder.calls) == 2
+    assert len(fake_ollama.calls) == 1
@@ -0,0 +1,139 @@
+import asyncio
+import os
+
+import httpx
+import requests
+
+from services.fetch_cache import FetchCache
+from services.scraping_service import ScrapingService
+
+URL = 'https://seu.tarragona.cat/padron'
+HTML = b'<html><body><h1>Alta al padr\xc3\xb3</h1><p class="descripcion">Inscripci\xc3\xb3 al padr\xc3\xb3 municipal</p></body></html>'
+
+
+class _PageResponse:
+    def __init__(self, status_code, content=b'', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f'{self.status_code} Error')
+
+    def iter_content(self, chunk_size):
+        return iter([self.content])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+def _service(cache, responses, sent):
+    service = ScrapingService(fetch_cache=cache)
+    service._index_document = lambda url, info: None
+
+    def get(url, timeout=None, headers=None, stream=False):
+        sent.append(headers or {})
+        return responses.pop(0)
+
+    service.session.get = get
+    return service
+
+
+def test_refetch_is_conditional_and_304_reuses_the_stored_extraction(tmp_path):
+    cache = FetchCache(str(tmp_path))
+    sent = []
+    service = _service(cache, [
+        _PageResponse(200, HTML, {'ETag': '"v1"', 'Last-Modified': 'Wed, 01 Oct 2025 10:00:00 GMT'}),
+        _PageResponse(304)
+    ], sent)
+
+    first = service.scrape_tarragona_padron_info(URL)
+    service._process_page = lambda *args: (_ for _ in ()).throw(AssertionError('no se debe parsear'))
+    second = service.scrape_tarragona_padron_info(URL)
+
+    assert sent[0] == {}
+    assert sent[1] == {'If-None-Match': '"v1"', 'If-Modified-Since': 'Wed, 01 Oct 2025 10:00:00 GMT'}
+    assert second['success'] and second['not_modified'] and second['status_code'] == 304
+    assert second['document_info'] == first['document_info']
+    assert second['document_info']['title'] == 'Alta al padró'
+    assert cache.stats()['not_modified'] == 1
+
+    # La caché está en disco: otro proceso la encuentra al arrancar
+    reopened = FetchCache(str(tmp_path))
+    assert reopened.get(URL).etag == '"v1"'
+    assert reopened.body(URL) == HTML
+
+
+def test_changed_page_is_parsed_and_replaces_the_entry(tmp_path):
+    cache = FetchCache(str(tmp_path))
+    changed = HTML.replace(b'Alta', b'Baixa')
+    service = _service(cache, [
+        _PageResponse(200, HTML, {'ETag': '"v1"'}),
+        _PageResponse(200, changed, {'ETag': '"v2"'})
+    ], [])
+
+    service.scrape_tarragona_padron_info(URL)
+    result = service.scrape_tarragona_padron_info(URL)
+
+    assert 'not_modified' not in result
+    assert result['document_info']['title'] == 'Baixa al padró'
+    assert cache.get(URL).etag == '"v2"'
+    assert cache.stats()['entries'] == 1
+
+
+def test_responses_without_validators_are_not_stored(tmp_path):
+    cache = FetchCache(str(tmp_path))
+    sent = []
+    service = _service(cache, [_PageResponse(200, HTML), _PageResponse(200, HTML)], sent)
+
+    service.scrape_tarragona_padron_info(URL)
+    service.scrape_tarragona_padron_info(URL)
+
+    assert sent == [{}, {}]
+    assert cache.stats()['entries'] == 0
+
+
+def test_size_bound_evicts_the_least_recently_used_entries(tmp_path):
+    cache = FetchCache(str(tmp_path), max_bytes=1500)
+    for name in ('a', 'b', 'c'):
+        assert cache.store(f'{URL}/{name}', b'x' * 300, f'"{name}"', None, {'title': name})
+
+    cache.get(f'{URL}/a')
+    cache.store(f'{URL}/d', b'x' * 300, '"d"', None, {'title': 'd'})
+
+    assert cache.get(f'{URL}/b') is None
+    assert cache.get(f'{URL}/a') is not None
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['bytes'] <= 1500
+    assert len(os.listdir(tmp_path)) == 2 * cache.stats()['entries']
+    # Una página que no cabe en la caché no se guarda
+    assert cache.store(f'{URL}/big', b'x' * 2000, '"big"', None, {}) is False
+
+
+def test_async_scrape_sends_conditional_headers(tmp_path):
+    cache = FetchCache(str(tmp_path))
+    sent = []
+
+    def handler(request):
+        sent.append(request.headers.get('If-None-Match'))
+        if request.headers.get('If-None-Match') == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, content=HTML, headers={'ETag': '"v1"'})
+
+    service = ScrapingService(fetch_cache=cache)
+    service._index_document = lambda url, info: None
+
+    async def scrape_twice():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            first = await service.scrape_tarragona_padron_info_async(URL, client=client)
+            second = await service.scrape_tarragona_padron_info_async(URL, client=client)
+        return first, second
+
+    first, second = asyncio.run(scrape_twice())
+
+    assert sent == [None, '"v1"']
+    assert second['not_modified'] and second['document_info'] == first['document_info']
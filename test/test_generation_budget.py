@@ -0,0 +1,70 @@
+from services.generation_budget import GenerationBudget, estimate_tokens, truncate_prompt
+
+
+def test_truncation_keeps_start_and_final_question():
+    prompt = 'Contexto inicial. ' + 'texto pegado ' * 500 + '¿Qué plazo tiene el trámite?'
+
+    truncated, was_truncated = truncate_prompt(prompt, 40)
+
+    assert was_truncated
+    assert estimate_tokens(truncated) <= 40
+    assert truncated.startswith('Contexto inicial.')
+    assert truncated.endswith('¿Qué plazo tiene el trámite?')
+    assert truncate_prompt('corto', 40) == ('corto', False)
+
+
+def test_client_values_can_only_narrow_the_budget():
+    budget = GenerationBudget('anonymous', max_prompt_tokens=1024, num_predict=384, num_ctx=2048, temperature=0.7)
+
+    narrowed = budget.narrow(num_predict=9999, num_ctx=1024, temperature=0.1)
+
+    assert narrowed.num_predict == 384
+    assert narrowed.num_ctx == 1024
+    # El prompt y la respuesta deben caber en el contexto
+    assert narrowed.max_prompt_tokens == 1024 - 384
+    assert narrowed.options() == {'num_predict': 384, 'num_ctx': 1024, 'temperature': 0.1}
+
+
+def test_small_context_shrinks_the_response_instead_of_the_prompt():
+    budget = GenerationBudget('anonymous', max_prompt_tokens=1024, num_predict=384, num_ctx=2048, temperature=0.7)
+
+    narrowed = budget.narrow(num_ctx=256)
+
+    assert narrowed.num_predict == 128
+    assert narrowed.max_prompt_tokens == 128
+    assert narrowed.num_predict + narrowed.max_prompt_tokens <= narrowed.num_ctx
+    # Un límite de prompt pequeño deja el resto del contexto a la respuesta
+    small_prompt = GenerationBudget('batch', max_prompt_tokens=64, num_predict=384, num_ctx=256, temperature=0.3)
+    assert (small_prompt.max_prompt_tokens, small_prompt.num_predict) == (64, 192)
+
+
+def test_chat_applies_and_reports_budget(chat_client, fake_ollama):
+    response = chat_client.post('/chat', json={
+        'query': 'Resumen: ' + 'palabra ' * 5000 + 'fin',
+        'num_predict': 64,
+        'temperature': 0.2
+    })
+    body = response.get_json()
+
+    assert response.status_code == 200
+    options = fake_ollama.calls[0]['payload']['options']
+    assert options['num_predict'] == 64
+    assert options['temperature'] == 0.2
+    assert body['budget']['class'] == 'anonymous'
+    assert body['budget']['truncated'] is True
+    assert body['budget']['prompt_tokens'] <= body['budget']['max_prompt_tokens']
+    assert body['query'].endswith('fin')
+
+
+def test_authenticated_class_and_dto_validation(chat_client, fake_ollama, auth_token):
+    response = chat_client.post('/chat', json={'query': 'Hola'},
+                                headers={'Authorization': f"Bearer {auth_token('ana')}"})
+    assert response.get_json()['budget']['class'] == 'authenticated'
+
+    for forged_token in ('Bearer x', 'Bearer token_ana_1700000000'):
+        forged = chat_client.post('/chat', json={'query': 'Hola otra vez'}, headers={'Authorization': forged_token})
+        assert forged.get_json()['budget']['class'] == 'anonymous'
+
+    invalid = chat_client.post('/chat', json={'query': 'Hola', 'temperature': 5})
+    assert invalid.status_code == 400
+    assert 'temperature' in invalid.get_json()['error']
@@ -24,3 +24,15 @@ def test_root_endpoint(client):
     assert data['status'] == 'Working'
     assert data['message'] == 'Flask API is running!'
     assert data['version'] == '1.0.0'
+
+def test_cors_allows_chat_request_headers_and_exposes_response_headers(client):
+    preflight = client.options('/chat', headers={
+        'Origin': 'http://localhost:3000',
+        'Access-Control-Request-Method': 'POST',
+        'Access-Control-Request-Headers': 'Content-Type, X-Request-Timeout, X-Cache-Bypass'
+    })
+    allowed = preflight.headers['Access-Control-Allow-Headers'].lower()
+    assert 'x-request-timeout' in allowed and 'x-cache-bypass' in allowed
+
+    exposed = client.get('/health', headers={'Origin': 'http://localhost:3000'}).headers['Access-Control-Expose-Headers']
+    assert {'X-Cache', 'X-Precomputed', 'Age', 'Retry-After'} <= {name.strip() for name in exposed.split(',')}
@@ -0,0 +1,62 @@
+import threading
+import time
+
+from services.model_info_cache import ModelInfoCache
+
+
+def test_serves_stale_data_while_refreshing_in_background(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('services.model_info_cache.time.monotonic', lambda: now[0])
+    release = threading.Event()
+    loads = []
+
+    def loader():
+        loads.append(1)
+        if len(loads) > 1:
+            release.wait(5)
+        return [{'host': 'http://a', 'model_available': True, 'version': len(loads)}]
+
+    cache = ModelInfoCache(loader, refresh_interval=30)
+    assert cache.get()['backends'][0]['version'] == 1
+
+    now[0] += 31
+    stale = cache.get()
+    assert stale['backends'][0]['version'] == 1
+    assert stale['refreshing'] is True
+    assert cache.get()['backends'][0]['version'] == 1
+
+    release.set()
+    while cache.stats()['refreshing']:
+        time.sleep(0.001)
+    assert cache.get()['backends'][0]['version'] == 2
+    assert len(loads) == 2
+
+
+def test_keeps_last_good_snapshot_when_refresh_fails():
+    results = [[{'host': 'http://a', 'model_available': True}], Exception('timeout')]
+
+    def loader():
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    cache = ModelInfoCache(loader, refresh_interval=30)
+    cache.get()
+    cache.refresh()
+
+    assert cache.get()['backends'] == [{'host': 'http://a', 'model_available': True}]
+    assert cache.stats()['failures'] == 1
+
+
+def test_model_info_endpoint_uses_cache(chat_client, fake_ollama):
+    calls = []
+    original = fake_ollama.list_models
+    fake_ollama.list_models = lambda: calls.append(1) or original()
+
+    first = chat_client.get('/chat/model-info').get_json()
+    chat_client.get('/chat/model-info')
+
+    assert first['model_info']['name'] == 'gemma:7b'
+    assert 'cache_age_seconds' in first
+    assert len(calls) == 1
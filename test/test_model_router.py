@@ -0,0 +1,46 @@
+from services import chat_service
+from services.model_router import ModelRouter
+
+
+def _router(**kwargs):
+    return ModelRouter(quality_model='gemma:7b', fast_model='gemma:2b', max_fast_words=8,
+                       overload_queue_depth=3, **kwargs)
+
+
+def test_routes_by_intent_length_and_queue_depth():
+    router = _router()
+
+    assert router.route('Horario de la OMAC') == ('gemma:2b', 'short')
+    assert router.route('¿Por qué necesito empadronarme?') == ('gemma:7b', 'intent')
+    assert router.route('Explica els requisits del padró') == ('gemma:7b', 'intent')
+    assert router.route('Necesito saber qué documentos debo llevar para el trámite del padrón') == ('gemma:7b', 'length')
+    assert router.route('Explica els requisits del padró', queue_depth=3) == ('gemma:2b', 'overload')
+    assert router.stats()['decisions']['gemma:7b:intent'] == 2
+
+
+def test_without_fast_model_everything_goes_to_quality_model():
+    router = ModelRouter(quality_model='gemma:7b')
+
+    assert router.route('Hola', queue_depth=100) == ('gemma:7b', 'disabled')
+
+
+def test_chat_response_reports_routed_model(chat_client, fake_ollama, monkeypatch):
+    monkeypatch.setattr(chat_service, 'get_model_router', lambda: _router())
+
+    short = chat_client.post('/chat', json={'query': 'Horario OMAC'}).get_json()
+    long = chat_client.post('/chat', json={'query': 'Compara el alta y el cambio de domicilio'}).get_json()
+
+    assert (short['model'], short['routing_reason']) == ('gemma:2b', 'short')
+    assert (long['model'], long['routing_reason']) == ('gemma:7b', 'intent')
+    assert [call['payload']['model'] for call in fake_ollama.calls] == ['gemma:2b', 'gemma:7b']
+
+
+def test_pinned_model_skips_the_router(fake_ollama, monkeypatch):
+    from config.ollama_settings import get_ollama_settings
+
+    monkeypatch.setattr(chat_service, 'get_model_router', lambda: _router())
+    response = chat_service.ChatService(get_ollama_settings()).send_message('Horario OMAC', use_cache=False,
+                                                                           model='gemma:7b')
+
+    assert (response['model'], response['routing_reason']) == ('gemma:7b', 'pinned')
+    assert fake_ollama.calls[-1]['payload']['model'] == 'gemma:7b'
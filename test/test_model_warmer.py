@@ -0,0 +1,31 @@
+from services.model_warmer import ModelWarmer
+from services.ollama_balancer import OllamaBalancer
+from test.conftest import FakeOllamaClient
+
+
+def test_warm_up_loads_model_on_every_host_with_keep_alive(monkeypatch):
+    clients = {}
+    monkeypatch.setattr('services.model_warmer.get_ollama_client',
+                        lambda host: clients.setdefault(host, FakeOllamaClient(host)))
+    warmer = ModelWarmer(OllamaBalancer(['http://a', 'http://b']), model='gemma:7b', keep_alive='1h')
+
+    assert warmer.warm_up() == {'http://a': True, 'http://b': True}
+    for client in clients.values():
+        assert client.calls[0]['payload'] == {'model': 'gemma:7b', 'prompt': '', 'stream': False, 'keep_alive': '1h'}
+
+
+def test_keep_warm_only_pings_idle_hosts():
+    balancer = OllamaBalancer(['http://a', 'http://b'])
+    warmer = ModelWarmer(balancer, model='gemma:7b', keep_alive='30m')
+    warmer.idle_hosts()
+
+    busy = balancer.backends[0]
+    busy.total_requests += 1
+
+    assert warmer.idle_hosts() == ['http://b']
+    assert warmer.idle_hosts() == ['http://a', 'http://b']
+
+
+def test_chat_requests_carry_keep_alive(chat_client, fake_ollama):
+    chat_client.post('/chat', json={'query': 'Hola'})
+    assert fake_ollama.calls[0]['payload']['keep_alive'] == '30m'
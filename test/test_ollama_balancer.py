@@ -0,0 +1,90 @@
+import pytest
+
+from services.ollama_balancer import OllamaBalancer
+from services.ollama_client import OllamaHTTPError
+from test.conftest import FakeResponse
+
+
+def test_routes_to_backend_with_fewest_in_flight():
+    balancer = OllamaBalancer(['http://a', 'http://b', 'http://c'])
+
+    first = balancer.acquire()
+    second = balancer.acquire()
+    third = balancer.acquire()
+    assert {first.host, second.host, third.host} == {'http://a', 'http://b', 'http://c'}
+
+    balancer.release(second, success=True)
+    assert balancer.acquire() is second
+
+
+def test_ejects_after_consecutive_failures_and_readmits_on_probe():
+    alive = {'http://a': False}
+    balancer = OllamaBalancer(['http://a', 'http://b'], eject_after=2, probe=lambda host: alive.get(host, True))
+    backend_a = balancer.backends[0]
+
+    for _ in range(2):
+        backend_a.in_flight += 1
+        balancer.release(backend_a, success=False, error='connection refused')
+
+    assert backend_a.healthy is False
+    assert all(balancer.acquire().host == 'http://b' for _ in range(3))
+
+    balancer.probe_ejected()
+    assert backend_a.healthy is False
+
+    alive['http://a'] = True
+    balancer.probe_ejected()
+    assert backend_a.healthy is True
+    assert balancer.states()[0]['consecutive_failures'] == 0
+
+
+def test_lease_counts_exceptions_as_failures():
+    balancer = OllamaBalancer(['http://a'], eject_after=1)
+
+    try:
+        with balancer.lease():
+            raise Exception('connection refused')
+    except Exception:
+        pass
+
+    assert balancer.states()[0]['healthy'] is False
+    assert balancer.states()[0]['in_flight'] == 0
+
+
+@pytest.mark.parametrize('status_code, failure', [(400, False), (404, False), (500, True), (503, True)])
+def test_only_server_errors_count_as_failures(status_code, failure):
+    balancer = OllamaBalancer(['http://a'], eject_after=1)
+
+    with pytest.raises(OllamaHTTPError):
+        with balancer.lease():
+            raise OllamaHTTPError(status_code, 'model "gemma:2b" not found')
+
+    assert balancer.states()[0]['healthy'] is not failure
+    assert balancer.states()[0]['total_failures'] == int(failure)
+    assert balancer.states()[0]['in_flight'] == 0
+
+
+def test_missing_model_does_not_eject_the_backend(chat_client, fake_ollama):
+    fake_ollama.handler = lambda path, payload, stream: FakeResponse({'error': 'model not found'}, status_code=404)
+
+    for _ in range(5):
+        assert chat_client.post('/chat', json={'query': 'Hola'}, headers={'X-Cache-Bypass': 'true'}).status_code == 500
+
+    assert fake_ollama.balancer.states()[0]['healthy'] is True
+    assert fake_ollama.balancer.states()[0]['consecutive_failures'] == 0
+
+
+def test_uses_a_backend_when_all_are_ejected():
+    balancer = OllamaBalancer(['http://a'], eject_after=1)
+    backend = balancer.acquire()
+    balancer.release(backend, success=False, error='boom')
+
+    assert balancer.acquire() is backend
+
+
+def test_model_info_reports_backend_state(chat_client, fake_ollama):
+    data = chat_client.get('/chat/model-info').get_json()
+
+    assert data['success'] is True
+    assert data['model_info']['backends'][0]['host'] == fake_ollama.host
+    assert data['model_info']['backends'][0]['model_available'] is True
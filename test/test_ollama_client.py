@@ -0,0 +1,27 @@
+import threading
+
+from config.ollama_settings import OllamaSettings
+from services.ollama_client import get_ollama_client, close_ollama_clients
+
+
+def test_client_is_shared_per_host_across_threads():
+    settings = OllamaSettings(OLLAMA_HOST='http://ollama-a:11434', OLLAMA_POOL_SIZE=4,
+                              OLLAMA_CONNECT_TIMEOUT=2, OLLAMA_READ_TIMEOUT=30)
+    clients = []
+
+    def worker():
+        clients.append(get_ollama_client(settings=settings))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    try:
+        assert len({id(client) for client in clients}) == 1
+        assert clients[0].timeout == (2, 30)
+        assert clients[0].session.get_adapter('http://ollama-a:11434')._pool_maxsize == 4
+        assert get_ollama_client('http://ollama-b:11434/', settings=settings) is not clients[0]
+    finally:
+        close_ollama_clients()
@@ -0,0 +1,157 @@
+import os
+import threading
+
+import pytest
+
+from services.generation_budget import estimate_tokens
+from services.padron_index import PadronIndex, build_rag_prompt, fit_rag_prompt, split_passages, tokenize
+
+EMPADRONAMIENTO = {
+    'title': "Alta al Padró municipal d'habitants",
+    'description': "Inscripció al padró de les persones que viuen a Tarragona.",
+    'requirements': [
+        "Document d'identitat vigent (DNI, NIE o passaport).",
+        "Contracte de lloguer o escriptura de l'habitatge."
+    ],
+    'procedures': ["Cal demanar cita prèvia a l'OMAC."],
+    'additional_info': [],
+    'raw_text': ''
+}
+
+RECOLLIDA = {
+    'title': 'Recollida de mobles i trastos vells',
+    'description': 'Servei gratuït de recollida de mobles a domicili.',
+    'requirements': [],
+    'procedures': ['Truqueu al telèfon municipal per concertar la recollida.'],
+    'additional_info': [],
+    'raw_text': ''
+}
+
+
+def test_tokenize_strips_accents_apostrophes_and_stopwords():
+    assert tokenize("Document d'identitat del Padró") == ['document', 'identitat', 'padro']
+    assert tokenize('Col·legi ELECTORAL') == ['collegi', 'electoral']
+    assert tokenize('contractes') == tokenize('contracte')
+
+
+def test_split_passages_chunks_raw_text():
+    info = {'description': 'Descripció', 'requirements': ['Requisit'], 'raw_text': ' '.join(['paraula'] * 25)}
+    passages = split_passages(info, passage_words=10)
+    assert passages[:2] == ['Descripció', 'Requisit']
+    assert len(passages) == 4
+
+
+def test_search_ranks_relevant_passages_first():
+    index = PadronIndex()
+    index.upsert_document('https://seu/padro', EMPADRONAMIENTO)
+    index.upsert_document('https://seu/mobles', RECOLLIDA)
+
+    results = index.search("Quin document d'identitat necessito per empadronar-me?", top_k=2)
+
+    assert results[0]['url'] == 'https://seu/padro'
+    assert 'identitat' in results[0]['text']
+    assert results[0]['score'] >= results[-1]['score']
+    assert index.search('recollida de mobles', top_k=1)[0]['url'] == 'https://seu/mobles'
+    assert index.search('zzz') == []
+
+
+def test_upsert_replaces_previous_passages_and_persists(tmp_path):
+    path = tmp_path / 'index.json'
+    index = PadronIndex(str(path))
+    index.upsert_document('https://seu/padro', EMPADRONAMIENTO)
+    index.upsert_document('https://seu/padro', dict(EMPADRONAMIENTO, requirements=['Llibre de família.']))
+    index.save()
+
+    assert index.search('passaport') == []
+
+    reloaded = PadronIndex(str(path))
+    assert reloaded.stats() == index.stats()
+    assert reloaded.search('llibre familia', top_k=1)[0]['text'] == 'Llibre de família.'
+
+
+def test_chat_rag_adds_passages_to_prompt(chat_client, fake_ollama, monkeypatch):
+    index = PadronIndex()
+    index.upsert_document('https://seu/padro', EMPADRONAMIENTO)
+    monkeypatch.setattr('services.chat_service.get_padron_index', lambda: index)
+
+    response = chat_client.post('/chat', json={'query': 'Quin document necessito?', 'rag': True})
+    body = response.get_json()
+
+    assert response.status_code == 200
+    assert body['query'] == 'Quin document necessito?'
+    assert body['sources'][0]['url'] == 'https://seu/padro'
+    prompt = fake_ollama.calls[0]['payload']['prompt']
+    assert "Document d'identitat vigent" in prompt
+    assert prompt.endswith('Pregunta: Quin document necessito?\nRespuesta:')
+
+
+@pytest.mark.parametrize('value', ['false', '0', 0, False])
+def test_chat_rag_flag_is_parsed_by_the_dto(chat_client, fake_ollama, monkeypatch, value):
+    index = PadronIndex()
+    index.upsert_document('https://seu/padro', EMPADRONAMIENTO)
+    monkeypatch.setattr('services.chat_service.get_padron_index', lambda: index)
+
+    body = chat_client.post('/chat', json={'query': 'Quin document necessito?', 'rag': value}).get_json()
+
+    assert 'sources' not in body
+    assert fake_ollama.calls[0]['payload']['prompt'] == 'Quin document necessito?'
+    assert chat_client.post('/chat', json={'query': 'Hola', 'rag': 'potser'}).status_code == 400
+
+
+def test_fit_rag_prompt_trims_passages_to_the_budget():
+    passages = [{'text': 'primer ' * 20}, {'text': 'segon ' * 20}, {'text': 'tercer ' * 20}]
+    full = build_rag_prompt('Quin document?', passages)
+
+    assert fit_rag_prompt('Quin document?', passages, None) == (full, passages, False)
+
+    max_tokens = estimate_tokens(build_rag_prompt('Quin document?', passages[:1])) + 10
+    prompt, included, truncated = fit_rag_prompt('Quin document?', passages, max_tokens)
+    assert truncated is True
+    assert estimate_tokens(prompt) <= max_tokens
+    assert [p['text'] for p in included][0] == passages[0]['text']
+    assert len(included) == 2 and included[1]['text'].startswith('segon')
+    assert prompt.endswith('Pregunta: Quin document?\nRespuesta:')
+
+
+def test_chat_rag_prompt_respects_max_prompt_tokens(chat_client, fake_ollama, monkeypatch):
+    index = PadronIndex()
+    index.upsert_document('https://seu/padro', EMPADRONAMIENTO)
+    monkeypatch.setattr('services.chat_service.get_padron_index', lambda: index)
+
+    response = chat_client.post('/chat', json={'query': 'Quin document necessito per al padró?', 'rag': True,
+                                               'max_prompt_tokens': 80})
+    budget = response.get_json()['budget']
+    prompt = fake_ollama.calls[0]['payload']['prompt']
+
+    assert budget['truncated'] is True
+    assert budget['prompt_tokens'] == estimate_tokens(prompt) <= 80
+    assert budget['original_prompt_tokens'] > 80
+    assert prompt.endswith('Pregunta: Quin document necessito per al padró?\nRespuesta:')
+
+
+def test_save_while_documents_are_upserted(tmp_path):
+    path = tmp_path / 'index.json'
+    index = PadronIndex(str(path))
+    errors = []
+
+    def upsert():
+        for i in range(200):
+            index.upsert_document(f'https://seu/tramit/{i}', EMPADRONAMIENTO)
+
+    def save():
+        try:
+            for _ in range(50):
+                index.save()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=upsert), threading.Thread(target=save)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    index.save()
+
+    assert errors == []
+    assert PadronIndex(str(path)).stats() == index.stats()
+    assert [name for name in os.listdir(tmp_path)] == ['index.json']
@@ -0,0 +1,44 @@
+from services.response_cache import ResponseCache, make_cache_key
+
+
+def test_key_normalizes_prompt_but_not_model_or_options():
+    assert make_cache_key('gemma:7b', '  ¿Cómo me  empadrono? ') == make_cache_key('gemma:7b', '¿cómo me empadrono?')
+    assert make_cache_key('gemma:7b', 'hola') != make_cache_key('gemma:2b', 'hola')
+    assert make_cache_key('gemma:7b', 'hola', {'temperature': 0}) != make_cache_key('gemma:7b', 'hola')
+
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('services.response_cache.time.monotonic', lambda: now[0])
+    cache = ResponseCache(max_entries=2, ttl_seconds=10)
+
+    cache.set('a', {'response': 'A'})
+    cache.set('b', {'response': 'B'})
+    assert cache.get('a') == {'response': 'A'}
+    cache.set('c', {'response': 'C'})
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+
+    now[0] += 11
+    assert cache.get('c') is None
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['expirations'] == 1
+
+
+def test_chat_is_served_from_cache(chat_client, fake_ollama):
+    first = chat_client.post('/chat', json={'query': 'Horario OMAC'})
+    second = chat_client.post('/chat', json={'query': 'horario  omac'})
+
+    assert first.headers['X-Cache'] == 'MISS'
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.get_json()['cached'] is True
+    assert second.get_json()['response'] == first.get_json()['response']
+    assert len(fake_ollama.calls) == 1
+
+    bypass = chat_client.post('/chat', json={'query': 'Horario OMAC'}, headers={'X-Cache-Bypass': 'true'})
+    assert bypass.headers['X-Cache'] == 'BYPASS'
+    assert len(fake_ollama.calls) == 2
+
+    stats = chat_client.get('/chat/stats').get_json()
+    assert stats['cache']['hits'] == 1
@@ -0,0 +1,108 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services import scrape_cache
+from services.scrape_cache import ScrapeCache
+
+URL = 'https://seu.tarragona.cat/padron'
+
+
+def _page(version):
+    return {'success': True, 'url': URL, 'document_info': {'title': f'v{version}'}, 'status_code': 200}
+
+
+def _wait_refresh(cache):
+    while any(entry.refreshing for entry in cache._entries.values()):
+        time.sleep(0.001)
+
+
+def test_serves_stale_copy_while_one_background_refresh_runs(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('services.scrape_cache.time.monotonic', lambda: now[0])
+    release = threading.Event()
+    loads = []
+
+    def loader(url):
+        loads.append(url)
+        if len(loads) > 1:
+            release.wait(5)
+        return _page(len(loads))
+
+    cache = ScrapeCache(loader, ttl_seconds=60)
+    first = cache.get(URL)
+    assert first['document_info']['title'] == 'v1'
+    assert first['cache_age_seconds'] == 0 and first['stale'] is False
+
+    now[0] += 90
+    stale = [cache.get(URL) for _ in range(3)]
+    assert all(result['document_info']['title'] == 'v1' and result['stale'] for result in stale)
+    assert stale[0]['cache_age_seconds'] == 90
+    assert stale[0]['refreshing'] is True
+
+    release.set()
+    _wait_refresh(cache)
+    assert len(loads) == 2
+    assert cache.get(URL)['document_info']['title'] == 'v2'
+    assert cache.stats()['stale_hits'] == 3
+
+
+def test_failed_refresh_keeps_the_last_good_copy(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('services.scrape_cache.time.monotonic', lambda: now[0])
+    results = [_page(1), {'success': False, 'error': 'Error de conexión: timeout', 'url': URL}]
+
+    cache = ScrapeCache(lambda url: results.pop(0), ttl_seconds=60)
+    cache.get(URL)
+    now[0] += 61
+    cache.get(URL)
+    _wait_refresh(cache)
+
+    result = cache.get(URL)
+    assert result['success'] is True
+    assert result['document_info']['title'] == 'v1'
+    assert result['last_refresh_error'] == 'Error de conexión: timeout'
+    assert cache.stats()['failures'] == 1
+
+
+def test_first_load_is_shared_and_failures_are_not_cached():
+    release = threading.Event()
+    loads = []
+
+    def loader(url):
+        loads.append(url)
+        release.wait(5)
+        if len(loads) == 1:
+            return {'success': False, 'error': 'Error de conexión: 503', 'url': url}
+        return _page(len(loads))
+
+    cache = ScrapeCache(loader, ttl_seconds=60)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(cache.get, URL) for _ in range(4)]
+        while len(loads) < 1:
+            time.sleep(0.001)
+        time.sleep(0.05)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert len(loads) == 1
+    assert all(result['success'] is False for result in results)
+    assert cache.get(URL)['document_info']['title'] == 'v2'
+
+
+def test_padron_info_reports_cache_age(monkeypatch):
+    from flask import Flask
+    from routes.simple_scraping_bp import simple_scraping_bp
+
+    cache = ScrapeCache(lambda url: _page(1), ttl_seconds=60)
+    monkeypatch.setattr(scrape_cache, 'get_scrape_cache', lambda: cache)
+
+    app = Flask(__name__)
+    app.register_blueprint(simple_scraping_bp)
+    with app.test_client() as client:
+        response = client.get('/padron-info')
+
+    assert response.status_code == 200
+    assert response.headers['Age'] == '0'
+    assert response.get_json()['stale'] is False
+    assert response.get_json()['cache_age_seconds'] == 0
@@ -0,0 +1,105 @@
+import asyncio
+
+import httpx
+import pytest
+
+from services import scraping_service
+from services.document_extractor import PARSER_HTML, PARSER_LXML
+from services.padron_index import PadronIndex
+from services.scraping_service import ScrapingService
+
+MAX_BODY = 64 * 1024
+
+
+@pytest.fixture
+def service_factory(monkeypatch):
+    monkeypatch.setattr(scraping_service, 'get_fetch_cache', lambda: None)
+
+    def build(**kwargs):
+        service = ScrapingService(**kwargs)
+        service._index_document = lambda url, info: None
+        return service
+
+    return build
+
+
+def _endless_body(handler):
+    """Cuerpo sin Content-Length que no termina hasta que el cliente corta"""
+    handler.send_response(200)
+    handler.send_header('Content-Type', 'text/html')
+    handler.end_headers()
+    try:
+        for _ in range(10000):
+            handler.wfile.write(b'<p>' + b'x' * 8192 + b'</p>')
+    except OSError:
+        # El cliente cerró la conexión al superar el máximo
+        pass
+
+
+def _declared_huge(handler):
+    handler.send_response(200)
+    handler.send_header('Content-Type', 'text/html')
+    handler.send_header('Content-Length', str(10 ** 9))
+    handler.end_headers()
+
+
+def test_both_parser_backends_extract_the_same_fields_from_saved_pages(page_server, service_factory):
+    for page in ('/tramit_padron.html', '/tramit_catalogo.html'):
+        results = [service_factory(parser=parser).scrape_tarragona_padron_info(page_server.url(page))
+                   for parser in (PARSER_HTML, PARSER_LXML)]
+        assert results[0]['success'] and results[1]['success']
+        assert results[0]['document_info'] == results[1]['document_info']
+
+
+def test_auto_parser_prefers_lxml(service_factory):
+    assert service_factory(parser='auto').parser == PARSER_LXML
+    with pytest.raises(ValueError):
+        service_factory(parser='html5lib')
+
+
+def test_download_is_aborted_once_it_exceeds_the_maximum_size(page_server, service_factory):
+    page_server.routes['/huge'] = _endless_body
+    page_server.routes['/declared'] = _declared_huge
+    service = service_factory(max_body_bytes=MAX_BODY)
+
+    streamed = service.scrape_tarragona_padron_info(page_server.url('/huge'))
+    declared = service.scrape_tarragona_padron_info(page_server.url('/declared'))
+    normal = service.scrape_tarragona_padron_info(page_server.url('/tramit_padron.html'))
+
+    assert streamed['success'] is False and str(MAX_BODY) in streamed['error']
+    assert declared['success'] is False and str(MAX_BODY) in declared['error']
+    assert normal['success'] is True
+
+
+def test_async_download_is_aborted_once_it_exceeds_the_maximum_size(page_server, service_factory):
+    page_server.routes['/huge'] = _endless_body
+    service = service_factory(max_body_bytes=MAX_BODY)
+
+    async def scrape():
+        async with httpx.AsyncClient() as client:
+            return (await service.scrape_tarragona_padron_info_async(page_server.url('/huge'), client=client),
+                    await service.scrape_tarragona_padron_info_async(page_server.url('/tramit_padron.html'),
+                                                                     client=client))
+
+    huge, normal = asyncio.run(scrape())
+
+    assert huge['success'] is False and str(MAX_BODY) in huge['error']
+    assert normal['success'] is True
+    assert normal['document_info']['title'] == "Alta al padró d'habitants"
+
+
+def test_only_pages_from_the_catalogue_host_are_indexed(monkeypatch):
+    index = PadronIndex()
+    monkeypatch.setattr(scraping_service, 'get_fetch_cache', lambda: None)
+    monkeypatch.setattr(scraping_service, 'get_padron_index', lambda: index)
+    service = ScrapingService(save_index=False)
+    info = {'title': 'Alta al padró', 'description': 'Inscripció al padró municipal de Tarragona.',
+            'requirements': [], 'procedures': [], 'additional_info': [], 'raw_text': ''}
+
+    for url in ('https://tarragona.cat.example.com/padro', 'https://example.com/?q=tarragona.cat',
+                'https://example.com/seu.tarragona.cat/padro'):
+        service._index_document(url, info)
+    assert index.stats()['documents'] == 0
+
+    service._index_document(scraping_service.TARRAGONA_PADRON_URL, info)
+    assert index.stats()['documents'] == 1
@@ -0,0 +1,60 @@
+import re
+import unicodedata
+import zlib
+
+import numpy as np
+import pytest
+
+from services import chat_service
+from services.semantic_cache import SemanticCache
+
+
+def fake_embedder(text):
+    """Embedder determinista: bolsa de palabras sin acentos proyectada con crc32"""
+    text = unicodedata.normalize('NFKD', text.lower()).encode('ascii', 'ignore').decode('ascii')
+    vector = np.zeros(64)
+    for token in re.findall(r'\w+', text):
+        vector[zlib.crc32(token.encode()) % 64] += 1
+    return vector
+
+
+@pytest.fixture
+def semantic_cache(monkeypatch):
+    cache = SemanticCache(fake_embedder, capacity=3, threshold=0.9)
+    monkeypatch.setattr(chat_service, 'get_semantic_cache', lambda: cache)
+    return cache
+
+
+def test_lookup_respects_threshold_and_namespace(semantic_cache):
+    embedding = semantic_cache.embed('¿Cómo me empadrono en Tarragona?')
+    semantic_cache.add(embedding, 'gemma:7b|{}', {'response': 'En la OMAC'})
+
+    value, similarity = semantic_cache.lookup(semantic_cache.embed('como me empadrono en tarragona'), 'gemma:7b|{}')
+    assert value == {'response': 'En la OMAC'}
+    assert similarity == pytest.approx(1.0)
+
+    assert semantic_cache.lookup(semantic_cache.embed('horario de la biblioteca'), 'gemma:7b|{}')[0] is None
+    assert semantic_cache.lookup(embedding, 'gemma:2b|{}')[0] is None
+
+
+def test_capacity_evicts_least_recently_used(semantic_cache):
+    for i, text in enumerate(['uno', 'dos', 'tres']):
+        semantic_cache.add(semantic_cache.embed(text), 'ns', {'response': text})
+
+    semantic_cache.lookup(semantic_cache.embed('uno'), 'ns')
+    semantic_cache.add(semantic_cache.embed('cuatro'), 'ns', {'response': 'cuatro'})
+
+    assert semantic_cache.lookup(semantic_cache.embed('dos'), 'ns')[0] is None
+    assert semantic_cache.lookup(semantic_cache.embed('uno'), 'ns')[0] is not None
+    assert semantic_cache.stats()['evictions'] == 1
+
+
+def test_chat_answers_paraphrase_from_semantic_cache(chat_client, fake_ollama, semantic_cache):
+    chat_client.post('/chat', json={'query': '¿Cómo me empadrono en Tarragona?'})
+    response = chat_client.post('/chat', json={'query': 'como me empadrono en tarragona'})
+
+    data = response.get_json()
+    assert data['cached'] is True
+    assert data['cache_type'] == 'semantic'
+    assert data['query'] == 'como me empadrono en tarragona'
+    assert len(fake_ollama.calls) == 1
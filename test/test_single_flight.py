@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services.deadline import Deadline, DeadlineExceeded
+from services.single_flight import AsyncSingleFlight, SingleFlight, StreamFlight
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    started = threading.Event()
+    executions = []
+
+    def generate():
+        executions.append(1)
+        started.set()
+        release.wait(5)
+        return {'response': 'padró'}
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        leader = pool.submit(flight.do, 'key', generate)
+        started.wait(5)
+        followers = [pool.submit(flight.do, 'key', generate) for _ in range(4)]
+        while flight.stats()['coalesced'] < 4:
+            time.sleep(0.001)
+        release.set()
+        results = [leader.result()] + [f.result() for f in followers]
+
+    assert len(executions) == 1
+    assert [shared for _, shared in results] == [False, True, True, True, True]
+    assert all(result == {'response': 'padró'} for result, _ in results)
+    assert flight.stats() == {'in_flight': 0, 'leaders': 1, 'coalesced': 4}
+
+
+def test_stream_subscribers_share_one_generation():
+    flight = StreamFlight()
+    release = threading.Event()
+    calls = []
+
+    def producer():
+        calls.append(1)
+        yield {'type': 'token', 'response': 'Hola'}
+        release.wait(5)
+        yield {'type': 'done', 'model': 'gemma:7b'}
+
+    first = flight.subscribe('key', producer)
+    second = flight.subscribe('key', producer)
+    release.set()
+
+    assert list(first) == [{'type': 'token', 'response': 'Hola'}, {'type': 'done', 'model': 'gemma:7b'}]
+    # El que se une a la generación en curso no cuenta sus tokens en el registro de consumo
+    assert list(second) == [{'type': 'token', 'response': 'Hola'},
+                            {'type': 'done', 'model': 'gemma:7b', 'coalesced': True}]
+    assert len(calls) == 1
+    assert flight.stats()['coalesced'] == 1
+
+
+def test_followers_stop_waiting_when_their_own_deadline_expires():
+    flight = SingleFlight()
+    release = threading.Event()
+    started = threading.Event()
+
+    def generate():
+        started.set()
+        release.wait(5)
+        return {'response': 'padró'}
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        leader = pool.submit(flight.do, 'key', generate)
+        started.wait(5)
+        waited_from = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            flight.do('key', generate, Deadline(0.05))
+        assert time.monotonic() - waited_from < 1
+        release.set()
+        assert leader.result() == ({'response': 'padró'}, False)
+
+
+def test_stream_followers_get_a_deadline_error_when_their_deadline_expires():
+    flight = StreamFlight()
+    release = threading.Event()
+
+    def producer():
+        yield {'type': 'token', 'response': 'Hola'}
+        release.wait(5)
+        yield {'type': 'done', 'model': 'gemma:7b'}
+
+    first = flight.subscribe('key', producer, Deadline(10))
+    second = flight.subscribe('key', producer, Deadline(0.05))
+
+    assert list(second) == [{'type': 'token', 'response': 'Hola'},
+                            {'type': 'error', 'error': 'Plazo de 0.05s agotado esperando la generación compartida',
+                             'deadline_exceeded': True}]
+    release.set()
+    # Quien inició la generación sigue recibiéndola entera
+    assert [event['type'] for event in first] == ['token', 'done']
+
+
+def test_async_generation_is_cancelled_when_every_waiter_leaves():
+    flight = AsyncSingleFlight()
+    generation = {}
+
+    async def generate():
+        generation['started'] = True
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            generation['cancelled'] = True
+            raise
+
+    async def run():
+        waiters = [asyncio.ensure_future(flight.do('clave', generate)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        waiters[0].cancel()
+        await asyncio.sleep(0.01)
+        assert 'cancelled' not in generation
+        waiters[1].cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    assert generation == {'started': True, 'cancelled': True}
+    assert flight.stats() == {'in_flight': 0, 'leaders': 1, 'coalesced': 1}